@@ -1,25 +1,43 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
-import pandas as pd
 
 from conciliacion.ui import (
     draw_header,
     upload_files_section,
     sheet_and_header_section,
+    read_mapped_columns,        # lectura completa, solo columnas mapeadas
+    csv_streaming_section,      # extracto CSV por bloques (opcional)
+    streaming_stats_section,    # filas/s de la lectura por bloques
+    ingest_cache_section,       # aciertos/fallos de la caché de lecturas
     preview_tabs,
     mapping_section,
-    filters_section,            # checklist de conceptos
-    matching_params_section,    # ventana_dias y ordenar_por_emision
+    filters_section,            # checklist de conceptos (desde el índice)
+    exclusion_rules_section,    # reglas contiene / regex / exacto
+    exclusion_impact_section,   # filas e importe que sacan las exclusiones
+    matching_params_section,    # ventana_dias, ordenar_por_emision, asignacion y tolerancias
     decimals_section,           # << NUEVO: solo selector de decimales
+    group_matching_section,     # grupos N-1 / 1-N (opcional)
+    stage_log_section,          # aciertos de las etapas memoizadas
+    memory_section,             # pico de memoria (rerun / sesión)
+    frames_memory_section,      # MB por frame (memory_usage deep)
+    export_section,             # reporte Excel a pedido
 )
 from conciliacion.transform import (
-    apply_extract_transformations,
+    apply_extract_transformations_chunked,
+    normalize_extract,
+    filter_extract,
     apply_system_transformations,
     split_system_unmatched_by_due,
+    summarize_excluded,
     build_views_for_output,
+    build_group_view,
+    frame_memory,
 )
-from conciliacion.matching import match_one_to_one_by_amount_and_date
-from conciliacion.export import to_excel_with_sections
+from conciliacion.exclusion import build_concept_index
+from conciliacion.matching import match_one_to_one_by_amount_and_date, match_groups_by_amount_sum
+from conciliacion.export import report_tables, to_excel_streaming, to_zip_bundle
+from conciliacion.pipeline import run_stage, stage_key
+from conciliacion.utils import content_hash, iter_csv_chunks
 
 
 # ==============================
@@ -35,11 +53,11 @@ if not (f_ext and f_sys):
     st.info("Subí ambos archivos para configurar la conciliación.")
     st.stop()
 
-# 2) Selección de hojas + fila de encabezado
-sh_ext, hd_ext, sh_sys, hd_sys, df_ext_raw, df_sys_raw = sheet_and_header_section(f_ext, f_sys)
+# 2) Selección de hojas + fila de encabezado (lee solo las primeras filas)
+sh_ext, hd_ext, sh_sys, hd_sys, prev_ext, prev_sys = sheet_and_header_section(f_ext, f_sys)
 
 # 3) Previsualización
-preview_tabs(df_ext_raw, df_sys_raw)
+preview_tabs(prev_ext, prev_sys)
 
 # 4) Mapeo de columnas
 (
@@ -47,7 +65,12 @@ preview_tabs(df_ext_raw, df_sys_raw)
     ext_col_importe, ext_col_debe, ext_col_haber,
     sys_col_emision, sys_col_venc, sys_modo_importe,
     sys_col_importe, sys_col_debe, sys_col_haber
-) = mapping_section(df_ext_raw, df_sys_raw)
+) = mapping_section(prev_ext, prev_sys)
+
+# 4b) Columnas a leer completas (la lectura es la etapa de ingesta, en 6)
+ext_leidas = (ext_col_fecha, ext_col_concepto, ext_col_importe, ext_col_debe, ext_col_haber)
+sys_leidas = (sys_col_emision, sys_col_venc, sys_col_importe, sys_col_debe, sys_col_haber)
+ext_por_bloques = csv_streaming_section(f_ext)
 
 # 5) Decimales (único parámetro de normalización visible)
 DECIMALES = decimals_section()
@@ -56,85 +79,201 @@ DECIMALES = decimals_section()
 NORMALIZAR_TEXTO = True
 USAR_ABS = False
 
-# 6) Filtros (SOLO checklist de conceptos)
-excluir_exact, fecha_corte = filters_section(
-    df_ext_raw=df_ext_raw,
-    ext_col_concepto=ext_col_concepto,
-)
+# 6) Etapas memoizadas: cada una se recalcula solo si cambian sus entradas
+etapas = st.session_state.setdefault("_etapas", {})
+log_etapas = []
 
-# 7) Parámetros de matching (ventana por defecto = 0)
-ventana_dias, ordenar_por_emision = matching_params_section()
+# Ingesta: lectura completa, solo de las columnas mapeadas. Por bloques, el
+# extracto se lee dentro de su normalización (acá queda None).
+k_ing_ext, df_ext_raw = run_stage(
+    etapas, log_etapas, "ingesta ext",
+    (content_hash(f_ext), f_ext.name, sh_ext, hd_ext, ext_leidas, ext_por_bloques),
+    lambda: None if ext_por_bloques else read_mapped_columns(f_ext, sh_ext, hd_ext, ext_leidas, prev_ext),
+)
+k_ing_sys, df_sys_raw = run_stage(
+    etapas, log_etapas, "ingesta sys",
+    (content_hash(f_sys), f_sys.name, sh_sys, hd_sys, sys_leidas),
+    lambda: read_mapped_columns(f_sys, sh_sys, hd_sys, sys_leidas, prev_sys),
+)
+ingest_cache_section()
 
-# 8) Transformaciones
-df_ext, df_ext_excl = apply_extract_transformations(
-    df_ext_raw=df_ext_raw,
+# 6a) Extracto normalizado (sin filtrar) e índice de conceptos
+params_ext = dict(
     col_fecha=ext_col_fecha,
     col_concepto=ext_col_concepto,
     modo_importe=ext_modo_importe,
     col_importe=ext_col_importe,
     col_debito=ext_col_debe,
     col_credito=ext_col_haber,
-    excluir_exact=excluir_exact,
     normalizar_texto=NORMALIZAR_TEXTO,
     decimales=DECIMALES,
 )
 
-df_sys = apply_system_transformations(
-    df_sys_raw=df_sys_raw,
-    col_emision=sys_col_emision,
-    col_venc=sys_col_venc,
-    modo_importe=sys_modo_importe,
-    col_importe=sys_col_importe,
-    col_debe=sys_col_debe,
-    col_haber=sys_col_haber,
-    decimales=DECIMALES,
-    usar_abs=USAR_ABS,
+
+def _normaliza_ext():
+    if ext_por_bloques:
+        df, _, stats = apply_extract_transformations_chunked(
+            iter_csv_chunks(f_ext, ext_leidas, prev_ext), excluir_exact=[], **params_ext,
+        )
+        return df, stats
+    return normalize_extract(df_ext_raw=df_ext_raw, **params_ext), None
+
+
+k_norm_ext, (df_ext_norm, stats_bloques) = run_stage(
+    etapas, log_etapas, "normaliza ext",
+    (k_ing_ext, ext_col_fecha, ext_col_concepto, ext_modo_importe, ext_col_importe, ext_col_debe, ext_col_haber,
+     NORMALIZAR_TEXTO, DECIMALES, ext_por_bloques),
+    _normaliza_ext,
+)
+streaming_stats_section(stats_bloques)
+_, indice_conceptos = run_stage(
+    etapas, log_etapas, "conceptos", (k_norm_ext,), lambda: build_concept_index(df_ext_norm),
+)
+
+# 7) Filtros (checklist de conceptos y reglas) con su impacto
+excluir_exact, fecha_corte = filters_section(indice_conceptos)
+excluir_contains, excluir_regex, excluir_exact_extra = exclusion_rules_section(NORMALIZAR_TEXTO)
+excluir_exact = sorted(set(excluir_exact) | set(excluir_exact_extra))
+exclusion_impact_section(indice_conceptos, excluir_exact, excluir_contains, excluir_regex, NORMALIZAR_TEXTO)
+
+# 8) Parámetros de matching (ventana por defecto = 0)
+(
+    ventana_dias, ordenar_por_emision, asignacion,
+    tolerancia_importe, tolerancia_pct,
+) = matching_params_section(DECIMALES)
+max_filas_grupo, presupuesto_grupo = group_matching_section()
+
+# 8a) Filtros sobre el extracto normalizado y transformación del sistema
+k_ext, (df_ext, df_ext_excl) = run_stage(
+    etapas, log_etapas, "filtra ext",
+    (k_norm_ext, sorted(excluir_exact), excluir_contains, excluir_regex),
+    lambda: filter_extract(
+        df_ext_norm,
+        excluir_exact=excluir_exact,
+        normalizar_texto=NORMALIZAR_TEXTO,
+        excluir_contains=excluir_contains,
+        excluir_regex=excluir_regex,
+    ),
 )
 
-# 9) Emparejamiento 1-1 (importe con signo + fecha más cercana)
-pairs, used_sys, used_ext = match_one_to_one_by_amount_and_date(
-    df_sys=df_sys,
-    df_ext=df_ext,
-    ventana_dias=ventana_dias,
-    ordenar_por_emision=ordenar_por_emision,
+k_sys, df_sys = run_stage(
+    etapas, log_etapas, "transform sys",
+    (k_ing_sys, sys_col_emision, sys_col_venc, sys_modo_importe, sys_col_importe, sys_col_debe, sys_col_haber,
+     DECIMALES, USAR_ABS),
+    lambda: apply_system_transformations(
+        df_sys_raw=df_sys_raw,
+        col_emision=sys_col_emision,
+        col_venc=sys_col_venc,
+        modo_importe=sys_modo_importe,
+        col_importe=sys_col_importe,
+        col_debe=sys_col_debe,
+        col_haber=sys_col_haber,
+        decimales=DECIMALES,
+        usar_abs=USAR_ABS,
+    ),
 )
 
+# 8b) Memoria de cada frame (crudos y de trabajo)
+_, memoria_frames = run_stage(
+    etapas, log_etapas, "memoria", (k_ing_ext, k_ing_sys, k_ext, k_sys, ext_por_bloques),
+    lambda: frame_memory({
+        "Extracto (crudo)": df_ext_raw,
+        "Sistema (crudo)": df_sys_raw,
+        "Extracto (normalizado)": df_ext_norm,
+        "Extracto (trabajo)": df_ext,
+        "Extracto (excluidos)": df_ext_excl,
+        "Sistema (trabajo)": df_sys,
+    }),
+)
+frames_memory_section(memoria_frames)
+
+# 9) Emparejamiento 1-1 (importe con signo + fecha más cercana): pairs es el DataFrame de pares (PARES_COLS)
+k_match, (pairs, used_sys, used_ext) = run_stage(
+    etapas, log_etapas, "match",
+    (k_ext, k_sys, ventana_dias, ordenar_por_emision, asignacion, tolerancia_importe, tolerancia_pct),
+    lambda: match_one_to_one_by_amount_and_date(
+        df_sys=df_sys,
+        df_ext=df_ext,
+        ventana_dias=ventana_dias,
+        ordenar_por_emision=ordenar_por_emision,
+        asignacion=asignacion,
+        tolerancia_importe=tolerancia_importe,
+        tolerancia_pct=tolerancia_pct,
+    ),
+)
+
+
+# 9b) Grupos N-1 / 1-N sobre lo que quedó libre (opcional)
+def _grupos():
+    if not max_filas_grupo:
+        return [], set(), set(), True
+    return match_groups_by_amount_sum(
+        df_sys=df_sys,
+        df_ext=df_ext,
+        used_sys=used_sys,
+        used_ext=used_ext,
+        ventana_dias=ventana_dias,
+        ordenar_por_emision=ordenar_por_emision,
+        max_filas=max_filas_grupo,
+        presupuesto_seg=presupuesto_grupo,
+    )
+
+
+k_grupos, (grupos, grupo_sys, grupo_ext, grupos_completo) = run_stage(
+    etapas, log_etapas, "grupos", (k_match, max_filas_grupo, presupuesto_grupo), _grupos,
+)
+
+
 # 10) Tablas de salida
-correctos, solo_ext, solo_sys = build_views_for_output(
-    pairs=pairs,
-    df_ext=df_ext,
-    df_sys=df_sys,
-    ext_cols=(ext_col_fecha, ext_col_concepto, ext_col_importe, ext_col_debe, ext_col_haber),
-    sys_cols=(sys_col_emision, sys_col_venc, sys_col_importe, sys_col_debe, sys_col_haber),
-    modo_importe_sys=sys_modo_importe,
-    modo_importe_ext=ext_modo_importe,
-    used_ext=used_ext,
-    used_sys=used_sys,
+def _vistas():
+    correctos, solo_ext, solo_sys = build_views_for_output(
+        pairs=pairs,
+        df_ext=df_ext,
+        df_sys=df_sys,
+        ext_cols=(ext_col_fecha, ext_col_concepto, ext_col_importe, ext_col_debe, ext_col_haber),
+        sys_cols=(sys_col_emision, sys_col_venc, sys_col_importe, sys_col_debe, sys_col_haber),
+        modo_importe_sys=sys_modo_importe,
+        modo_importe_ext=ext_modo_importe,
+        used_ext=used_ext | grupo_ext,
+        used_sys=used_sys | grupo_sys,
+        decimales=DECIMALES,
+    )
+    agrupados = build_group_view(
+        grupos=grupos,
+        df_ext=df_ext,
+        df_sys=df_sys,
+        ext_cols=(ext_col_fecha, ext_col_concepto),
+        sys_cols=(sys_col_emision, sys_col_venc),
+    )
+    return correctos, solo_ext, solo_sys, agrupados
+
+
+# los nombres de columnas ya están en las claves de transform ext / sys
+k_vistas, (correctos, solo_ext, solo_sys, agrupados) = run_stage(
+    etapas, log_etapas, "vistas", (k_grupos,), _vistas,
 )
 
 # 11) Partición sistema sin extracto
-solo_sistema_vencidos, solo_sistema_diferidos = split_system_unmatched_by_due(
-    solo_sys=solo_sys,
-    col_emision=sys_col_emision,
-    col_venc=sys_col_venc,
-    col_importe=sys_col_importe,
-    col_debe=sys_col_debe,
-    col_haber=sys_col_haber,
-    fecha_corte=fecha_corte,
-    modo_importe=sys_modo_importe,
+k_split, (solo_sistema_vencidos, solo_sistema_diferidos) = run_stage(
+    etapas, log_etapas, "split",
+    (k_vistas, fecha_corte),
+    lambda: split_system_unmatched_by_due(
+        solo_sys=solo_sys,
+        col_emision=sys_col_emision,
+        col_venc=sys_col_venc,
+        col_importe=sys_col_importe,
+        col_debe=sys_col_debe,
+        col_haber=sys_col_haber,
+        fecha_corte=fecha_corte,
+        modo_importe=sys_modo_importe,
+    ),
 )
 
+
 # 12) Resumen de DESCARTADOS (si hay)
-descartados_resumen = pd.DataFrame()
-if df_ext_excl is not None and not df_ext_excl.empty:
-    descartados_resumen = (
-        df_ext_excl
-        .groupby("_CONCEPTO_", dropna=False)["_IMPORTE_SIGNED_"]
-        .agg(Cantidad="count", Total="sum")
-        .reset_index()
-        .rename(columns={"_CONCEPTO_": "Concepto"})
-        .sort_values("Total", ascending=True)
-    )
+k_desc, descartados_resumen = run_stage(
+    etapas, log_etapas, "descartados", (k_ext,), lambda: summarize_excluded(df_ext_excl),
+)
 
 # 13) UI de resultados
 st.markdown("---")
@@ -148,6 +287,11 @@ m4.metric("Sistema sin Extracto (DIFERIDOS)", len(solo_sistema_diferidos))
 
 with st.expander("Correctos (en ambos)"):
     st.dataframe(correctos, use_container_width=True, height=320)
+if max_filas_grupo:
+    with st.expander(f"Agrupados ({len(grupos)} grupos N-1 / 1-N)"):
+        st.dataframe(agrupados, use_container_width=True, height=320)
+    if not grupos_completo:
+        st.warning("La búsqueda de grupos se cortó por tiempo: puede haber más grupos. Subí el tiempo máximo por etapa.")
 with st.expander("En Extracto y NO en Sistema"):
     st.dataframe(solo_ext, use_container_width=True, height=320)
 with st.expander("En Sistema y NO en Extracto — VENCIDOS"):
@@ -161,38 +305,71 @@ if not descartados_resumen.empty:
     total_desc = descartados_resumen["Total"].sum()
     st.caption(f"Total descartado (suma de importes): {total_desc:,.2f}")
 
-# 14) Exportación a Excel (incluye hoja 'Descartados')
-sections = [
-    ("Correctos (en ambos)", correctos),
-    ("Solo en Extracto", solo_ext),
-    ("Sistema sin Extracto — Vencidos", solo_sistema_vencidos),
-    ("Sistema sin Extracto — Diferidos", solo_sistema_diferidos),
-]
-if not descartados_resumen.empty:
-    sections.append(("Descartados (resumen por concepto)", descartados_resumen))
-
-extra = {
-    "Correctos": correctos,
-    "Solo_Extracto": solo_ext,
-    "Sistema_Sin_Extracto_Vencidos": solo_sistema_vencidos,
-    "Sistema_Sin_Extracto_Diferidos": solo_sistema_diferidos,
-}
-if df_ext_excl is not None and not df_ext_excl.empty:
-    detalle = df_ext_excl.copy()
-    detalle = detalle[["_FECHA_", "_CONCEPTO_", "_IMPORTE_SIGNED_", "_MOTIVO_"]].rename(columns={
-        "_FECHA_": "Fecha",
-        "_CONCEPTO_": "Concepto",
-        "_IMPORTE_SIGNED_": "Importe",
-        "_MOTIVO_": "Motivo"
-    })
-    extra["Descartados_Detalle"] = detalle
-    extra["Descartados_Resumen"] = descartados_resumen
-
-excel_bytes = to_excel_with_sections(sections, extra_sheets=extra)
-
-st.download_button(
-    "Descargar reporte (Excel)",
-    data=excel_bytes,
-    file_name="conciliacion_lince.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-)
+# 14) Exportación (Excel o ZIP con CSV/Parquet, incluye 'Descartados'): solo cuando se pide
+export_pedido, resumen_modo, export_formato = export_section()
+
+
+def _export():
+    sections, extra = report_tables(
+        correctos, solo_ext, solo_sistema_vencidos, solo_sistema_diferidos,
+        agrupados=agrupados if max_filas_grupo else None,
+        descartados_resumen=descartados_resumen,
+        df_ext_excl=df_ext_excl,
+    )
+
+    # archivo temporal en disco (se borra cuando la etapa se reemplaza)
+    if export_formato == "xlsx":
+        return to_excel_streaming(sections, extra_sheets=extra, resumen=resumen_modo)
+    parametros = {
+        "extracto": {"archivo": f_ext.name, "hoja": sh_ext, "encabezado": hd_ext, "fecha": ext_col_fecha,
+                     "concepto": ext_col_concepto, "modo_importe": ext_modo_importe, "importe": ext_col_importe,
+                     "debito": ext_col_debe, "credito": ext_col_haber},
+        "sistema": {"archivo": f_sys.name, "hoja": sh_sys, "encabezado": hd_sys, "emision": sys_col_emision,
+                    "vencimiento": sys_col_venc, "modo_importe": sys_modo_importe, "importe": sys_col_importe,
+                    "debe": sys_col_debe, "haber": sys_col_haber},
+        "decimales": DECIMALES,
+        "excluir_exact": sorted(excluir_exact),
+        "excluir_contains": excluir_contains,
+        "excluir_regex": excluir_regex,
+        "fecha_corte": fecha_corte,
+        "ventana_dias": ventana_dias,
+        "ordenar_por_emision": ordenar_por_emision,
+        "asignacion": asignacion,
+        "tolerancia_importe": tolerancia_importe,
+        "tolerancia_pct": tolerancia_pct,
+        "max_filas_grupo": max_filas_grupo,
+    }
+    return to_zip_bundle(extra, formato=export_formato, parametros=parametros)
+
+
+# el archivo queda en caché por huella de resultados: si nada cambió, no se regenera
+entradas_export = (k_split, k_desc, resumen_modo, export_formato)
+if export_pedido:
+    run_stage(etapas, log_etapas, "export", entradas_export, _export)
+
+export_listo = etapas.get("export")
+if export_listo is not None and export_listo[0] == stage_key("export", entradas_export):
+    archivo = export_listo[1]
+    # le paso el archivo crudo (io.RawIOBase, lo que acepta streamlit>=1.32;
+    # un callable en data no): el seek del buffer vacía lo pendiente
+    archivo.seek(0)
+
+    if export_formato == "xlsx":
+        st.download_button(
+            "Descargar reporte (Excel)",
+            data=archivo.raw,
+            file_name="conciliacion_lince.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    else:
+        st.download_button(
+            f"Descargar tablas (ZIP {export_formato.upper()})",
+            data=archivo.raw,
+            file_name="conciliacion_lince.zip",
+            mime="application/zip"
+        )
+else:
+    st.caption("El reporte se genera a pedido (y se vuelve a pedir si cambian los resultados).")
+
+stage_log_section(log_etapas)
+memory_section()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación a Excel: writer en memoria (to_excel_with_sections) vs streaming
+(to_excel_streaming), pico de RSS y tiempo de escritura.
+
+Cada corrida va en un proceso nuevo (spawn) para que el pico de RSS sea solo
+de esa corrida: mido el RSS antes de escribir y el pico (ru_maxrss) después.
+La tabla va dos veces, como en la app: en Resumen y en su hoja.
+
+Uso:
+    python -m benchmarks.bench_export [--sizes 10000 100000 500000]
+"""
+
+import argparse
+import multiprocessing as mp
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+from conciliacion.export import to_excel_with_sections, to_excel_streaming
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def _peak_mb() -> float:
+    # ru_maxrss viene en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_table(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    base = np.datetime64("2024-01-01", "D")
+    emision = base + rng.integers(0, 365, n)
+    return pd.DataFrame({
+        "Emision (Sistema)": pd.Series(emision.astype("datetime64[s]")),
+        "Vencimiento (Sistema)": pd.Series((emision + 30).astype("datetime64[s]")),
+        "Debe (Sistema)": rng.integers(100, 10_000_000, n) / 100,
+        "Haber (Sistema)": np.nan,
+        "Fecha (Extracto)": pd.Series((emision + rng.integers(0, 5, n)).astype("datetime64[s]")),
+        "Concepto (Extracto)": rng.choice(["TRANSFERENCIA", "DEPOSITO", "PAGO PROVEEDOR 1234", "DEBITO AUTOMATICO"], n),
+        "Importe (Extracto +/-)": rng.integers(100, 10_000_000, n) / 100,
+        "Delta dias |fecha ext - emision/venc|": rng.integers(0, 5, n),
+    })
+
+
+def _corrida(writer: str, n: int, cola):
+    df = synthetic_table(n)
+    antes = _rss_mb()
+    t0 = time.perf_counter()
+    if writer == "memoria":
+        size = len(to_excel_with_sections([("Correctos", df)], {"Correctos": df}).getvalue())
+    else:
+        with to_excel_streaming([("Correctos", df)], {"Correctos": df}) as f:
+            size = f.seek(0, 2)
+    cola.put((time.perf_counter() - t0, _peak_mb() - antes, size / 2**20))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000], help="filas por tabla")
+    args = ap.parse_args()
+
+    ctx = mp.get_context("spawn")
+    print(f"{'filas':>9}  {'writer':<10}{'tiempo':>10}{'pico RSS extra':>16}{'archivo':>10}")
+    for n in args.sizes:
+        for writer in ("memoria", "streaming"):
+            cola = ctx.Queue()
+            p = ctx.Process(target=_corrida, args=(writer, n, cola))
+            p.start()
+            dt, pico, size = cola.get()
+            p.join()
+            print(f"{n:>9,}  {writer:<10}{dt:>9.2f}s{pico:>13.0f} MB{size:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del matching 1-1 sobre un tramo "caliente": N filas del sistema y
+N del extracto con el MISMO importe (comisiones, débitos fijos, etc.).
+
+Compara el motor columnar con el tramo indexado por fecha (_TramoIndexado)
+contra el mismo motor recorriendo el tramo entero con NumPy en cada fila, y
+contra el motor clásico en tamaños chicos. Verifica que los pares coincidan.
+
+Uso:
+    python -m benchmarks.bench_matching [--n 50000] [--ventana 0]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from conciliacion import matching
+from conciliacion.matching import match_one_to_one_by_amount_and_date
+
+
+def hot_bucket_frames(n: int, seed: int = 0):
+    """Sistema y extracto con un único importe y fechas al azar en un año."""
+    rng = np.random.default_rng(seed)
+    base = np.datetime64("2024-01-01", "D")
+    emision = base + rng.integers(0, 365, n)
+    venc = emision + rng.integers(0, 60, n)
+    fecha = base + rng.integers(0, 400, n)
+
+    key = pd.array(np.full(n, 150_000), dtype="Int64")
+    na = pd.array([pd.NA] * n, dtype="Int64")
+    df_sys = pd.DataFrame({
+        "_EMISION_": pd.Series(emision.astype("datetime64[s]")),
+        "_VENC_": pd.Series(venc.astype("datetime64[s]")),
+        "_AMT_KEY_DEBE_POS": key,
+        "_AMT_KEY_HABER_NEG": na,
+        "_AMT_KEY_PRIMARY_": key,
+    })
+    df_ext = pd.DataFrame({
+        "_FECHA_": pd.Series(fecha.astype("datetime64[s]")),
+        "_AMT_KEY_": pd.array(np.full(n, 150_000), dtype="Int64"),
+    })
+    return df_sys, df_ext
+
+
+def _run(df_sys, df_ext, ventana, motor="columnar", tramo_grande=None):
+    previo = matching._TRAMO_GRANDE
+    if tramo_grande is not None:
+        matching._TRAMO_GRANDE = tramo_grande
+    try:
+        t0 = time.perf_counter()
+        pairs, _, _ = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, True, motor=motor)
+        dt = time.perf_counter() - t0
+    finally:
+        matching._TRAMO_GRANDE = previo
+    return dt, list(zip(pairs["_SYS_ID_"], pairs["_EXT_ID_"], pairs["_DELTA_DIAS_"]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=50_000, help="filas por lado en el tramo caliente")
+    ap.add_argument("--ventana", type=int, default=0, help="ventana_dias (0 = sin tope)")
+    ap.add_argument("--sin-numpy", action="store_true", help="no correr el tramo sin indexar (lento)")
+    args = ap.parse_args()
+
+    for n in sorted({min(2_000, args.n), min(10_000, args.n), args.n}):
+        df_sys, df_ext = hot_bucket_frames(n)
+        t_idx, p_idx = _run(df_sys, df_ext, args.ventana)
+        print(f"n={n:>7,}  indexado  {t_idx:8.2f}s  pares={len(p_idx):,}")
+
+        if not args.sin_numpy:
+            t_np, p_np = _run(df_sys, df_ext, args.ventana, tramo_grande=10**12)
+            assert p_np == p_idx, "el tramo indexado no coincide con el recorrido completo"
+            print(f"n={n:>7,}  numpy     {t_np:8.2f}s  x{t_np / t_idx:.1f}")
+
+        if n <= 2_000:
+            t_cl, p_cl = _run(df_sys, df_ext, args.ventana, motor="clasico")
+            assert p_cl == p_idx, "el motor columnar no coincide con el clásico"
+            print(f"n={n:>7,}  clasico   {t_cl:8.2f}s  x{t_cl / t_idx:.1f}")
+
+
+if __name__ == "__main__":
+    main()
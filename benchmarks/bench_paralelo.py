@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Escalado del modo paralelo (shards por clave) con 1/2/4/8 procesos.
+
+Usa los mismos datos sintéticos que bench_asignacion y verifica que los
+pares de cada corrida sean idénticos a los del serial (procesos=1).
+
+Uso:
+    python -m benchmarks.bench_paralelo [--n 200000] [--ventana 0] [--asignacion secuencial]
+"""
+
+import argparse
+import time
+
+from conciliacion.matching import match_one_to_one_by_amount_and_date
+from benchmarks.bench_asignacion import synthetic_frames
+
+
+def _clave(pairs):
+    return list(zip(pairs["_SYS_ID_"], pairs["_EXT_ID_"], pairs["_DELTA_DIAS_"]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=200_000, help="filas del sistema")
+    ap.add_argument("--ventana", type=int, default=0, help="ventana_dias (0 = sin tope)")
+    ap.add_argument("--asignacion", default="secuencial", choices=("secuencial", "global"))
+    args = ap.parse_args()
+
+    df_sys, df_ext = synthetic_frames(args.n)
+    print(f"sistema={len(df_sys):,} extracto={len(df_ext):,} ventana={args.ventana} asignacion={args.asignacion}")
+    print(f"{'procesos':>9}{'pares':>10}{'tiempo':>10}{'speedup':>9}  idéntico")
+    base = None
+    for procesos in (1, 2, 4, 8):
+        t0 = time.perf_counter()
+        pairs, _, _ = match_one_to_one_by_amount_and_date(
+            df_sys, df_ext, args.ventana, True, asignacion=args.asignacion, procesos=procesos
+        )
+        dt = time.perf_counter() - t0
+        if base is None:
+            base = (_clave(pairs), dt)
+        igual = _clave(pairs) == base[0]
+        print(f"{procesos:>9}{len(pairs):>10,}{dt:>9.2f}s{base[1] / dt:>8.2f}x  {'sí' if igual else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Tiempo de las transformaciones a 10k / 100k / 1M filas:
+  - apply_extract_transformations (columna única y Debito/Credito, con filtros)
+  - apply_system_transformations (columna única y Debe/Haber)
+  - split_system_unmatched_by_due
+
+Los datos crudos imitan lo que llega de un Excel: fechas como texto,
+importes mezclados (números y texto con formato local) y conceptos con
+pocos valores distintos.
+
+Uso:
+    python -m benchmarks.bench_transform [--filas 10000 100000 1000000]
+"""
+
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from conciliacion.transform import (
+    apply_extract_transformations,
+    apply_system_transformations,
+    split_system_unmatched_by_due,
+)
+
+CONCEPTOS = np.array([
+    "TRANSFERENCIA RECIBIDA", " iva 21% ", "COMISION MANTENIMIENTO", "DEBITO AUTOMATICO",
+    "PAGO PROVEEDOR", "IMP. LEY 25413", "DEPOSITO EFECTIVO", None,
+], dtype=object)
+
+
+def raw_frames(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    fechas = (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"))
+    importes = np.round(rng.normal(0, 50_000, n), 2)
+    # un 10% de los importes como texto con formato local
+    texto = rng.random(n) < 0.1
+    importe_crudo = importes.astype(object)
+    importe_crudo[texto] = [f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for v in importes[texto]]
+
+    df_ext = pd.DataFrame({
+        "Fecha": fechas.strftime("%d/%m/%Y"),
+        "Concepto": CONCEPTOS[rng.integers(0, len(CONCEPTOS), n)],
+        "Importe": importe_crudo,
+        "Debito": np.where(importes < 0, -importes, np.nan),
+        "Credito": np.where(importes >= 0, importes, np.nan),
+    })
+    df_sys = pd.DataFrame({
+        "Emision": fechas.strftime("%d/%m/%Y"),
+        "Vencimiento": fechas + pd.to_timedelta(rng.choice([0, 15, 30, 60], n), unit="D"),
+        "Importe": importe_crudo,
+        "Debe": np.where(importes >= 0, importes, 0.0),
+        "Haber": np.where(importes < 0, -importes, np.nan),
+    })
+    return df_ext, df_sys
+
+
+def _tiempo(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = ap.parse_args()
+
+    print(f"{'filas':>9} {'funcion':<42} {'seg':>8} {'filas/s':>12}")
+    for n in args.filas:
+        df_ext, df_sys = raw_frames(n)
+        casos = [
+            ("apply_extract (columna unica)", lambda: apply_extract_transformations(
+                df_ext, "Fecha", "Concepto", "Columna unica", "Importe", None, None,
+                ["IVA 21%"], True, 2, excluir_contains=["LEY 25413"])),
+            ("apply_extract (debito/credito)", lambda: apply_extract_transformations(
+                df_ext, "Fecha", "Concepto", "Debe/Haber", None, "Debito", "Credito",
+                ["IVA 21%"], True, 2, excluir_contains=["LEY 25413"])),
+            ("apply_system (columna unica)", lambda: apply_system_transformations(
+                df_sys, "Emision", "Vencimiento", "Columna unica", "Importe", None, None, 2, False)),
+            ("apply_system (debe/haber)", lambda: apply_system_transformations(
+                df_sys, "Emision", "Vencimiento", "Debe/Haber", None, "Debe", "Haber", 2, False)),
+        ]
+        sys_norm = None
+        for nombre, fn in casos:
+            seg, out = _tiempo(fn)
+            if nombre == "apply_system (debe/haber)":
+                sys_norm = out
+            print(f"{n:>9,} {nombre:<42} {seg:>8.3f} {n / seg:>12,.0f}")
+
+        seg, _ = _tiempo(lambda: split_system_unmatched_by_due(
+            sys_norm, "Emision", "Vencimiento", None, "Debe", "Haber", date(2024, 7, 1), "Debe/Haber"))
+        print(f"{n:>9,} {'split_system_unmatched_by_due':<42} {seg:>8.3f} {n / seg:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Conciliaciones en batch, sin UI (ver conciliacion/batch.py).
+
+Uso:
+    python -m conciliacion trabajos.json [--salida DIR] [--procesos N]
+"""
+
+import argparse
+import sys
+
+from .batch import load_jobs, run_batch
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m conciliacion", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    ap.add_argument("trabajos", help="archivo JSON con los trabajos (extracto + sistema + parámetros)")
+    ap.add_argument("--salida", help="carpeta de los reportes y resumen.json (pisa la del archivo)")
+    ap.add_argument("--procesos", type=int, help="procesos en paralelo (pisa el del archivo; por defecto, CPUs)")
+    args = ap.parse_args(argv)
+
+    try:
+        config = load_jobs(args.trabajos)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    salida = args.salida or config["salida"]
+    procesos = args.procesos or config["procesos"]
+
+    def _avisar(r):
+        if r["estado"] == "ok":
+            f = r["filas"]
+            print(f"ok     {r['nombre']:<24} {r['segundos']['total']:>8.2f}s  correctos={f['correctos']} "
+                  f"solo_extracto={f['solo_extracto']} vencidos={f['vencidos']} diferidos={f['diferidos']}")
+        else:
+            print(f"error  {r['nombre']:<24} {r['segundos']['total']:>8.2f}s  {r['error']}")
+
+    resumen = run_batch(config["trabajos"], salida, procesos, avisar=_avisar)
+    print(f"{resumen['ok']} ok, {resumen['errores']} con error en {resumen['segundos']:.2f}s "
+          f"({resumen['procesos']} procesos) -> {salida}")
+    return 1 if resumen["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
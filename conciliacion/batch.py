@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+"""
+Modo batch (sin UI): muchas conciliaciones desde un archivo de trabajos.
+
+    python -m conciliacion trabajos.json [--salida DIR] [--procesos N]
+
+Cada trabajo corre el mismo pipeline que app.py (lectura de las columnas
+mapeadas, normaliza / filtra extracto, transform sistema, match 1-1, grupos,
+vistas, split por vencimiento, descartados y reporte) en un proceso del
+pool. Escribo un reporte por trabajo (<nombre>.xlsx o <nombre>.zip) y
+resumen.json con filas y segundos por etapa de cada uno.
+
+Archivo de trabajos (JSON). Las claves de cada trabajo son las de
+"parametros" del manifest.json que exporta la app, así que un manifest sirve
+de plantilla:
+
+    {
+      "salida": "reportes",
+      "procesos": 4,
+      "defaults": {"decimales": 2, "ventana_dias": 5, "fecha_corte": "2025-06-30",
+                   "sistema": {"archivo": "mayor.xlsx", "hoja": "Mayor", "encabezado": 1,
+                               "emision": "Emision", "vencimiento": "Vto",
+                               "modo_importe": "Debe/Haber", "debe": "Debe", "haber": "Haber"}},
+      "trabajos": [
+        {"nombre": "galicia",
+         "extracto": {"archivo": "galicia.xlsx", "hoja": 0, "encabezado": 1,
+                      "fecha": "Fecha", "concepto": "Concepto",
+                      "modo_importe": "Columna unica", "importe": "Importe"},
+         "excluir_contains": ["SIRCREB"]}
+      ]
+    }
+
+- "defaults" se combina con cada trabajo (extracto / sistema clave por clave).
+- Las rutas relativas son relativas al archivo de trabajos.
+- hoja: número entero = posición (0 = primera); texto = nombre de la hoja,
+  aunque sea numérico ("2024"). En CSV no se usa.
+- encabezado: fila del encabezado contando desde 1 (como en la UI); en CSV no se usa.
+- modo_importe "Debe/Haber" necesita las dos columnas (debe y haber / debito y credito).
+- tolerancia_importe va en unidades de la clave entera (con 2 decimales, centavos),
+  igual que en el manifest.
+- Sin max_filas_grupo (o 0) no se buscan grupos.
+"""
+
+import json
+import os
+import shutil
+import time
+from datetime import date, datetime
+import pandas as pd
+
+from .exclusion import compile_exclusions
+from .export import BUNDLE_FORMATOS, RESUMEN_MODOS, report_tables, to_excel_streaming, to_zip_bundle
+from .matching import ASIGNACIONES, match_groups_by_amount_sum, match_one_to_one_by_amount_and_date
+from .transform import (
+    _mode_is_columna_unica,
+    apply_system_transformations,
+    build_group_view,
+    build_views_for_output,
+    filter_extract,
+    normalize_extract,
+    split_system_unmatched_by_due,
+    summarize_excluded,
+)
+from .utils import normalize_text
+
+FORMATOS = ("xlsx",) + BUNDLE_FORMATOS
+EXTENSIONES = (".csv", ".xls", ".xlsx")
+
+# valores de la UI cuando el trabajo no los trae
+_DEFAULTS = {
+    "decimales": 2,
+    "excluir_exact": [],
+    "excluir_contains": [],
+    "excluir_regex": [],
+    "fecha_corte": None,            # hoy
+    "ventana_dias": 0,
+    "ordenar_por_emision": True,
+    "asignacion": "secuencial",
+    "tolerancia_importe": 0,
+    "tolerancia_pct": 0.0,
+    "max_filas_grupo": 0,
+    "presupuesto_grupo": 5.0,
+    "formato": "xlsx",
+    "resumen": "completo",
+}
+_LADOS = {
+    # lado: (columnas siempre requeridas, importe en columna única, importe partido)
+    "extracto": (("fecha", "concepto"), ("importe",), ("debito", "credito")),
+    "sistema": (("emision", "vencimiento"), ("importe",), ("debe", "haber")),
+}
+
+
+# -----------------------------
+# Archivo de trabajos
+# -----------------------------
+def _combinar(defaults: dict, trabajo: dict) -> dict:
+    out = {**_DEFAULTS, **defaults, **trabajo}
+    for lado in _LADOS:
+        out[lado] = {**defaults.get(lado, {}), **trabajo.get(lado, {})}
+    return out
+
+
+def _es_entero(v) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _es_numero(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+# parámetros numéricos de un trabajo: (tipo, mínimo)
+_NUMERICOS = {
+    "decimales": (_es_entero, 0),
+    "ventana_dias": (_es_entero, 0),
+    "tolerancia_importe": (_es_entero, 0),
+    "tolerancia_pct": (_es_numero, 0),
+    "max_filas_grupo": (_es_entero, 0),
+    "presupuesto_grupo": (_es_numero, 0),
+}
+
+
+def _validar_tipos(nombre: str, t: dict):
+    """Tipos de lo que no es de un lado: numéricos, listas de exclusión y flags."""
+    if t["max_filas_grupo"] is None:
+        t["max_filas_grupo"] = 0
+    for clave, (es_tipo, minimo) in _NUMERICOS.items():
+        if not es_tipo(t[clave]) or t[clave] < minimo:
+            tipo = "un entero" if es_tipo is _es_entero else "un número"
+            raise ValueError(f"Trabajo {nombre!r}: {clave} debe ser {tipo} >= {minimo}, no {t[clave]!r}")
+    for clave in ("excluir_exact", "excluir_contains", "excluir_regex"):
+        if not isinstance(t[clave], list) or not all(isinstance(x, str) for x in t[clave]):
+            raise ValueError(f"Trabajo {nombre!r}: {clave} debe ser una lista de textos")
+    if not isinstance(t["ordenar_por_emision"], bool):
+        raise ValueError(f"Trabajo {nombre!r}: ordenar_por_emision debe ser true o false")
+
+
+def _validar_lado(nombre: str, lado: str, cfg: dict, base: str):
+    fijas, unica, partida = _LADOS[lado]
+    if not cfg.get("archivo"):
+        raise ValueError(f"Trabajo {nombre!r}: falta {lado}.archivo")
+    if not isinstance(cfg["archivo"], str):
+        raise ValueError(f"Trabajo {nombre!r}: {lado}.archivo debe ser una ruta (texto)")
+    cfg["archivo"] = os.path.join(base, cfg["archivo"])
+    if not cfg["archivo"].lower().endswith(EXTENSIONES):
+        raise ValueError(f"Trabajo {nombre!r}: formato no soportado en {cfg['archivo']} (usa .xls, .xlsx o .csv)")
+    if not os.path.exists(cfg["archivo"]):
+        raise ValueError(f"Trabajo {nombre!r}: no existe {cfg['archivo']}")
+    cfg.setdefault("hoja", 0)
+    if isinstance(cfg["hoja"], bool) or not isinstance(cfg["hoja"], (int, str)):
+        raise ValueError(f"Trabajo {nombre!r}: {lado}.hoja es un nombre (texto) o una posición (número entero)")
+    cfg.setdefault("encabezado", 1)
+    if not _es_entero(cfg["encabezado"]) or cfg["encabezado"] < 1:
+        raise ValueError(f"Trabajo {nombre!r}: {lado}.encabezado es un entero que cuenta desde 1, no {cfg['encabezado']!r}")
+    if not cfg.get("modo_importe") or not isinstance(cfg["modo_importe"], str):
+        raise ValueError(f"Trabajo {nombre!r}: falta {lado}.modo_importe (\"Columna unica\" o \"Debe/Haber\")")
+    requeridas = fijas + (unica if _mode_is_columna_unica(cfg["modo_importe"]) else ())
+    faltan = [c for c in requeridas if not cfg.get(c)]
+    if faltan:
+        raise ValueError(f"Trabajo {nombre!r}: faltan columnas de {lado}: {', '.join(faltan)}")
+    malas = [c for c in fijas + unica + partida if cfg.get(c) is not None and not isinstance(cfg[c], str)]
+    if malas:
+        raise ValueError(f"Trabajo {nombre!r}: columnas de {lado} que no son texto: {', '.join(malas)}")
+    if not _mode_is_columna_unica(cfg["modo_importe"]) and not all(cfg.get(c) for c in partida):
+        raise ValueError(f"Trabajo {nombre!r}: {lado} en modo Debe/Haber necesita {' y '.join(partida)}")
+
+
+def load_jobs(path: str) -> dict:
+    """
+    Leo y valido el archivo de trabajos. Devuelvo {"salida", "procesos",
+    "trabajos"} con cada trabajo completo (defaults, rutas absolutas,
+    fecha_corte como date). Cualquier error da ValueError.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Archivo de trabajos inválido ({path}): {e}")
+    trabajos = data.get("trabajos") if isinstance(data, dict) else None
+    if not trabajos:
+        raise ValueError(f"El archivo de trabajos no tiene 'trabajos': {path}")
+    if not isinstance(trabajos, list):
+        raise ValueError(f"'trabajos' debe ser una lista: {path}")
+
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("defaults", {})
+    if not isinstance(defaults, dict):
+        raise ValueError(f"'defaults' debe ser un objeto: {path}")
+    for lado in _LADOS:
+        if not isinstance(defaults.get(lado, {}), dict):
+            raise ValueError(f"'defaults.{lado}' debe ser un objeto: {path}")
+    if not isinstance(data.get("salida", ""), str):
+        raise ValueError(f"'salida' debe ser una ruta (texto): {path}")
+    procesos = data.get("procesos")
+    if procesos is not None and (not _es_entero(procesos) or procesos < 1):
+        raise ValueError(f"'procesos' debe ser un entero >= 1, no {procesos!r}: {path}")
+    vistos = set()
+    out = []
+    for i, trabajo in enumerate(trabajos, start=1):
+        if not isinstance(trabajo, dict):
+            raise ValueError(f"Trabajo #{i}: debe ser un objeto, no {type(trabajo).__name__}")
+        for lado in _LADOS:
+            if not isinstance(trabajo.get(lado, {}), dict):
+                raise ValueError(f"Trabajo #{i}: '{lado}' debe ser un objeto")
+        t = _combinar(defaults, trabajo)
+        archivo_ext = t["extracto"].get("archivo")
+        nombre = t.get("nombre") or f"{i:02d}-{os.path.splitext(os.path.basename(str(archivo_ext or 'trabajo')))[0]}"
+        nombre = str(nombre)
+        if nombre in vistos:
+            raise ValueError(f"Nombre de trabajo repetido: {nombre!r}")
+        vistos.add(nombre)
+        t["nombre"] = nombre
+        for lado in _LADOS:
+            if not t[lado]:
+                raise ValueError(f"Trabajo {nombre!r}: falta '{lado}' (ni en el trabajo ni en defaults)")
+            _validar_lado(nombre, lado, t[lado], base)
+        _validar_tipos(nombre, t)
+        if t["asignacion"] not in ASIGNACIONES:
+            raise ValueError(f"Trabajo {nombre!r}: asignación desconocida {t['asignacion']!r} (opciones: {', '.join(ASIGNACIONES)})")
+        if t["formato"] not in FORMATOS:
+            raise ValueError(f"Trabajo {nombre!r}: formato desconocido {t['formato']!r} (opciones: {', '.join(FORMATOS)})")
+        if t["resumen"] not in RESUMEN_MODOS:
+            raise ValueError(f"Trabajo {nombre!r}: resumen desconocido {t['resumen']!r} (opciones: {', '.join(RESUMEN_MODOS)})")
+        try:
+            t["fecha_corte"] = date.fromisoformat(str(t["fecha_corte"])) if t["fecha_corte"] else date.today()
+        except ValueError:
+            raise ValueError(f"Trabajo {nombre!r}: fecha_corte debe ser AAAA-MM-DD, no {t['fecha_corte']!r}")
+        try:
+            compile_exclusions(regex=t["excluir_regex"])
+        except ValueError as e:
+            raise ValueError(f"Trabajo {nombre!r}: {e}")
+        out.append(t)
+
+    return {
+        "salida": os.path.join(base, data.get("salida", "reportes")),
+        "procesos": procesos or os.cpu_count() or 1,
+        "trabajos": out,
+    }
+
+
+# -----------------------------
+# Un trabajo
+# -----------------------------
+def _leer(cfg: dict, columnas) -> pd.DataFrame:
+    """
+    Las columnas mapeadas de un archivo en disco. Como read_columns_cached:
+    ubico los nombres en el encabezado y leo por posición (tipos inferidos
+    por pandas, como read_any_excel).
+    """
+    path = cfg["archivo"]
+    es_csv = path.lower().endswith(".csv")
+    # entero del JSON = posición; texto = nombre, aunque sean dígitos ("2024")
+    hoja = cfg["hoja"]
+    if es_csv:
+        return _leer_columnas(lambda **kw: pd.read_csv(path, **kw), path, columnas)
+    # un solo libro abierto para el encabezado y los datos (como open_workbook)
+    with pd.ExcelFile(path) as xf:
+        return _leer_columnas(
+            lambda **kw: xf.parse(sheet_name=hoja, header=cfg["encabezado"] - 1, **kw), path, columnas,
+        )
+
+
+def _leer_columnas(leer, path: str, columnas) -> pd.DataFrame:
+    """leer(**kw): read_csv / parse de la hoja. Primero el encabezado, después solo las columnas pedidas."""
+    nombres = [str(c) for c in leer(nrows=0).columns]
+    faltan = [c for c in columnas if c is not None and str(c) not in nombres]
+    if faltan:
+        raise ValueError(f"Columnas que no están en {os.path.basename(path)}: {', '.join(map(str, faltan))} "
+                         f"(hay: {', '.join(nombres)})")
+    posiciones = sorted({nombres.index(str(c)) for c in columnas if c is not None})
+    df = leer(usecols=posiciones)
+    df.columns = [nombres[i] for i in posiciones]
+    return df
+
+
+def _etapa(tiempos: dict, nombre: str, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    tiempos[nombre] = round(time.perf_counter() - t0, 4)
+    return out
+
+
+def run_job(trabajo: dict, salida: str) -> dict:
+    """
+    Corro un trabajo completo y escribo su reporte en 'salida'. Devuelvo el
+    registro para resumen.json; si algo falla, estado "error" con el motivo
+    (un trabajo roto no corta el batch).
+    """
+    t0 = time.perf_counter()
+    registro = {"nombre": trabajo["nombre"], "estado": "ok", "error": None, "reporte": None,
+                "pid": os.getpid(), "filas": {}, "segundos": {}}
+    try:
+        _run_job(trabajo, salida, registro)
+    except Exception as e:
+        registro["estado"] = "error"
+        registro["error"] = f"{type(e).__name__}: {e}"
+    registro["segundos"]["total"] = round(time.perf_counter() - t0, 4)
+    return registro
+
+
+def _run_job(t: dict, salida: str, registro: dict):
+    ext, sys_ = t["extracto"], t["sistema"]
+    tiempos, filas = registro["segundos"], registro["filas"]
+    decimales = int(t["decimales"])
+    ext_cols = (ext["fecha"], ext["concepto"], ext.get("importe"), ext.get("debito"), ext.get("credito"))
+    sys_cols = (sys_["emision"], sys_["vencimiento"], sys_.get("importe"), sys_.get("debe"), sys_.get("haber"))
+
+    df_ext_raw = _etapa(tiempos, "lectura ext", lambda: _leer(ext, ext_cols))
+    df_sys_raw = _etapa(tiempos, "lectura sys", lambda: _leer(sys_, sys_cols))
+    filas["extracto"], filas["sistema"] = len(df_ext_raw), len(df_sys_raw)
+
+    df_ext_norm = _etapa(tiempos, "normaliza ext", lambda: normalize_extract(
+        df_ext_raw=df_ext_raw,
+        col_fecha=ext["fecha"],
+        col_concepto=ext["concepto"],
+        modo_importe=ext["modo_importe"],
+        col_importe=ext.get("importe"),
+        col_debito=ext.get("debito"),
+        col_credito=ext.get("credito"),
+        normalizar_texto=True,
+        decimales=decimales,
+    ))
+    # como en la UI: los conceptos ya están normalizados, las palabras clave también
+    excluir_contains = [normalize_text(x) for x in t["excluir_contains"]]
+    df_ext, df_ext_excl = _etapa(tiempos, "filtra ext", lambda: filter_extract(
+        df_ext_norm,
+        excluir_exact=t["excluir_exact"],
+        normalizar_texto=True,
+        excluir_contains=excluir_contains,
+        excluir_regex=t["excluir_regex"],
+    ))
+    df_sys = _etapa(tiempos, "transform sys", lambda: apply_system_transformations(
+        df_sys_raw=df_sys_raw,
+        col_emision=sys_["emision"],
+        col_venc=sys_["vencimiento"],
+        modo_importe=sys_["modo_importe"],
+        col_importe=sys_.get("importe"),
+        col_debe=sys_.get("debe"),
+        col_haber=sys_.get("haber"),
+        decimales=decimales,
+        usar_abs=False,
+    ))
+
+    # procesos=1: el paralelismo del batch es por trabajo, no dentro del match
+    pairs, used_sys, used_ext = _etapa(tiempos, "match", lambda: match_one_to_one_by_amount_and_date(
+        df_sys=df_sys,
+        df_ext=df_ext,
+        ventana_dias=int(t["ventana_dias"]),
+        ordenar_por_emision=bool(t["ordenar_por_emision"]),
+        asignacion=t["asignacion"],
+        tolerancia_importe=int(t["tolerancia_importe"]),
+        tolerancia_pct=float(t["tolerancia_pct"]),
+    ))
+    max_filas_grupo = t["max_filas_grupo"]
+    grupos, grupo_sys, grupo_ext = [], set(), set()
+    if max_filas_grupo:
+        grupos, grupo_sys, grupo_ext, completo = _etapa(tiempos, "grupos", lambda: match_groups_by_amount_sum(
+            df_sys=df_sys,
+            df_ext=df_ext,
+            used_sys=used_sys,
+            used_ext=used_ext,
+            ventana_dias=int(t["ventana_dias"]),
+            ordenar_por_emision=bool(t["ordenar_por_emision"]),
+            max_filas=max_filas_grupo,
+            presupuesto_seg=float(t["presupuesto_grupo"]),
+        ))
+        registro["grupos_completo"] = completo
+
+    correctos, solo_ext, solo_sys = _etapa(tiempos, "vistas", lambda: build_views_for_output(
+        pairs=pairs,
+        df_ext=df_ext,
+        df_sys=df_sys,
+        ext_cols=ext_cols,
+        sys_cols=sys_cols,
+        modo_importe_sys=sys_["modo_importe"],
+        modo_importe_ext=ext["modo_importe"],
+        used_ext=used_ext | grupo_ext,
+        used_sys=used_sys | grupo_sys,
+        decimales=decimales,
+    ))
+    agrupados = None
+    if max_filas_grupo:
+        agrupados = build_group_view(
+            grupos=grupos,
+            df_ext=df_ext,
+            df_sys=df_sys,
+            ext_cols=(ext["fecha"], ext["concepto"]),
+            sys_cols=(sys_["emision"], sys_["vencimiento"]),
+        )
+    vencidos, diferidos = _etapa(tiempos, "split", lambda: split_system_unmatched_by_due(
+        solo_sys=solo_sys,
+        col_emision=sys_["emision"],
+        col_venc=sys_["vencimiento"],
+        col_importe=sys_.get("importe"),
+        col_debe=sys_.get("debe"),
+        col_haber=sys_.get("haber"),
+        fecha_corte=t["fecha_corte"],
+        modo_importe=sys_["modo_importe"],
+    ))
+    descartados = _etapa(tiempos, "descartados", lambda: summarize_excluded(df_ext_excl))
+    filas.update({
+        "correctos": len(correctos),
+        "grupos": len(grupos),
+        "solo_extracto": len(solo_ext),
+        "vencidos": len(vencidos),
+        "diferidos": len(diferidos),
+        "descartados": len(df_ext_excl),
+    })
+
+    def _export():
+        sections, tablas = report_tables(
+            correctos, solo_ext, vencidos, diferidos,
+            agrupados=agrupados, descartados_resumen=descartados, df_ext_excl=df_ext_excl,
+        )
+        if t["formato"] == "xlsx":
+            archivo, destino = to_excel_streaming(sections, extra_sheets=tablas, resumen=t["resumen"]), ".xlsx"
+        else:
+            parametros = {k: v for k, v in t.items() if k not in ("nombre", "formato", "resumen")}
+            archivo, destino = to_zip_bundle(tablas, formato=t["formato"], parametros=parametros), ".zip"
+        destino = os.path.join(salida, t["nombre"] + destino)
+        with archivo, open(destino, "wb") as out:
+            shutil.copyfileobj(archivo, out)
+        return destino
+
+    registro["reporte"] = _etapa(tiempos, "export", _export)
+
+
+# -----------------------------
+# Batch
+# -----------------------------
+def run_batch(trabajos: list, salida: str, procesos: int = 1, avisar=None) -> dict:
+    """
+    Corro los trabajos en un ProcessPoolExecutor (procesos > 1) o en este
+    proceso, y escribo salida/resumen.json. 'avisar' recibe cada registro
+    apenas termina su trabajo. Devuelvo el resumen.
+    """
+    os.makedirs(salida, exist_ok=True)
+    procesos = max(1, min(int(procesos), len(trabajos)))
+    t0 = time.perf_counter()
+    registros = [None] * len(trabajos)
+    if procesos == 1:
+        for i, t in enumerate(trabajos):
+            registros[i] = run_job(t, salida)
+            if avisar:
+                avisar(registros[i])
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = {pool.submit(run_job, t, salida): i for i, t in enumerate(trabajos)}
+            for fut in as_completed(futuros):
+                registros[futuros[fut]] = fut.result()
+                if avisar:
+                    avisar(registros[futuros[fut]])
+
+    resumen = {
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "procesos": procesos,
+        "segundos": round(time.perf_counter() - t0, 4),
+        "ok": sum(r["estado"] == "ok" for r in registros),
+        "errores": sum(r["estado"] != "ok" for r in registros),
+        "trabajos": registros,
+    }
+    with open(os.path.join(salida, "resumen.json"), "w", encoding="utf-8") as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2, default=str)
+    return resumen
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Reglas de exclusión de conceptos del extracto: exacto, contiene y regex.
+
+Las reglas se compilan una vez (compile_exclusions) y se evalúan sobre los
+conceptos DISTINTOS (exclusion_reasons); apply_extract_transformations
+expande el resultado a las filas con los códigos de la columna category.
+
+- exacto: set.
+- contiene: todas las palabras clave en una sola regex armada como trie
+  (los prefijos comunes se comparten: "RET IVA", "RET IIBB" -> "RET I(?:VA|IBB)"),
+  que recorre cada concepto una vez. Solo para los conceptos que pegan
+  busco cuál de las palabras fue, respetando el orden de la lista.
+- regex: cada patrón compilado, en orden.
+
+El motivo (_MOTIVO_) dice qué regla disparó: EXACTO:<concepto>,
+CONTIENTE:<palabra> (así lo escribió siempre el filtro) o REGEX:<patrón>.
+
+Índice de conceptos (build_concept_index): los conceptos distintos del
+extracto normalizado con filas y total de cada uno, y trigramas para la
+búsqueda. Sale de la columna category, así que no vuelvo a normalizar ni a
+contar el archivo; con él, la checklist, la búsqueda y el impacto de las
+exclusiones miran solo conceptos distintos.
+"""
+
+import re
+import numpy as np
+
+REGLA_TIPOS = ("exacto", "contiene", "regex")
+
+
+def _trie_regex(palabras) -> str:
+    """Alternancia de las palabras como trie: un solo recorrido por posición en vez de probar cada una."""
+    trie = {}
+    for p in palabras:
+        nodo = trie
+        for ch in p:
+            nodo = nodo.setdefault(ch, {})
+        nodo[""] = True
+
+    def _emitir(nodo) -> str:
+        fin = "" in nodo
+        ramas = [re.escape(ch) + _emitir(hijo) for ch, hijo in sorted(nodo.items()) if ch != ""]
+        if not ramas:
+            return ""
+        cuerpo = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+        if fin:
+            # la palabra puede terminar acá: el resto es opcional
+            return "(?:" + cuerpo + ")?"
+        return cuerpo
+
+    return _emitir(trie)
+
+
+def compile_exclusions(exact=(), contains=(), regex=()) -> dict:
+    """
+    Compilo las reglas. 'exact' ya viene normalizado como los conceptos;
+    'contains' y 'regex' se usan tal cual. Una regex inválida da ValueError.
+    """
+    contains = list(dict.fromkeys(contains))
+    compiladas = []
+    for patron in dict.fromkeys(regex):
+        try:
+            compiladas.append((patron, re.compile(patron)))
+        except re.error as e:
+            raise ValueError(f"Regex de exclusión inválida {patron!r}: {e}")
+    return {
+        "exact": set(exact),
+        "contains": contains,
+        "contains_re": re.compile(_trie_regex(contains)) if contains else None,
+        "regex": compiladas,
+    }
+
+
+def exclusion_reason(concepto: str, reglas: dict):
+    """Motivo de exclusión de un concepto (primera regla que dispara) o None."""
+    if concepto in reglas["exact"]:
+        return f"EXACTO:{concepto}"
+    if reglas["contains_re"] is not None and reglas["contains_re"].search(concepto):
+        for kw in reglas["contains"]:
+            if kw in concepto:
+                return f"CONTIENTE:{kw}"
+    for patron, rx in reglas["regex"]:
+        if rx.search(concepto):
+            return f"REGEX:{patron}"
+    return None
+
+
+def exclusion_reasons(conceptos, reglas: dict) -> np.ndarray:
+    """exclusion_reason para cada concepto distinto (array object, None = se queda)."""
+    return np.array([exclusion_reason(c, reglas) for c in conceptos], dtype=object)
+
+
+def parse_exclusion_rules(texto: str) -> dict:
+    """
+    Reglas escritas una por línea: "exacto:...", "contiene:..." o
+    "regex:...". Sin prefijo es "contiene". Las líneas vacías y las que
+    empiezan con # se ignoran. Devuelvo {"exacto": [...], "contiene": [...], "regex": [...]}.
+    """
+    reglas = {t: [] for t in REGLA_TIPOS}
+    for linea in (texto or "").splitlines():
+        linea = linea.strip()
+        if not linea or linea.startswith("#"):
+            continue
+        tipo, sep, valor = linea.partition(":")
+        tipo = tipo.strip().lower()
+        if sep and tipo in REGLA_TIPOS:
+            valor = valor.strip()
+        else:
+            tipo, valor = "contiene", linea
+        if valor:
+            reglas[tipo].append(valor)
+    return reglas
+
+
+# -----------------------------
+# Índice de conceptos
+# -----------------------------
+def _trigramas(texto: str) -> set:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def build_concept_index(df_ext) -> dict:
+    """
+    Índice del extracto normalizado (sin filtrar): conceptos distintos
+    ordenados por frecuencia (desc), filas y total (_IMPORTE_SIGNED_) de
+    cada uno, y posiciones por trigrama para search_concepts.
+    """
+    cat = df_ext["_CONCEPTO_"].cat
+    codes = cat.codes.to_numpy()
+    n = len(cat.categories)
+    validos = codes >= 0
+    filas = np.bincount(codes[validos], minlength=n)
+    importes = df_ext["_IMPORTE_SIGNED_"].to_numpy(dtype="float64", na_value=np.nan)
+    total = np.bincount(codes[validos], weights=np.nan_to_num(importes[validos]), minlength=n)
+
+    orden = np.argsort(-filas, kind="stable")
+    conceptos = np.asarray(cat.categories, dtype=object)[orden]
+    filas, total = filas[orden], total[orden]
+    presentes = filas > 0
+    conceptos, filas, total = conceptos[presentes], filas[presentes], total[presentes]
+
+    trigramas = {}
+    for i, c in enumerate(conceptos):
+        for g in _trigramas(c):
+            trigramas.setdefault(g, []).append(i)
+    return {
+        "conceptos": conceptos,
+        "filas": filas,
+        "total": total,
+        "trigramas": {g: np.array(pos, dtype=np.int64) for g, pos in trigramas.items()},
+    }
+
+
+def search_concepts(indice: dict, texto: str) -> list:
+    """
+    Conceptos que contienen 'texto' (ya normalizado), en orden de frecuencia.
+    Con 3 o más letras intersecto las posiciones de sus trigramas y confirmo
+    con 'in' solo esos candidatos; más corto, recorro los conceptos.
+    """
+    if not texto:
+        return []
+    conceptos = indice["conceptos"]
+    if len(texto) < 3:
+        return [c for c in conceptos if texto in c]
+    candidatos = None
+    for g in _trigramas(texto):
+        pos = indice["trigramas"].get(g)
+        if pos is None:
+            return []
+        candidatos = pos if candidatos is None else np.intersect1d(candidatos, pos, assume_unique=True)
+        if not len(candidatos):
+            return []
+    return [conceptos[i] for i in candidatos if texto in conceptos[i]]
+
+
+def exclusion_impact(indice: dict, reglas: dict) -> tuple:
+    """(filas, total) que sacarían las reglas compiladas, evaluadas sobre el índice."""
+    motivos = exclusion_reasons(indice["conceptos"], reglas)
+    sale = np.array([m is not None for m in motivos], dtype=bool)
+    return int(indice["filas"][sale].sum()), float(indice["total"][sale].sum())
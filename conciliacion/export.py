@@ -1,26 +1,80 @@
 # -*- coding: utf-8 -*-
 """
 Exportación a Excel con hoja Resumen y hojas separadas por tabla.
+
+to_excel_with_sections arma el libro en memoria (pandas + openpyxl).
+to_excel_streaming escribe el mismo libro fila a fila (openpyxl write-only)
+a un archivo temporal en disco: memoria constante para reportes grandes.
+to_zip_bundle: las mismas tablas como CSV / Parquet en un ZIP con manifiesto.
+report_tables: las secciones y tablas del reporte de una conciliación (app y batch).
 """
 
-from io import BytesIO
+import json
+import tempfile
+import zipfile
+from datetime import datetime
+from io import BytesIO, TextIOWrapper
 import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from .utils import parse_number_locale_series
+
+# "completo": Resumen con todas las filas de cada sección (duplica las hojas)
+# "conteos": Resumen con una fila por sección (cantidad y total)
+RESUMEN_MODOS = ("completo", "conteos")
+
+
+def _total_seccion(df: pd.DataFrame):
+    """Total de importes de una sección: columna Importe*/Total, o Debe - Haber. None si no hay."""
+    cols = [str(c) for c in df.columns]
+    for c in cols:
+        if c.startswith("Importe") or c == "Total":
+            return parse_number_locale_series(df[c]).sum()
+    debe = next((c for c in cols if c.startswith("Debe")), None)
+    haber = next((c for c in cols if c.startswith("Haber")), None)
+    if debe or haber:
+        total = 0.0
+        if debe:
+            total += parse_number_locale_series(df[debe]).sum()
+        if haber:
+            total -= parse_number_locale_series(df[haber]).sum()
+        return total
+    return None
+
+
+def _resumen_conteos(sections: list) -> pd.DataFrame:
+    rows = []
+    for title, df in sections:
+        tiene = isinstance(df, pd.DataFrame) and not df.empty
+        rows.append({
+            "Sección": title,
+            "Filas": len(df) if tiene else 0,
+            "Total importe": _total_seccion(df) if tiene else 0.0,
+        })
+    return pd.DataFrame(rows)
+
 
+def to_excel_with_sections(sections: list, extra_sheets: dict = None, resumen: str = "completo") -> BytesIO:
+    if resumen not in RESUMEN_MODOS:
+        raise ValueError(f"Modo de resumen desconocido: {resumen!r} (opciones: {', '.join(RESUMEN_MODOS)})")
 
-def to_excel_with_sections(sections: list, extra_sheets: dict = None) -> BytesIO:
     output = BytesIO()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        startrow = 0
         sheet = "Resumen"
-        for title, df in sections:
-            pd.DataFrame({"Sección": [title]}).to_excel(writer, sheet_name=sheet, startrow=startrow, index=False)
-            startrow += 1
-            if isinstance(df, pd.DataFrame) and not df.empty:
-                df.to_excel(writer, sheet_name=sheet, startrow=startrow, index=False)
-                startrow += len(df) + 2
-            else:
-                pd.DataFrame({"(sin filas)": []}).to_excel(writer, sheet_name=sheet, startrow=startrow, index=False)
-                startrow += 3
+        if resumen == "conteos":
+            _resumen_conteos(sections).to_excel(writer, sheet_name=sheet, index=False)
+        else:
+            startrow = 0
+            for title, df in sections:
+                pd.DataFrame({"Sección": [title]}).to_excel(writer, sheet_name=sheet, startrow=startrow, index=False)
+                startrow += 1
+                if isinstance(df, pd.DataFrame) and not df.empty:
+                    df.to_excel(writer, sheet_name=sheet, startrow=startrow, index=False)
+                    startrow += len(df) + 2
+                else:
+                    pd.DataFrame({"(sin filas)": []}).to_excel(writer, sheet_name=sheet, startrow=startrow, index=False)
+                    startrow += 3
 
         if extra_sheets:
             for name, df in extra_sheets.items():
@@ -31,3 +85,224 @@ def to_excel_with_sections(sections: list, extra_sheets: dict = None) -> BytesIO
 
     output.seek(0)
     return output
+
+
+# --------------------------------------
+# Escritura en streaming (write-only)
+# --------------------------------------
+# mismo estilo de encabezado que pone pandas.to_excel
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(*(Side(style="thin"),) * 4)
+_HEADER_ALIGN = Alignment(horizontal="center", vertical="top")
+
+
+def _header(ws, cols) -> list:
+    celdas = []
+    for c in cols:
+        cell = WriteOnlyCell(ws, value=str(c))
+        cell.font = _HEADER_FONT
+        cell.border = _HEADER_BORDER
+        cell.alignment = _HEADER_ALIGN
+        celdas.append(cell)
+    return celdas
+
+
+def _filas(df: pd.DataFrame):
+    """Filas como tuplas de valores de Python (NA/NaT -> celda vacía), columna por columna."""
+    cols = []
+    for c in range(df.shape[1]):
+        s = df.iloc[:, c]
+        vals = s.to_numpy(dtype=object)
+        na = s.isna().to_numpy()
+        if na.any():
+            vals = vals.copy()
+            vals[na] = None
+        cols.append(vals)
+    return zip(*cols)
+
+
+def _write_frame(ws, df: pd.DataFrame):
+    ws.append(_header(ws, df.columns))
+    for fila in _filas(df):
+        ws.append(fila)
+
+
+def to_excel_streaming(sections: list, extra_sheets: dict = None, resumen: str = "completo"):
+    """
+    Mismo libro que to_excel_with_sections (celda por celda: las filas de
+    "Sección", los huecos entre tablas y las hojas extra) pero escrito en
+    modo write-only: openpyxl vuelca cada hoja a disco a medida que agrego
+    filas. El .xlsx queda en un archivo temporal (se borra al cerrarlo) que
+    devuelvo abierto y al inicio, listo para st.download_button.
+    """
+    if resumen not in RESUMEN_MODOS:
+        raise ValueError(f"Modo de resumen desconocido: {resumen!r} (opciones: {', '.join(RESUMEN_MODOS)})")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Resumen")
+    if resumen == "conteos":
+        _write_frame(ws, _resumen_conteos(sections))
+    else:
+        # el encabezado de cada tabla pisa la fila del título (igual que el
+        # writer en memoria): queda "Sección", la tabla y una fila vacía
+        for _, df in sections:
+            ws.append(_header(ws, ["Sección"]))
+            if isinstance(df, pd.DataFrame) and not df.empty:
+                _write_frame(ws, df)
+                ws.append([])
+            else:
+                ws.append(_header(ws, ["(sin filas)"]))
+                ws.append([])
+                ws.append([])
+
+    if extra_sheets:
+        for name, df in extra_sheets.items():
+            ws = wb.create_sheet(name[:31])
+            if isinstance(df, pd.DataFrame) and not df.empty:
+                _write_frame(ws, df)
+            else:
+                _write_frame(ws, pd.DataFrame({"Info": ["(sin filas)"]}))
+
+    output = tempfile.TemporaryFile(suffix=".xlsx")
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def report_tables(
+    correctos: pd.DataFrame,
+    solo_ext: pd.DataFrame,
+    vencidos: pd.DataFrame,
+    diferidos: pd.DataFrame,
+    agrupados: pd.DataFrame = None,
+    descartados_resumen: pd.DataFrame = None,
+    df_ext_excl: pd.DataFrame = None,
+) -> tuple[list, dict]:
+    """
+    Secciones de la hoja Resumen y tablas del reporte (hojas / archivos del
+    ZIP). agrupados None = sin etapa de grupos. Devuelvo (sections, tablas).
+    """
+    sections = [
+        ("Correctos (en ambos)", correctos),
+    ]
+    if agrupados is not None:
+        sections.append(("Agrupados (N-1 / 1-N)", agrupados))
+    sections += [
+        ("Solo en Extracto", solo_ext),
+        ("Sistema sin Extracto — Vencidos", vencidos),
+        ("Sistema sin Extracto — Diferidos", diferidos),
+    ]
+    if descartados_resumen is not None and not descartados_resumen.empty:
+        sections.append(("Descartados (resumen por concepto)", descartados_resumen))
+
+    tablas = {
+        "Correctos": correctos,
+    }
+    if agrupados is not None:
+        tablas["Agrupados"] = agrupados
+    tablas.update({
+        "Solo_Extracto": solo_ext,
+        "Sistema_Sin_Extracto_Vencidos": vencidos,
+        "Sistema_Sin_Extracto_Diferidos": diferidos,
+    })
+    if df_ext_excl is not None and not df_ext_excl.empty:
+        detalle = df_ext_excl[["_FECHA_", "_CONCEPTO_", "_IMPORTE_SIGNED_", "_MOTIVO_"]].rename(columns={
+            "_FECHA_": "Fecha",
+            "_CONCEPTO_": "Concepto",
+            "_IMPORTE_SIGNED_": "Importe",
+            "_MOTIVO_": "Motivo"
+        })
+        detalle["Fecha"] = detalle["Fecha"].dt.date
+        tablas["Descartados_Detalle"] = detalle
+        tablas["Descartados_Resumen"] = descartados_resumen
+    return sections, tablas
+
+
+# --------------------------------------
+# Bundle ZIP (CSV / Parquet + manifiesto)
+# --------------------------------------
+BUNDLE_FORMATOS = ("csv", "parquet", "csv+parquet")
+_CHUNK_FILAS = 50_000
+
+
+def _arrow_friendly(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas object con tipos mezclados (típico de Excel crudo) pasan a texto; el resto queda igual."""
+    import pyarrow as pa
+
+    out = df
+    for c in df.columns:
+        if df[c].dtype != object:
+            continue
+        try:
+            pa.array(df[c], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if out is df:
+                out = df.copy()
+            out[c] = df[c].map(lambda v: None if pd.isna(v) else str(v)).astype(object)
+    # rename y no out.columns = ...: si out es df, renombraría el frame del que llama
+    if not all(isinstance(c, str) for c in out.columns):
+        out = out.rename(columns=str)
+    return out
+
+
+def _write_csv(zf, name: str, df: pd.DataFrame):
+    with zf.open(name, "w", force_zip64=True) as raw, TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+        for i in range(0, max(len(df), 1), _CHUNK_FILAS):
+            df.iloc[i:i + _CHUNK_FILAS].to_csv(f, index=False, header=(i == 0))
+
+
+def _write_parquet(zf, name: str, df: pd.DataFrame):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = _arrow_friendly(df)
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with zf.open(name, "w", force_zip64=True) as raw, pq.ParquetWriter(raw, schema) as writer:
+        for i in range(0, max(len(df), 1), _CHUNK_FILAS):
+            chunk = df.iloc[i:i + _CHUNK_FILAS]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def to_zip_bundle(tables: dict, formato: str = "csv", parametros: dict = None):
+    """
+    Un ZIP con un archivo por tabla (CSV y/o Parquet) y manifest.json con los
+    parámetros de la corrida y las filas de cada tabla. Cada tabla se escribe
+    por bloques de filas directo a su entrada del ZIP, y el ZIP va a un archivo
+    temporal (como to_excel_streaming): devuelvo el archivo abierto y al inicio.
+    Parquet necesita pyarrow.
+    """
+    if formato not in BUNDLE_FORMATOS:
+        raise ValueError(f"Formato de bundle desconocido: {formato!r} (opciones: {', '.join(BUNDLE_FORMATOS)})")
+    if "parquet" in formato:
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError("El formato Parquet necesita pyarrow instalado.")
+
+    manifest = {
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "formato": formato,
+        "parametros": parametros or {},
+        "tablas": {},
+    }
+    output = tempfile.TemporaryFile(suffix=".zip")
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, df in tables.items():
+            if not isinstance(df, pd.DataFrame):
+                df = pd.DataFrame()
+            archivos = []
+            if "csv" in formato:
+                archivos.append(f"{name}.csv")
+                _write_csv(zf, archivos[-1], df)
+            if "parquet" in formato:
+                archivos.append(f"{name}.parquet")
+                _write_parquet(zf, archivos[-1], df)
+            manifest["tablas"][name] = {
+                "filas": len(df),
+                "columnas": [str(c) for c in df.columns],
+                "archivos": archivos,
+            }
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2, default=str))
+
+    output.seek(0)
+    return output
@@ -2,68 +2,67 @@
 """
 Matching 1-1 por monto con signo (clave entera) y fecha cercana.
 Delta de fecha = mínimo(|ext - EMISION|, |ext - VENC|).
+Después, grupos N-1 / 1-N sobre lo que quedó libre (suma exacta de claves).
 """
 
+import heapq
+import time
+import numpy as np
 import pandas as pd
+from bisect import bisect_left
 from collections import defaultdict
+from itertools import combinations
+from .utils import date_ordinals, NAT_ORDINAL
 
+MOTORES = ("columnar", "clasico")
+ASIGNACIONES = ("secuencial", "global")
 
-def _to_ordinal_safe(x):
-    """Ordena fechas sin romper por NaT/None/valores raros."""
-    if isinstance(x, pd.Timestamp):
-        try:
-            x = x.date()
-        except Exception:
-            return 10**12
-    if x is None:
-        return 10**12
-    try:
-        if pd.isna(x):
-            return 10**12
-    except Exception:
-        pass
-    try:
-        return x.toordinal()
-    except Exception:
-        try:
-            ts = pd.to_datetime(x, errors="coerce")
-            if pd.isna(ts):
-                return 10**12
-            return ts.date().toordinal()
-        except Exception:
-            return 10**12
+# delta asignado cuando falta alguna de las fechas (igual que el motor clásico)
+_DELTA_INVALIDA = 999_999
+# emisiones inválidas van al final cuando se ordena por emisión
+_ORDEN_SIN_FECHA = 10**12
+# hasta este tamaño de tramo (misma clave) recorro en Python en vez de NumPy
+_TRAMO_CHICO = 32
+# desde este tamaño el tramo se indexa por fecha (búsqueda O(log n))
+_TRAMO_GRANDE = 512
 
 
-def _days_diff_min(ext_fecha, emision, venc):
-    """Delta mínimo en días contra Emisión y Vencimiento (ignora inválidas)."""
+def _days_diff_min(ext_ord, emision_ord, venc_ord):
+    """Delta mínimo en días contra Emisión y Vencimiento (ordinales; ignora inválidas)."""
     def _delta(a, b):
-        try:
-            ta = pd.to_datetime(a, errors="coerce")
-            tb = pd.to_datetime(b, errors="coerce")
-            if pd.isna(ta) or pd.isna(tb):
-                return 999_999
-            return abs((ta - tb).days)
-        except Exception:
+        if a == NAT_ORDINAL or b == NAT_ORDINAL:
             return 999_999
-    de = _delta(ext_fecha, emision)
-    dv = _delta(ext_fecha, venc)
+        return abs(int(a) - int(b))
+    de = _delta(ext_ord, emision_ord)
+    dv = _delta(ext_ord, venc_ord)
     return min(de, dv)
 
 
-def match_one_to_one_by_amount_and_date(
-    df_sys: pd.DataFrame,
-    df_ext: pd.DataFrame,
-    ventana_dias: int,
-    ordenar_por_emision: bool,
-):
-    """
-    Claves enteras (centavos):
-      - Extracto: _AMT_KEY_
-      - Sistema: _AMT_KEY_DEBE_POS (positivo), _AMT_KEY_HABER_NEG (negativo),
-                 _AMT_KEY_PRIMARY_ (fallback)
-    """
-    ext_idx = df_ext.reset_index().rename(columns={"index": "_EXT_ID_"})
-    sys_idx = df_sys.reset_index().rename(columns={"index": "_SYS_ID_"})
+# columnas que lee el matcher (el resto de la fila no se copia)
+_SYS_COLS = ("_EMISION_", "_VENC_", "_AMT_KEY_DEBE_POS", "_AMT_KEY_HABER_NEG", "_AMT_KEY_PRIMARY_")
+_EXT_COLS = ("_FECHA_", "_AMT_KEY_")
+
+# tabla de pares que devuelve el matcher: ids (índice de df_sys/df_ext) y deltas
+PARES_COLS = ("_SYS_ID_", "_EXT_ID_", "_DELTA_DIAS_", "_DELTA_IMPORTE_")
+
+
+def _indexed_frames(df_sys: pd.DataFrame, df_ext: pd.DataFrame):
+    """Frames con _SYS_ID_/_EXT_ID_ y las fechas como ordinales enteros (días)."""
+    ext_idx = df_ext[[c for c in _EXT_COLS if c in df_ext.columns]]
+    sys_idx = df_sys[[c for c in _SYS_COLS if c in df_sys.columns]]
+    ext_idx = ext_idx.reset_index(names="_EXT_ID_")
+    sys_idx = sys_idx.reset_index(names="_SYS_ID_")
+
+    # fechas como ordinales enteros (días), calculados una sola vez
+    ext_idx["_FECHA_ORD_"] = date_ordinals(ext_idx["_FECHA_"])
+    sys_idx["_EMISION_ORD_"] = date_ordinals(sys_idx["_EMISION_"])
+    sys_idx["_VENC_ORD_"] = date_ordinals(sys_idx["_VENC_"])
+    return sys_idx, ext_idx
+
+
+def _match_clasico(df_sys, df_ext, ventana_dias, ordenar_por_emision):
+    """Motor original: recorre filas (dicts) y compara candidato por candidato."""
+    sys_idx, ext_idx = _indexed_frames(df_sys, df_ext)
 
     # index del extracto por clave entera
     ext_by_key = defaultdict(list)
@@ -76,7 +75,8 @@ def match_one_to_one_by_amount_and_date(
 
     sys_rows = list(sys_idx.to_dict("records"))
     if ordenar_por_emision:
-        sys_rows.sort(key=lambda r: _to_ordinal_safe(r.get("_EMISION_")))
+        # emisiones inválidas al final (sort estable)
+        sys_rows.sort(key=lambda r: _ORDEN_SIN_FECHA if r["_EMISION_ORD_"] == NAT_ORDINAL else r["_EMISION_ORD_"])
 
     for s in sys_rows:
         if s["_SYS_ID_"] in used_sys:
@@ -98,7 +98,7 @@ def match_one_to_one_by_amount_and_date(
             if not pool:
                 continue
             for e in pool:
-                min_delta = _days_diff_min(e.get("_FECHA_"), s.get("_EMISION_"), s.get("_VENC_"))
+                min_delta = _days_diff_min(e["_FECHA_ORD_"], s["_EMISION_ORD_"], s["_VENC_ORD_"])
                 if ventana_dias > 0 and min_delta > ventana_dias:
                     continue
                 if best_delta is None or min_delta < best_delta:
@@ -106,8 +106,844 @@ def match_one_to_one_by_amount_and_date(
                     best_e = e
 
         if best_e is not None:
-            pairs.append((s, best_e, best_delta if best_delta is not None else 0))
+            pairs.append((s["_SYS_ID_"], best_e["_EXT_ID_"], best_delta if best_delta is not None else 0))
             used_sys.add(s["_SYS_ID_"])
             used_ext.add(best_e["_EXT_ID_"])
 
-    return pairs, used_sys, used_ext
+    sys_ids, ext_ids, deltas = (list(x) for x in zip(*pairs)) if pairs else ([], [], [])
+    return _pares(sys_ids, ext_ids, deltas, [0] * len(deltas)), used_sys, used_ext
+
+
+def _pares(sys_ids, ext_ids, deltas, deltas_importe) -> pd.DataFrame:
+    """Pares como columnas alineadas (ver PARES_COLS), sin materializar filas."""
+    return pd.DataFrame({
+        "_SYS_ID_": sys_ids,
+        "_EXT_ID_": ext_ids,
+        "_DELTA_DIAS_": np.asarray(deltas, dtype="int64"),
+        "_DELTA_IMPORTE_": np.asarray(deltas_importe, dtype="int64"),
+    }, columns=list(PARES_COLS))
+
+
+def _key_array(df: pd.DataFrame, col: str):
+    """Columna de clave -> (int64, máscara de válidos). Si no existe, todo inválido."""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype="int64"), np.zeros(len(df), dtype=bool)
+    s = df[col].astype("Int64")
+    return s.to_numpy(dtype="int64", na_value=0), s.notna().to_numpy(dtype=bool)
+
+
+def _sys_key_arrays(sys_idx: pd.DataFrame):
+    """
+    Claves candidatas de cada fila del sistema, en el orden en que se prueban:
+    Debe (+) y Haber (-) si existen; si no hay ninguna, la primaria.
+    Devuelvo dos pares (clave, válida): primera y segunda clave a probar.
+    """
+    debe, debe_ok = _key_array(sys_idx, "_AMT_KEY_DEBE_POS")
+    haber, haber_ok = _key_array(sys_idx, "_AMT_KEY_HABER_NEG")
+    prim, prim_ok = _key_array(sys_idx, "_AMT_KEY_PRIMARY_")
+
+    k1 = np.where(debe_ok, debe, np.where(haber_ok, haber, prim))
+    k1_ok = debe_ok | haber_ok | prim_ok
+    k2 = haber
+    k2_ok = debe_ok & haber_ok
+    return (k1, k1_ok), (k2, k2_ok)
+
+
+def _arrays(sys_idx: pd.DataFrame, ext_idx: pd.DataFrame) -> dict:
+    """
+    Todo lo que leen los motores columnares, como arrays NumPy: claves
+    (int64 + válida) y fechas (ordinales). Es también lo único que viaja a
+    los procesos en el modo paralelo.
+    """
+    ext_key, ext_ok = _key_array(ext_idx, "_AMT_KEY_")
+    (k1, k1_ok), (k2, k2_ok) = _sys_key_arrays(sys_idx)
+    return {
+        "ext_key": ext_key,
+        "ext_ok": ext_ok,
+        "ext_fecha": ext_idx["_FECHA_ORD_"].to_numpy(dtype="int64"),
+        "k1": k1,
+        "k1_ok": k1_ok,
+        "k2": k2,
+        "k2_ok": k2_ok,
+        "emision": sys_idx["_EMISION_ORD_"].to_numpy(dtype="int64"),
+        "venc": sys_idx["_VENC_ORD_"].to_numpy(dtype="int64"),
+    }
+
+
+def _ext_tramos(arr: dict):
+    """
+    Extracto ordenado por (clave, posición): cada clave válida queda en un
+    tramo contiguo de 'orden'. Devuelvo (orden, {clave: (inicio, fin)}, fechas).
+    """
+    ext_key, ext_ok, ext_fecha = arr["ext_key"], arr["ext_ok"], arr["ext_fecha"]
+
+    validas = np.flatnonzero(ext_ok)
+    orden = validas[np.argsort(ext_key[validas], kind="stable")]
+    claves, inicio, cuenta = np.unique(ext_key[orden], return_index=True, return_counts=True)
+    tramos = {int(k): (int(i), int(i + c)) for k, i, c in zip(claves, inicio, cuenta)}
+    return orden, tramos, ext_fecha
+
+
+def _sys_fechas_y_orden(arr: dict, ordenar_por_emision: bool):
+    """Ordinales de emisión/vencimiento y el orden en que se recorre el sistema."""
+    emision, venc = arr["emision"], arr["venc"]
+    sys_orden = np.arange(len(emision))
+    if ordenar_por_emision:
+        # emisiones inválidas al final (sort estable)
+        clave_orden = np.where(emision == NAT_ORDINAL, _ORDEN_SIN_FECHA, emision)
+        sys_orden = np.argsort(clave_orden, kind="stable")
+    return emision, venc, sys_orden
+
+
+def _uf_find(parent: list, i: int) -> int:
+    """Raíz de i en un union-find de "siguiente libre" (con compresión de caminos)."""
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+class _TramoIndexado:
+    """
+    Índice de un tramo del extracto (todas las filas con la misma clave) para
+    montos repetidos: fechas ordenadas + union-find de "siguiente libre" hacia
+    cada lado, así la fila libre más cercana a una fecha sale en O(log n) y
+    consumir una fila es O(1) amortizado (en vez de re-filtrar el tramo).
+
+    Reproduce exactamente el criterio del greedy: menor delta contra
+    emisión/vencimiento y, a igual delta, la fila que aparece primero.
+    """
+
+    def __init__(self, cand: np.ndarray, ext_fecha: np.ndarray):
+        f = ext_fecha[cand]
+        ok = f != NAT_ORDINAL
+        validos, fechas = cand[ok], f[ok]
+        o = np.lexsort((validos, fechas))
+        # filas con fecha, ordenadas por (fecha, posición)
+        self.fechas = fechas[o].tolist()
+        self.pos_f = validos[o].tolist()
+        # filas sin fecha y todas las filas, en orden de aparición
+        self.pos_nat = cand[~ok].tolist()
+        self.pos_all = cand.tolist()
+
+        m = len(self.pos_f)
+        self._der = list(range(m + 1))    # der[i]: primera libre >= i (m = ninguna)
+        self._izq = list(range(m + 1))    # izq[i + 1]: última libre <= i (0 = ninguna)
+        self._sig_nat = list(range(len(self.pos_nat) + 1))
+        self._sig_all = list(range(len(self.pos_all) + 1))
+
+        self._slot_f = {p: i for i, p in enumerate(self.pos_f)}
+        self._slot_nat = {p: i for i, p in enumerate(self.pos_nat)}
+        self._slot_all = {p: i for i, p in enumerate(self.pos_all)}
+
+    def _libre_desde(self, i: int) -> int:
+        return _uf_find(self._der, i)
+
+    def _libre_hasta(self, i: int) -> int:
+        return _uf_find(self._izq, i + 1) - 1
+
+    def _mas_cercano(self, refs: list):
+        """(delta, posición) de la fila con fecha más cercana a alguna referencia."""
+        fechas = self.fechas
+        m = len(fechas)
+        mejores = []
+        for r in refs:
+            i = bisect_left(fechas, r)
+            j = self._libre_desde(i)
+            if j < m:
+                mejores.append((fechas[j] - r, j))
+            l = self._libre_hasta(i - 1)
+            if l >= 0:
+                # de ese día, la primera libre (menor posición)
+                mejores.append((r - fechas[l], self._libre_desde(bisect_left(fechas, fechas[l]))))
+        if not mejores:
+            return None
+        d = min(x[0] for x in mejores)
+        return d, min(self.pos_f[j] for dd, j in mejores if dd == d)
+
+    def mejor(self, em: int, ve: int, ventana_dias: int):
+        """(delta, posición) del mejor candidato libre para la fila del sistema, o None."""
+        permite_invalida = ventana_dias <= 0 or ventana_dias >= _DELTA_INVALIDA
+        refs = [r for r in (em, ve) if r != NAT_ORDINAL]
+        best = self._mas_cercano(refs) if refs else None
+
+        if len(refs) < 2 and (best is None or best[0] >= _DELTA_INVALIDA):
+            # con una referencia inválida el delta se topea en 999_999: si nada
+            # queda más cerca, todas empatan y gana la primera libre del tramo
+            if not permite_invalida:
+                return None
+            k = _uf_find(self._sig_all, 0)
+            return (_DELTA_INVALIDA, self.pos_all[k]) if k < len(self.pos_all) else None
+
+        if best is not None and ventana_dias > 0 and best[0] > ventana_dias:
+            best = None
+        if permite_invalida:
+            k = _uf_find(self._sig_nat, 0)
+            if k < len(self.pos_nat):
+                nat = (_DELTA_INVALIDA, self.pos_nat[k])
+                best = nat if best is None or nat < best else best
+        return best
+
+    def consumir(self, pos: int):
+        i = self._slot_f.get(pos)
+        if i is not None:
+            self._der[i] = i + 1
+            self._izq[i + 1] = i
+        else:
+            k = self._slot_nat[pos]
+            self._sig_nat[k] = k + 1
+        k = self._slot_all[pos]
+        self._sig_all[k] = k + 1
+
+
+def _match_columnar(arr: dict, ventana_dias: int, ordenar_por_emision: bool):
+    """
+    Mismo greedy que el motor clásico, sobre arrays NumPy:
+      - extracto ordenado por (clave, posición): cada clave es un tramo contiguo
+      - por fila del sistema, deltas del tramo (loop si es chico, NumPy si es
+        mediano) o, para montos muy repetidos, _TramoIndexado
+    Devuelvo listas alineadas de posiciones (sys, ext) y deltas.
+
+    Desempate (idéntico al clásico): menor delta; a igual delta gana la clave
+    Debe sobre la Haber y, dentro de la clave, la fila del extracto que
+    aparece primero.
+    """
+    n_ext = len(arr["ext_key"])
+    orden, tramos, ext_fecha = _ext_tramos(arr)
+    ext_fecha_ok = ext_fecha != NAT_ORDINAL
+
+    k1, k1_ok, k2, k2_ok = arr["k1"], arr["k1_ok"], arr["k2"], arr["k2_ok"]
+    emision, venc, sys_orden = _sys_fechas_y_orden(arr, ordenar_por_emision)
+
+    used_ext = np.zeros(n_ext, dtype=bool)
+    sin_candidato = np.iinfo(np.int64).max
+    sys_pos, ext_pos, deltas = [], [], []
+
+    # escalares en listas de Python: para tramos chicos un loop simple le gana
+    # al overhead de NumPy; los tramos grandes van vectorizados
+    orden_l = orden.tolist()
+    fecha_l = ext_fecha.tolist()
+    k1_l, k1_ok_l, k2_l, k2_ok_l = k1.tolist(), k1_ok.tolist(), k2.tolist(), k2_ok.tolist()
+    emision_l, venc_l = emision.tolist(), venc.tolist()
+
+    indices = {}
+
+    for i in sys_orden.tolist():
+        best_delta = sin_candidato
+        best_e = -1
+        best_indice = None
+        em = emision_l[i]
+        ve = venc_l[i]
+        for k, ok in ((k1_l[i], k1_ok_l[i]), (k2_l[i], k2_ok_l[i])):
+            if not ok:
+                continue
+            tramo = tramos.get(k)
+            if tramo is None:
+                continue
+            a, b = tramo
+            if b - a <= _TRAMO_CHICO:
+                for j in orden_l[a:b]:
+                    if used_ext[j]:
+                        continue
+                    f = fecha_l[j]
+                    if f == NAT_ORDINAL:
+                        d = _DELTA_INVALIDA
+                    else:
+                        de = abs(f - em) if em != NAT_ORDINAL else _DELTA_INVALIDA
+                        dv = abs(f - ve) if ve != NAT_ORDINAL else _DELTA_INVALIDA
+                        d = de if de < dv else dv
+                    if ventana_dias > 0 and d > ventana_dias:
+                        continue
+                    if d < best_delta:
+                        best_delta = d
+                        best_e = j
+                        best_indice = None
+                continue
+
+            if b - a >= _TRAMO_GRANDE:
+                indice = indices.get(k)
+                if indice is None:
+                    indice = indices[k] = _TramoIndexado(orden[a:b], ext_fecha)
+                res = indice.mejor(em, ve, ventana_dias)
+                if res is not None and res[0] < best_delta:
+                    best_delta, best_e = res
+                    best_indice = indice
+                continue
+
+            cand = orden[a:b]
+            f = ext_fecha[cand]
+            f_ok = ext_fecha_ok[cand]
+            de = np.where(f_ok & (em != NAT_ORDINAL), np.abs(f - em), _DELTA_INVALIDA)
+            dv = np.where(f_ok & (ve != NAT_ORDINAL), np.abs(f - ve), _DELTA_INVALIDA)
+            d = np.minimum(de, dv)
+            elegible = ~used_ext[cand]
+            if ventana_dias > 0:
+                elegible &= d <= ventana_dias
+            d = np.where(elegible, d, sin_candidato)
+            j = int(np.argmin(d))
+            if d[j] < best_delta:
+                best_delta = int(d[j])
+                best_e = int(cand[j])
+                best_indice = None
+
+        if best_e >= 0:
+            used_ext[best_e] = True
+            if best_indice is not None:
+                best_indice.consumir(best_e)
+            sys_pos.append(i)
+            ext_pos.append(best_e)
+            deltas.append(best_delta)
+
+    return sys_pos, ext_pos, deltas
+
+
+def _match_global(arr: dict, ventana_dias: int, ordenar_por_emision: bool):
+    """
+    Asignación global por menor delta: en vez de que cada fila del sistema
+    (en orden de emisión) se quede con su mejor extracto, confirmo siempre el
+    par libre de menor delta de todo el conjunto. Así una fila temprana no le
+    quita a otra posterior un extracto que a esa le calzaba con delta 0.
+
+    Heap con el mejor candidato vigente de cada fila del sistema (uno por
+    fila, no todos los pares: memoria lineal aunque ventana_dias = 0). Al
+    sacar un par cuyo extracto ya se usó, recalculo el mejor libre de esa fila
+    con _TramoIndexado (O(log n)) y lo vuelvo a encolar: los deltas de una
+    fila solo pueden crecer, así que el tope del heap es siempre el mínimo real.
+
+    Desempate: menor delta; luego la fila del sistema que va antes en el
+    recorrido (emisión si ordenar_por_emision); luego clave Debe sobre Haber y
+    la fila del extracto que aparece primero.
+    """
+    orden, tramos, ext_fecha = _ext_tramos(arr)
+    k1, k1_ok, k2, k2_ok = arr["k1"], arr["k1_ok"], arr["k2"], arr["k2_ok"]
+    emision, venc, sys_orden = _sys_fechas_y_orden(arr, ordenar_por_emision)
+
+    k1_l, k1_ok_l, k2_l, k2_ok_l = k1.tolist(), k1_ok.tolist(), k2.tolist(), k2_ok.tolist()
+    emision_l, venc_l = emision.tolist(), venc.tolist()
+
+    indices = {}
+
+    def _indice(k):
+        tramo = tramos.get(k)
+        if tramo is None:
+            return None
+        indice = indices.get(k)
+        if indice is None:
+            indice = indices[k] = _TramoIndexado(orden[tramo[0]:tramo[1]], ext_fecha)
+        return indice
+
+    def _mejor(i):
+        """(delta, posición ext, índice) del mejor extracto libre para la fila i."""
+        best = None
+        for k, ok in ((k1_l[i], k1_ok_l[i]), (k2_l[i], k2_ok_l[i])):
+            if not ok:
+                continue
+            indice = _indice(k)
+            if indice is None:
+                continue
+            res = indice.mejor(emision_l[i], venc_l[i], ventana_dias)
+            if res is not None and (best is None or res[0] < best[0]):
+                best = (res[0], res[1], indice)
+        return best
+
+    # (delta, rank, fila sys, fila ext, índice): rank es único por fila y cada
+    # fila tiene una sola entrada viva, así que la tupla nunca compara el índice
+    heap = []
+    for rank, i in enumerate(sys_orden.tolist()):
+        best = _mejor(i)
+        if best is not None:
+            heap.append((best[0], rank, i, best[1], best[2]))
+    heapq.heapify(heap)
+
+    used_ext = set()
+    sys_pos, ext_pos, deltas = [], [], []
+    while heap:
+        d, rank, i, j, indice = heapq.heappop(heap)
+        if j in used_ext:
+            best = _mejor(i)
+            if best is not None:
+                heapq.heappush(heap, (best[0], rank, i, best[1], best[2]))
+            continue
+        used_ext.add(j)
+        indice.consumir(j)
+        sys_pos.append(i)
+        ext_pos.append(j)
+        deltas.append(d)
+
+    return sys_pos, ext_pos, deltas
+
+
+def _match_tolerancia(
+    arr: dict,
+    ventana_dias: int,
+    ordenar_por_emision: bool,
+    tolerancia_importe: int,
+    tolerancia_pct: float,
+    sys_usadas: set,
+    ext_usadas: set,
+):
+    """
+    Segunda pasada, solo sobre lo que quedó libre tras el match exacto:
+    admito diferencias de importe de hasta max(tolerancia_importe,
+    tolerancia_pct % de la clave del sistema), en unidades de la clave.
+
+    Las claves distintas del extracto libre van a una lista ordenada y cada
+    una tiene su _TramoIndexado (el índice por fecha del greedy exacto).
+    Cada fila del sistema busca hacia afuera desde su clave, una clave
+    distinta por vez y siempre la más cercana primero: el índice da la fila
+    libre de menor delta dentro de la ventana en O(log n), y corto apenas la
+    diferencia de importe pasa la tolerancia o la del mejor ya encontrado.
+    Las claves agotadas se saltean con union-find de "siguiente libre" hacia
+    cada lado, así un tramo muy repetido no se recorre fila por fila.
+
+    Criterio: menor diferencia de importe, luego menor delta de días, luego
+    la fila del extracto que aparece primero (clave Debe antes que Haber).
+    Recorro el sistema en el mismo orden que el greedy.
+    Devuelvo (sys_pos, ext_pos, delta_dias, delta_importe) con
+    delta_importe = clave extracto - clave sistema.
+    """
+    ext_key, ext_ok, ext_fecha = arr["ext_key"], arr["ext_ok"], arr["ext_fecha"]
+    k1, k1_ok, k2, k2_ok = arr["k1"], arr["k1_ok"], arr["k2"], arr["k2_ok"]
+    emision, venc, sys_orden = _sys_fechas_y_orden(arr, ordenar_por_emision)
+
+    libres = np.array([j for j in np.flatnonzero(ext_ok).tolist() if j not in ext_usadas], dtype="int64")
+    pos_sorted = libres[np.lexsort((libres, ext_key[libres]))]
+    claves, inicio, cuenta = np.unique(ext_key[pos_sorted], return_index=True, return_counts=True)
+    claves_l = claves.tolist()
+    n = len(claves_l)
+    restantes = cuenta.tolist()
+    der = list(range(n + 1))    # der[c]: primera clave con filas libres >= c (n = ninguna)
+    izq = list(range(n + 1))    # izq[c + 1]: última clave con filas libres <= c (0 = ninguna)
+    indices = {}
+
+    def _indice(c: int) -> _TramoIndexado:
+        indice = indices.get(c)
+        if indice is None:
+            a = int(inicio[c])
+            indice = indices[c] = _TramoIndexado(pos_sorted[a:a + int(cuenta[c])], ext_fecha)
+        return indice
+
+    k1_l, k1_ok_l, k2_l, k2_ok_l = k1.tolist(), k1_ok.tolist(), k2.tolist(), k2_ok.tolist()
+    emision_l, venc_l = emision.tolist(), venc.tolist()
+
+    sys_pos, ext_pos, deltas, deltas_importe = [], [], [], []
+    for i in sys_orden.tolist():
+        if i in sys_usadas:
+            continue
+        em = emision_l[i]
+        ve = venc_l[i]
+        best = None   # (|dif importe|, delta días, posición ext, clave del extracto, clave del sistema)
+        for k, ok in ((k1_l[i], k1_ok_l[i]), (k2_l[i], k2_ok_l[i])):
+            if not ok:
+                continue
+            tol = max(int(tolerancia_importe), int(abs(k) * tolerancia_pct / 100))
+            c = bisect_left(claves_l, k)
+            d_der = _uf_find(der, c)
+            d_izq = _uf_find(izq, c) - 1
+            while True:
+                # la clave viva más cercana de cualquiera de los dos lados (empate: la mayor primero)
+                dif_der = claves_l[d_der] - k if d_der < n else None
+                dif_izq = k - claves_l[d_izq] if d_izq >= 0 else None
+                if dif_der is not None and (dif_izq is None or dif_der <= dif_izq):
+                    c, dif = d_der, dif_der
+                    d_der = _uf_find(der, d_der + 1)
+                elif dif_izq is not None:
+                    c, dif = d_izq, dif_izq
+                    d_izq = _uf_find(izq, d_izq) - 1
+                else:
+                    break
+                if dif > tol or (best is not None and dif > best[0]):
+                    break
+                res = _indice(c).mejor(em, ve, ventana_dias)
+                if res is not None and (best is None or (dif,) + res < best[:3]):
+                    best = (dif,) + res + (c, k)
+
+        if best is not None:
+            _, d, j, c, k = best
+            _indice(c).consumir(j)
+            restantes[c] -= 1
+            if not restantes[c]:
+                der[c] = c + 1
+                izq[c + 1] = c
+            sys_pos.append(i)
+            ext_pos.append(j)
+            deltas.append(d)
+            deltas_importe.append(claves_l[c] - k)
+
+    return sys_pos, ext_pos, deltas, deltas_importe
+
+
+# --------------------------------------
+# Modo paralelo: shards por clave en un pool de procesos
+# --------------------------------------
+# shards por proceso: con más shards que procesos se reparte mejor la carga
+# cuando hay tramos muy grandes
+_SHARDS_POR_PROCESO = 4
+_HASH_MULT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _shards(arr: dict, n_shards: int):
+    """
+    Shard de cada fila (-1 = no puede matchear en el paso exacto).
+
+    Una fila del sistema solo compite por extractos de sus claves, así que
+    los tramos son independientes salvo cuando una fila tiene dos claves
+    (Debe y Haber) con extracto: ahí uno ambas claves (union-find) para que
+    caigan en el mismo shard. El shard sale de un hash de la menor clave de
+    cada componente.
+    """
+    ext_key, ext_ok = arr["ext_key"], arr["ext_ok"]
+    k1, k1_ok, k2, k2_ok = arr["k1"], arr["k1_ok"], arr["k2"], arr["k2_ok"]
+    claves = np.unique(ext_key[ext_ok])
+    if len(claves) == 0:
+        return np.full(len(k1), -1, dtype="int64"), np.full(len(ext_key), -1, dtype="int64")
+
+    def _pos(k, ok):
+        """Posición de cada clave en 'claves' y si tiene extracto."""
+        p = np.minimum(np.searchsorted(claves, k), len(claves) - 1)
+        return p, ok & (claves[p] == k)
+
+    p1, en1 = _pos(k1, k1_ok)
+    p2, en2 = _pos(k2, k2_ok)
+    pe, ene = _pos(ext_key, ext_ok)
+
+    # uno en la menor posición: la raíz de cada componente es su menor clave
+    padre = list(range(len(claves)))
+    ambas = en1 & en2 & (p1 != p2)
+    for a, b in np.unique(np.stack([p1[ambas], p2[ambas]], axis=1), axis=0).tolist():
+        ra, rb = _uf_find(padre, a), _uf_find(padre, b)
+        if ra != rb:
+            padre[max(ra, rb)] = min(ra, rb)
+    raiz = np.array([_uf_find(padre, c) for c in range(len(claves))], dtype="int64")
+
+    h = claves[raiz].astype("uint64") * _HASH_MULT
+    shard_clave = ((h >> np.uint64(32)) % np.uint64(n_shards)).astype("int64")
+
+    sys_shard = np.where(en1, shard_clave[p1], np.where(en2, shard_clave[p2], -1))
+    ext_shard = np.where(ene, shard_clave[pe], -1)
+    return sys_shard, ext_shard
+
+
+def _match_shard(payload):
+    """Corre en el proceso hijo: el motor columnar sobre los arrays de un shard."""
+    arr, ventana_dias, ordenar_por_emision, asignacion = payload
+    if asignacion == "global":
+        res = _match_global(arr, ventana_dias, ordenar_por_emision)
+    else:
+        res = _match_columnar(arr, ventana_dias, ordenar_por_emision)
+    return tuple(np.asarray(x, dtype="int64") for x in res)
+
+
+def _match_paralelo(arr: dict, ventana_dias: int, ordenar_por_emision: bool, asignacion: str, procesos: int):
+    """
+    Mismo resultado que el motor serial, repartiendo los tramos en shards
+    (ver _shards) sobre un ProcessPoolExecutor. A cada proceso le mando solo
+    los arrays de su shard (subconjuntos en el orden original, así los
+    desempates por posición no cambian) y junto los pares en el orden del
+    serial: por rango de recorrido (secuencial) o por (delta, rango) (global).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    n_shards = procesos * _SHARDS_POR_PROCESO
+    sys_shard, ext_shard = _shards(arr, n_shards)
+    _, _, sys_orden = _sys_fechas_y_orden(arr, ordenar_por_emision)
+    rango = np.empty(len(sys_orden), dtype="int64")
+    rango[sys_orden] = np.arange(len(sys_orden))
+
+    claves_sys = ("k1", "k1_ok", "k2", "k2_ok", "emision", "venc")
+    claves_ext = ("ext_key", "ext_ok", "ext_fecha")
+    trabajos, posiciones = [], []
+    for sh in range(n_shards):
+        ps = np.flatnonzero(sys_shard == sh)
+        pe = np.flatnonzero(ext_shard == sh)
+        if len(ps) == 0 or len(pe) == 0:
+            continue
+        sub = {k: arr[k][ps] for k in claves_sys}
+        sub.update({k: arr[k][pe] for k in claves_ext})
+        trabajos.append((sub, ventana_dias, ordenar_por_emision, asignacion))
+        posiciones.append((ps, pe))
+
+    sys_pos, ext_pos, deltas = [np.zeros(0, dtype="int64")], [np.zeros(0, dtype="int64")], [np.zeros(0, dtype="int64")]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        for (ps, pe), (s_loc, e_loc, d) in zip(posiciones, pool.map(_match_shard, trabajos)):
+            sys_pos.append(ps[s_loc])
+            ext_pos.append(pe[e_loc])
+            deltas.append(d)
+    sys_pos, ext_pos, deltas = (np.concatenate(x) for x in (sys_pos, ext_pos, deltas))
+
+    if asignacion == "global":
+        orden = np.lexsort((rango[sys_pos], deltas))
+    else:
+        orden = np.argsort(rango[sys_pos], kind="stable")
+    return sys_pos[orden].tolist(), ext_pos[orden].tolist(), deltas[orden].tolist()
+
+
+def match_one_to_one_by_amount_and_date(
+    df_sys: pd.DataFrame,
+    df_ext: pd.DataFrame,
+    ventana_dias: int,
+    ordenar_por_emision: bool,
+    motor: str = "columnar",
+    asignacion: str = "secuencial",
+    tolerancia_importe: int = 0,
+    tolerancia_pct: float = 0.0,
+    procesos: int = 1,
+):
+    """
+    Claves enteras (centavos):
+      - Extracto: _AMT_KEY_
+      - Sistema: _AMT_KEY_DEBE_POS (positivo), _AMT_KEY_HABER_NEG (negativo),
+                 _AMT_KEY_PRIMARY_ (fallback)
+    Greedy: recorro el sistema (por emisión si ordenar_por_emision) y a cada
+    fila le asigno el extracto libre de igual clave con menor delta de días,
+    dentro de ventana_dias (0 = sin tope).
+
+    motor:
+      - "columnar": arrays NumPy (claves int64, ordinales de fecha int32).
+      - "clasico": implementación original fila por fila (referencia).
+    Ambos devuelven exactamente los mismos pares.
+
+    asignacion:
+      - "secuencial": el greedy de arriba (por defecto).
+      - "global": confirma primero los pares de menor delta de todo el
+        conjunto (ver _match_global). Solo con motor "columnar".
+
+    tolerancia_importe (en unidades de la clave, p.ej. centavos) /
+    tolerancia_pct (% de la clave del sistema): si alguna es > 0, lo que
+    quedó sin par tras el match exacto pasa por _match_tolerancia.
+
+    procesos > 1: el match exacto se reparte por clave en un pool de
+    procesos (ver _match_paralelo); los pares son idénticos al serial.
+    Solo con motor "columnar".
+
+    Devuelvo (pares, used_sys, used_ext): pares es un DataFrame con columnas
+    alineadas _SYS_ID_ / _EXT_ID_ (índice de df_sys / df_ext), _DELTA_DIAS_
+    y _DELTA_IMPORTE_ (unidades de la clave, extracto - sistema; 0 en los
+    exactos), en el orden en que se confirmaron.
+    """
+    if asignacion not in ASIGNACIONES:
+        raise ValueError(f"Asignación desconocida: {asignacion!r} (opciones: {', '.join(ASIGNACIONES)})")
+    if motor == "clasico":
+        if asignacion != "secuencial" or tolerancia_importe or tolerancia_pct or procesos > 1:
+            raise ValueError("El motor 'clasico' solo soporta asignación 'secuencial' sin tolerancia ni procesos.")
+        return _match_clasico(df_sys, df_ext, ventana_dias, ordenar_por_emision)
+    if motor != "columnar":
+        raise ValueError(f"Motor de matching desconocido: {motor!r} (opciones: {', '.join(MOTORES)})")
+
+    sys_idx, ext_idx = _indexed_frames(df_sys, df_ext)
+    arr = _arrays(sys_idx, ext_idx)
+    if procesos > 1:
+        sys_pos, ext_pos, deltas = _match_paralelo(arr, ventana_dias, ordenar_por_emision, asignacion, procesos)
+    elif asignacion == "global":
+        sys_pos, ext_pos, deltas = _match_global(arr, ventana_dias, ordenar_por_emision)
+    else:
+        sys_pos, ext_pos, deltas = _match_columnar(arr, ventana_dias, ordenar_por_emision)
+    deltas_importe = [0] * len(deltas)
+
+    if tolerancia_importe > 0 or tolerancia_pct > 0:
+        t_sys, t_ext, t_deltas, t_importe = _match_tolerancia(
+            arr, ventana_dias, ordenar_por_emision,
+            tolerancia_importe, tolerancia_pct, set(sys_pos), set(ext_pos),
+        )
+        sys_pos += t_sys
+        ext_pos += t_ext
+        deltas += t_deltas
+        deltas_importe += t_importe
+
+    sys_ids = df_sys.index.take(np.asarray(sys_pos, dtype="int64"))
+    ext_ids = df_ext.index.take(np.asarray(ext_pos, dtype="int64"))
+    return _pares(sys_ids, ext_ids, deltas, deltas_importe), set(sys_ids.tolist()), set(ext_ids.tolist())
+
+
+# --------------------------------------
+# Segunda etapa: grupos (N-1 / 1-N) por suma de importes
+# --------------------------------------
+SENTIDOS_GRUPO = ("varios_sistema", "varios_extracto")
+
+# candidatos por objetivo (los de menor delta): acota el meet-in-the-middle
+_MAX_CANDIDATOS_GRUPO = 30
+# cada cuántas combinaciones miro el reloj dentro del meet-in-the-middle
+_PASOS_ENTRE_RELOJ = 1024
+
+
+class _SinPresupuesto(Exception):
+    """Se agotó presupuesto_seg en medio de la búsqueda de un grupo."""
+
+
+def _subconjunto_que_suma(claves: list, deltas: list, objetivo: int, max_filas: int, limite: float = None):
+    """
+    Busco entre 'claves' (ya ordenadas por delta) un subconjunto de 2 a
+    max_filas elementos que sume exactamente 'objetivo', con meet-in-the-middle:
+    para r filas tabulo las sumas de las combinaciones de r//2 y busco el
+    complemento entre las de r - r//2 (índices de la izquierda < derecha, así
+    cada subconjunto aparece una sola vez).
+
+    Prefiero menos filas, luego menor delta máximo, luego menor delta total.
+    Devuelvo la tupla de índices o None. Con 'limite' (perf_counter) miro el
+    reloj cada _PASOS_ENTRE_RELOJ combinaciones y levanto _SinPresupuesto.
+    """
+    n = len(claves)
+    for r in range(2, min(max_filas, n) + 1):
+        a = r // 2
+        izquierda = defaultdict(list)
+        for paso, comb in enumerate(combinations(range(n - (r - a)), a)):
+            if not paso % _PASOS_ENTRE_RELOJ and limite is not None and time.perf_counter() > limite:
+                raise _SinPresupuesto()
+            izquierda[sum(claves[x] for x in comb)].append(comb)
+
+        mejor = None
+        for paso, comb in enumerate(combinations(range(a, n), r - a)):
+            if not paso % _PASOS_ENTRE_RELOJ and limite is not None and time.perf_counter() > limite:
+                raise _SinPresupuesto()
+            for izq in izquierda.get(objetivo - sum(claves[x] for x in comb), ()):
+                if izq[-1] >= comb[0]:
+                    continue
+                sol = izq + comb
+                crit = (deltas[sol[-1]], sum(deltas[x] for x in sol), sol)
+                if mejor is None or crit < mejor:
+                    mejor = crit
+        if mejor is not None:
+            return mejor[2]
+    return None
+
+
+def _candidatos_grupo(libre, orden, claves_ordenadas, objetivo: int, deltas_de, ventana_dias: int):
+    """
+    Posiciones libres del otro lado que pueden integrar un grupo que sume
+    'objetivo': mismo signo, |clave| < |objetivo| y dentro de la ventana.
+    Ese tramo de importes lo saco por bisección sobre las claves ordenadas
+    (orden = argsort de las claves), así el delta lo calculo solo ahí.
+    Me quedo con las _MAX_CANDIDATOS_GRUPO de menor delta (luego posición).
+    Devuelvo (posiciones, deltas).
+    """
+    if objetivo > 0:
+        desde = np.searchsorted(claves_ordenadas, 0, side="right")
+        hasta = np.searchsorted(claves_ordenadas, objetivo, side="left")
+    else:
+        desde = np.searchsorted(claves_ordenadas, objetivo, side="right")
+        hasta = np.searchsorted(claves_ordenadas, 0, side="left")
+    pos = orden[desde:hasta]
+    pos = pos[libre[pos]]
+    delta = deltas_de(pos)
+    if ventana_dias > 0:
+        ok = delta <= ventana_dias
+        pos, delta = pos[ok], delta[ok]
+    top = np.lexsort((pos, delta))[:_MAX_CANDIDATOS_GRUPO]
+    return pos[top], delta[top]
+
+
+def match_groups_by_amount_sum(
+    df_sys: pd.DataFrame,
+    df_ext: pd.DataFrame,
+    used_sys: set,
+    used_ext: set,
+    ventana_dias: int,
+    ordenar_por_emision: bool,
+    max_filas: int = 3,
+    presupuesto_seg: float = 5.0,
+):
+    """
+    Etapa posterior al 1-1, solo sobre lo que quedó libre:
+      1) "varios_sistema": un movimiento del extracto que paga varias filas
+         del sistema (recorro el extracto en orden).
+      2) "varios_extracto": una fila del sistema que el banco partió en varios
+         movimientos (recorro el sistema en el orden del greedy).
+    Un grupo son 2..max_filas filas cuyas claves enteras suman exactamente la
+    clave de la contraparte, todas dentro de ventana_dias de ella (0 = sin
+    tope). Del sistema uso la clave primaria (_AMT_KEY_PRIMARY_).
+
+    presupuesto_seg acota el tiempo de cada etapa (también dentro de la
+    búsqueda de un grupo): si se agota, corto ahí y lo informo.
+
+    Devuelvo (grupos, used_sys, used_ext, completo); cada grupo es
+    (sentido, ids_sistema, ids_extracto, delta_max) y los used_* son solo
+    los ids agrupados acá.
+    """
+    if max_filas < 2:
+        raise ValueError("Un grupo necesita al menos 2 filas (max_filas >= 2).")
+
+    sys_idx, ext_idx = _indexed_frames(df_sys, df_ext)
+    arr = _arrays(sys_idx, ext_idx)
+    ext_key, ext_ok, ext_fecha = arr["ext_key"], arr["ext_ok"], arr["ext_fecha"]
+    sys_key, sys_ok = _key_array(sys_idx, "_AMT_KEY_PRIMARY_")
+    emision, venc, sys_orden = _sys_fechas_y_orden(arr, ordenar_por_emision)
+    sys_ids = sys_idx["_SYS_ID_"].tolist()
+    ext_ids = ext_idx["_EXT_ID_"].tolist()
+
+    # la clave 0 no aporta a ninguna suma
+    sys_libre = sys_ok & (sys_key != 0) & ~sys_idx["_SYS_ID_"].isin(used_sys).to_numpy(dtype=bool)
+    ext_libre = ext_ok & (ext_key != 0) & ~ext_idx["_EXT_ID_"].isin(used_ext).to_numpy(dtype=bool)
+
+    def _deltas(f, em, ve):
+        # vectorizado sobre cualquiera de los tres argumentos (ordinales)
+        de = np.where((f == NAT_ORDINAL) | (em == NAT_ORDINAL), _DELTA_INVALIDA, np.abs(f - em))
+        dv = np.where((f == NAT_ORDINAL) | (ve == NAT_ORDINAL), _DELTA_INVALIDA, np.abs(f - ve))
+        return np.minimum(de, dv)
+
+    # claves ordenadas una vez: los candidatos de cada objetivo salen por bisección
+    sys_orden_clave = np.argsort(sys_key, kind="stable")
+    ext_orden_clave = np.argsort(ext_key, kind="stable")
+    sys_key_ord, ext_key_ord = sys_key[sys_orden_clave], ext_key[ext_orden_clave]
+
+    grupos = []
+    completo = True
+
+    # 1) un extracto -> varias filas del sistema
+    limite = time.perf_counter() + presupuesto_seg
+    for j in np.flatnonzero(ext_libre).tolist():
+        if time.perf_counter() > limite:
+            completo = False
+            break
+        objetivo = int(ext_key[j])
+        cand, delta = _candidatos_grupo(
+            sys_libre, sys_orden_clave, sys_key_ord, objetivo,
+            lambda pos: _deltas(ext_fecha[j], emision[pos], venc[pos]), ventana_dias,
+        )
+        try:
+            sol = _subconjunto_que_suma(sys_key[cand].tolist(), delta.tolist(), objetivo, max_filas, limite)
+        except _SinPresupuesto:
+            completo = False
+            break
+        if sol is None:
+            continue
+        sol = list(sol)
+        miembros = cand[sol]
+        sys_libre[miembros] = False
+        ext_libre[j] = False
+        grupos.append((
+            "varios_sistema", [sys_ids[i] for i in miembros.tolist()], [ext_ids[j]], int(delta[sol].max()),
+        ))
+
+    # 2) una fila del sistema -> varios extractos
+    limite = time.perf_counter() + presupuesto_seg
+    for i in sys_orden.tolist():
+        if not sys_libre[i]:
+            continue
+        if time.perf_counter() > limite:
+            completo = False
+            break
+        objetivo = int(sys_key[i])
+        cand, delta = _candidatos_grupo(
+            ext_libre, ext_orden_clave, ext_key_ord, objetivo,
+            lambda pos: _deltas(ext_fecha[pos], emision[i], venc[i]), ventana_dias,
+        )
+        try:
+            sol = _subconjunto_que_suma(ext_key[cand].tolist(), delta.tolist(), objetivo, max_filas, limite)
+        except _SinPresupuesto:
+            completo = False
+            break
+        if sol is None:
+            continue
+        sol = list(sol)
+        miembros = cand[sol]
+        ext_libre[miembros] = False
+        sys_libre[i] = False
+        grupos.append((
+            "varios_extracto", [sys_ids[i]], [ext_ids[j] for j in miembros.tolist()], int(delta[sol].max()),
+        ))
+
+    grupo_sys = {s for _, ids, _, _ in grupos for s in ids}
+    grupo_ext = {e for _, _, ids, _ in grupos for e in ids}
+    return grupos, grupo_sys, grupo_ext, completo
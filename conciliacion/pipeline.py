@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Etapas memoizadas del pipeline de app.py.
+
+Cada etapa tiene una clave calculada con sus entradas reales (parámetros y
+las claves de las etapas de las que depende). Si la clave no cambió desde el
+rerun anterior, devuelvo el resultado guardado sin ejecutarla. Guardo solo
+el último resultado de cada etapa: la memoria no crece con los reruns.
+
+    ingesta ext -> normaliza ext -> conceptos (índice para los filtros)
+                   normaliza ext -> filtra ext
+    ingesta sys -> transform sys
+    filtra ext + transform sys -> match -> grupos -> vistas
+        -> split (vencidos / diferidos) -> export
+"""
+
+import hashlib
+import time
+
+
+def stage_key(nombre: str, entradas: tuple) -> str:
+    """Clave de una etapa: hash del nombre y del repr de sus entradas (valores simples y claves de etapas)."""
+    return hashlib.blake2b(repr((nombre, entradas)).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def run_stage(store: dict, log: list, nombre: str, entradas: tuple, fn):
+    """
+    Ejecuto fn() solo si cambió la clave de la etapa. Devuelvo
+    (clave, resultado); anoto en 'log' (nombre, acierto, segundos).
+    """
+    clave = stage_key(nombre, entradas)
+    previo = store.get(nombre)
+    if previo is not None and previo[0] == clave:
+        log.append((nombre, True, 0.0))
+        return clave, previo[1]
+
+    t0 = time.perf_counter()
+    resultado = fn()
+    store[nombre] = (clave, resultado)
+    log.append((nombre, False, time.perf_counter() - t0))
+    return clave, resultado
@@ -4,12 +4,16 @@ Transformaciones: normalización de DF de Extracto y Sistema,
 y construcción de vistas de salida.
 """
 
+import time
 from typing import Optional, List, Set
 import numpy as np
 import pandas as pd
 import unicodedata
 from datetime import date
-from .utils import normalize_text, normalize_amount, normalize_date
+from .exclusion import compile_exclusions, exclusion_reasons
+from .utils import (
+    normalize_text, normalize_text_series, normalize_amount_cents_series, cents_to_amount, normalize_date_series,
+)
 
 
 def _normalize_mode_flag(modo: str) -> str:
@@ -26,12 +30,62 @@ def _mode_is_columna_unica(modo: str) -> bool:
     return _normalize_mode_flag(modo) == "columna unica"
 
 
+# Esquema de los frames de trabajo (lo que sale de las transformaciones).
+# Las columnas crudas mapeadas quedan como llegaron (son las que se muestran).
+# Fechas en datetime64[s] a medianoche: pandas no tiene unidad [D] en Series.
+ESQUEMA_EXT = {
+    "_FECHA_": "datetime64[s]",
+    "_CONCEPTO_": "category",
+    "_AMT_KEY_": "Int64",
+    "_IMPORTE_SIGNED_": "float64",
+    "_DEBITO_NORM_": "float64",
+    "_CREDITO_NORM_": "float64",
+    "_MOTIVO_": "category",
+}
+ESQUEMA_SYS = {
+    "_EMISION_": "datetime64[s]",
+    "_VENC_": "datetime64[s]",
+    "_DEBE_NORM_": "float64",
+    "_HABER_NORM_": "float64",
+    "_AMT_KEY_DEBE_POS": "Int64",
+    "_AMT_KEY_HABER_NEG": "Int64",
+    "_AMT_KEY_PRIMARY_": "Int64",
+    "_IMPORTE_MATCH_KEY_": "float64",
+}
+
+
+def apply_schema(df: pd.DataFrame, esquema: dict) -> pd.DataFrame:
+    """Paso las columnas del esquema que estén en df a su dtype (las que ya lo tienen no se tocan)."""
+    cambios = {c: t for c, t in esquema.items() if c in df.columns and df[c].dtype != t}
+    return df.astype(cambios) if cambios else df
+
+
+def frame_memory(frames: dict) -> pd.DataFrame:
+    """Filas y MB (memory_usage deep=True, con índice) de cada frame."""
+    rows = []
+    for nombre, df in frames.items():
+        if isinstance(df, pd.DataFrame):
+            rows.append({"Frame": nombre, "Filas": len(df),
+                         "MB": round(df.memory_usage(deep=True).sum() / 2**20, 2)})
+    return pd.DataFrame(rows, columns=["Frame", "Filas", "MB"])
+
+
+def _project(df_raw: pd.DataFrame, cols) -> pd.DataFrame:
+    """
+    Solo las columnas mapeadas (sin repetidos ni None), en el orden del
+    archivo, en un frame propio: las columnas nuevas que agrego después no
+    tocan df_raw. pandas 3 (copy-on-write) no copia datos; en pandas 2 la
+    selección ya es una copia y copy(deep=False) solo le saca la marca de
+    vista (SettingWithCopyWarning), sin volver a copiar.
+    """
+    pedidas = {c for c in cols if c is not None}
+    return df_raw[[c for c in df_raw.columns if c in pedidas]].copy(deep=False)
 
 
 # --------------------------------------
 # EXTRACTO: normalización y clave entera
 # --------------------------------------
-def apply_extract_transformations(
+def normalize_extract(
     df_ext_raw: pd.DataFrame,
     col_fecha: str,
     col_concepto: str,
@@ -39,88 +93,141 @@ def apply_extract_transformations(
     col_importe: Optional[str],
     col_debito: Optional[str],
     col_credito: Optional[str],
-    excluir_exact: List[str],
     normalizar_texto: bool,
     decimales: int,
-    excluir_contains: Optional[List[str]] = None,   # ahora es opcional
-) -> tuple[pd.DataFrame, pd.DataFrame]:
+) -> pd.DataFrame:
     """
-    - Normalizo extracto (fecha, concepto, importe con signo).
+    - Normalizo extracto (fecha datetime64 al día, concepto, importe con signo).
     - Modo de importe configurable: columna unica o columnas Debito/Haber.
-    - Genero clave ENTERA en centavos (_AMT_KEY_) para evitar problemas de floats.
-    - Aplico filtros:
-        * excluir_exact: lista de conceptos exactos a quitar
-        * excluir_contains: lista de palabras clave (contiene) a quitar (opcional)
-
-    Devuelve:
-      (df_ext_filtrado, df_ext_excluidos_con_detalle)
+    - Genero clave ENTERA en centavos (_AMT_KEY_, Int64) directo desde el texto,
+      sin pasar por float; _IMPORTE_SIGNED_ se deriva de esa clave.
+    - Columnas de trabajo con los dtypes de ESQUEMA_EXT (_CONCEPTO_ como
+      category: pocos valores distintos, muy repetidos).
+    No filtra: el mismo resultado sirve para cualquier juego de exclusiones.
     """
-    df_ext = df_ext_raw.copy()
+    df_ext = _project(df_ext_raw, (col_fecha, col_concepto, col_importe, col_debito, col_credito))
 
-    df_ext["_FECHA_"] = df_ext[col_fecha].apply(normalize_date)
+    df_ext["_FECHA_"] = normalize_date_series(df_ext[col_fecha])
 
     if normalizar_texto:
-        df_ext["_CONCEPTO_"] = df_ext[col_concepto].apply(normalize_text)
+        df_ext["_CONCEPTO_"] = normalize_text_series(df_ext[col_concepto], categorical=True)
     else:
-        df_ext["_CONCEPTO_"] = df_ext[col_concepto].astype(str).fillna("")
+        df_ext["_CONCEPTO_"] = df_ext[col_concepto].astype(str).fillna("").astype("category")
 
     is_columna_unica = _mode_is_columna_unica(modo_importe)
 
+    # Importes directo a clave ENTERA (centavos), sin pasar por float
     if is_columna_unica:
         if not col_importe:
             raise ValueError("Se debe indicar la columna de importe del extracto.")
-        df_ext["_IMPORTE_SIGNED_"] = df_ext[col_importe].apply(
-            lambda v: normalize_amount(v, decimales, use_abs=False)
-        )
+        df_ext["_AMT_KEY_"] = normalize_amount_cents_series(df_ext[col_importe], decimales, use_abs=False)
     else:
         if not col_debito or not col_credito:
             raise ValueError("Se deben indicar columnas Debito y Credito para el extracto.")
-        df_ext["_DEBITO_NORM_"] = df_ext[col_debito].apply(
-            lambda v: normalize_amount(v, decimales, use_abs=True)
-        )
-        df_ext["_CREDITO_NORM_"] = df_ext[col_credito].apply(
-            lambda v: normalize_amount(v, decimales, use_abs=True)
-        )
-        df_ext["_IMPORTE_SIGNED_"] = (
-            df_ext["_CREDITO_NORM_"].fillna(0) - df_ext["_DEBITO_NORM_"].fillna(0)
-        )
-
-    # Clave entera (centavos)
-    scale = 10 ** int(decimales)
-
-    def to_key(v):
-        try:
-            if pd.isna(v):
-                return pd.NA
-            return int(round(float(v) * scale))
-        except Exception:
-            return pd.NA
-
-    df_ext["_AMT_KEY_"] = df_ext["_IMPORTE_SIGNED_"].apply(to_key)
+        key_debito = normalize_amount_cents_series(df_ext[col_debito], decimales, use_abs=True)
+        key_credito = normalize_amount_cents_series(df_ext[col_credito], decimales, use_abs=True)
+        df_ext["_DEBITO_NORM_"] = cents_to_amount(key_debito, decimales)
+        df_ext["_CREDITO_NORM_"] = cents_to_amount(key_credito, decimales)
+        df_ext["_AMT_KEY_"] = key_credito.fillna(0) - key_debito.fillna(0)
+
+    df_ext["_IMPORTE_SIGNED_"] = cents_to_amount(df_ext["_AMT_KEY_"], decimales)
+
+    return apply_schema(df_ext, ESQUEMA_EXT)
+
+
+def filter_extract(
+    df_ext: pd.DataFrame,
+    excluir_exact: List[str],
+    normalizar_texto: bool,
+    excluir_contains: Optional[List[str]] = None,
+    excluir_regex: Optional[List[str]] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Aplico los filtros sobre el extracto ya normalizado (normalize_extract):
+        * excluir_exact: lista de conceptos exactos a quitar
+        * excluir_contains: lista de palabras clave (contiene) a quitar (opcional)
+        * excluir_regex: lista de expresiones regulares (opcional)
+    Las reglas se evalúan una vez por concepto distinto (ver exclusion.py).
 
+    Devuelve:
+      (df_ext_filtrado, df_ext_excluidos_con_detalle) con _MOTIVO_ (category)
+    """
     # ---- Filtros ----
     excluir_exact_set = set(
         (normalize_text(x) if normalizar_texto else str(x).strip()) for x in (excluir_exact or [])
     )
-    excluir_contains_list = excluir_contains or []
+    reglas = compile_exclusions(excluir_exact_set, excluir_contains or [], excluir_regex or [])
+
+    # el motivo depende solo del concepto: lo calculo una vez por categoría
+    # y lo expando con los códigos de la columna
+    conceptos = df_ext["_CONCEPTO_"].cat
+    codes = conceptos.codes.to_numpy()
+    motivos = np.append(exclusion_reasons(conceptos.categories, reglas), None)
+    reasons = motivos[codes]
+    mask_keep = pd.isna(reasons)
+
+    df_ext_kept = df_ext[mask_keep]
+    df_ext_excl = df_ext[~mask_keep]
+    if not df_ext_excl.empty:
+        # assign y no df_ext_excl[...] = ...: el recorte por máscara es una
+        # vista para pandas 2 (SettingWithCopyWarning)
+        df_ext_excl = df_ext_excl.assign(_MOTIVO_=reasons[~mask_keep])
 
-    def exclusion_reason(concepto: str) -> str | None:
-        if concepto in excluir_exact_set:
-            return f"EXACTO:{concepto}"
-        for kw in excluir_contains_list:
-            if (kw in concepto) if normalizar_texto else (kw in concepto):
-                return f"CONTIENTE:{kw}"
-        return None
+    return apply_schema(df_ext_kept, ESQUEMA_EXT), apply_schema(df_ext_excl, ESQUEMA_EXT)
 
-    reasons = df_ext["_CONCEPTO_"].apply(exclusion_reason)
-    mask_keep = reasons.isna()
 
-    df_ext_kept = df_ext[mask_keep].copy()
-    df_ext_excl = df_ext[~mask_keep].copy()
-    if not df_ext_excl.empty:
-        df_ext_excl["_MOTIVO_"] = reasons[~mask_keep].values
+def apply_extract_transformations(
+    df_ext_raw: pd.DataFrame,
+    col_fecha: str,
+    col_concepto: str,
+    modo_importe: str,
+    col_importe: Optional[str],
+    col_debito: Optional[str],
+    col_credito: Optional[str],
+    excluir_exact: List[str],
+    normalizar_texto: bool,
+    decimales: int,
+    excluir_contains: Optional[List[str]] = None,   # ahora es opcional
+    excluir_regex: Optional[List[str]] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    normalize_extract + filter_extract. Devuelve:
+      (df_ext_filtrado, df_ext_excluidos_con_detalle)
+    """
+    df_ext = normalize_extract(
+        df_ext_raw, col_fecha, col_concepto, modo_importe, col_importe, col_debito, col_credito,
+        normalizar_texto, decimales,
+    )
+    return filter_extract(df_ext, excluir_exact, normalizar_texto, excluir_contains, excluir_regex)
 
-    return df_ext_kept, df_ext_excl
+
+def apply_extract_transformations_chunked(chunks, **kwargs) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """
+    apply_extract_transformations bloque por bloque (CSV grandes leídos con
+    iter_csv_chunks): cada bloque se normaliza y se filtra apenas se lee, y
+    solo quedan sus filas ya transformadas. Mismos argumentos (por nombre,
+    sin df_ext_raw). Devuelvo (kept, excluidos, stats) con stats = filas,
+    bloques, segundos y filas_seg.
+    """
+    t0 = time.perf_counter()
+    kept, excl = [], []
+    filas = bloques = 0
+    for chunk in chunks:
+        k, e = apply_extract_transformations(df_ext_raw=chunk, **kwargs)
+        kept.append(k)
+        if not e.empty:
+            excl.append(e)
+        filas += len(chunk)
+        bloques += 1
+    if not kept:
+        raise ValueError("El CSV del extracto no tiene filas.")
+    # cada bloque trae sus propias categorías: concat las deja en object y
+    # el esquema las vuelve a category
+    df_kept = apply_schema(pd.concat(kept), ESQUEMA_EXT) if len(kept) > 1 else kept[0]
+    df_excl = apply_schema(pd.concat(excl), ESQUEMA_EXT) if excl else kept[0].iloc[0:0]
+    seg = time.perf_counter() - t0
+    stats = {"filas": filas, "bloques": bloques, "segundos": seg, "filas_seg": filas / seg if seg > 0 else 0.0}
+    return df_kept, df_excl, stats
 
 
 # --------------------------------------
@@ -139,77 +246,55 @@ def apply_system_transformations(
 ) -> pd.DataFrame:
     """
     Normalizo el sistema:
-    - _EMISION_ y _VENC_ como fechas.
+    - _EMISION_ y _VENC_ como fechas (datetime64 al día, NaT si no se puede).
     - Si modo = "Columna unica": _IMPORTE_MATCH_KEY_ respeta usar_abs.
     - Si modo = "Debe/Haber": Debe -> +abs, Haber -> -abs y claves enteras:
         _AMT_KEY_DEBE_POS, _AMT_KEY_HABER_NEG
-    - _AMT_KEY_PRIMARY_ desde _IMPORTE_MATCH_KEY_ (fallback)
+    - _AMT_KEY_PRIMARY_ (fallback); _IMPORTE_MATCH_KEY_ se deriva de ella.
+    Todas las claves son Int64 (nullable), parseadas directo a centavos.
+    Dtypes de las columnas de trabajo: ESQUEMA_SYS.
     """
-    df_sys = df_sys_raw.copy()
-    df_sys["_EMISION_"] = df_sys[col_emision].apply(normalize_date)
-    df_sys["_VENC_"] = df_sys[col_venc].apply(normalize_date)
+    df_sys = _project(df_sys_raw, (col_emision, col_venc, col_importe, col_debe, col_haber))
+    df_sys["_EMISION_"] = normalize_date_series(df_sys[col_emision])
+    df_sys["_VENC_"] = normalize_date_series(df_sys[col_venc])
 
     df_sys["_DEBE_NORM_"] = np.nan
     df_sys["_HABER_NORM_"] = np.nan
 
     is_columna_unica = _mode_is_columna_unica(modo_importe)
 
+    # claves enteras (centavos) directo desde el texto
     if is_columna_unica:
         if not col_importe:
             raise ValueError("Se debe indicar la columna de importe del sistema.")
-        df_sys["_IMPORTE_MATCH_KEY_"] = df_sys[col_importe].apply(
-            lambda v: normalize_amount(v, decimales, usar_abs)
-        )
+        df_sys["_AMT_KEY_PRIMARY_"] = normalize_amount_cents_series(df_sys[col_importe], decimales, use_abs=usar_abs)
+        df_sys["_AMT_KEY_DEBE_POS"] = pd.Series(pd.NA, index=df_sys.index, dtype="Int64")
+        df_sys["_AMT_KEY_HABER_NEG"] = pd.Series(pd.NA, index=df_sys.index, dtype="Int64")
     else:
         if not col_debe or not col_haber:
             raise ValueError("Se deben indicar columnas Debe y Haber del sistema.")
-        df_sys["_DEBE_NORM_"] = df_sys[col_debe].apply(
-            lambda v: normalize_amount(v, decimales, use_abs=False)
-        )
-        df_sys["_HABER_NORM_"] = df_sys[col_haber].apply(
-            lambda v: normalize_amount(v, decimales, use_abs=False)
-        )
-        df_sys["_DEBE_NORM_"] = df_sys["_DEBE_NORM_"].abs()
-        df_sys["_HABER_NORM_"] = df_sys["_HABER_NORM_"].abs()
-
-        def signed_primary(row):
-            d = row["_DEBE_NORM_"]
-            h = row["_HABER_NORM_"]
-            if pd.notna(d) and d != 0:
-                return +d
-            if pd.notna(h) and h != 0:
-                return -h
-            return np.nan
-
-        df_sys["_IMPORTE_MATCH_KEY_"] = df_sys.apply(signed_primary, axis=1)
-
-    # claves enteras (centavos)
-    scale = 10 ** int(decimales)
-
-    def to_key(v):
-        try:
-            if pd.isna(v):
-                return pd.NA
-            return int(round(float(v) * scale))
-        except Exception:
-            return pd.NA
-
-    df_sys["_AMT_KEY_PRIMARY_"] = df_sys["_IMPORTE_MATCH_KEY_"].apply(to_key)
-    df_sys["_AMT_KEY_DEBE_POS"] = pd.NA
-    df_sys["_AMT_KEY_HABER_NEG"] = pd.NA
-
-    if not is_columna_unica:
-        df_sys["_AMT_KEY_DEBE_POS"] = df_sys["_DEBE_NORM_"].apply(lambda v: to_key(+v))
-        df_sys["_AMT_KEY_HABER_NEG"] = df_sys["_HABER_NORM_"].apply(lambda v: to_key(-v))
-
-    return df_sys
+        key_debe = normalize_amount_cents_series(df_sys[col_debe], decimales, use_abs=True)
+        key_haber = normalize_amount_cents_series(df_sys[col_haber], decimales, use_abs=True)
+        df_sys["_DEBE_NORM_"] = cents_to_amount(key_debe, decimales)
+        df_sys["_HABER_NORM_"] = cents_to_amount(key_haber, decimales)
+        df_sys["_AMT_KEY_DEBE_POS"] = key_debe
+        df_sys["_AMT_KEY_HABER_NEG"] = -key_haber
+
+        # primaria: Debe (+) si hay y no es cero; si no, Haber (-)
+        usa_debe = (key_debe.notna() & (key_debe != 0)).to_numpy(dtype=bool)
+        usa_haber = ~usa_debe & (key_haber.notna() & (key_haber != 0)).to_numpy(dtype=bool)
+        df_sys["_AMT_KEY_PRIMARY_"] = key_debe.where(usa_debe, -key_haber).where(usa_debe | usa_haber)
+
+    df_sys["_IMPORTE_MATCH_KEY_"] = cents_to_amount(df_sys["_AMT_KEY_PRIMARY_"], decimales)
+
+    return apply_schema(df_sys, ESQUEMA_SYS)
 
 
 # --------------------------------------
 # Vistas de salida
 # --------------------------------------
 def build_views_for_output(
-    pairs: list,
+    pairs: pd.DataFrame,
     df_ext: pd.DataFrame,
     df_sys: pd.DataFrame,
     ext_cols: tuple,
@@ -218,45 +303,58 @@ def build_views_for_output(
     modo_importe_ext: str,
     used_ext: Set[int],
     used_sys: Set[int],
+    decimales: int = 2,
 ):
+    """
+    Armo las tablas de salida. 'pairs' es el DataFrame de pares que devuelve
+    match_one_to_one_by_amount_and_date (columnas PARES_COLS: _SYS_ID_,
+    _EXT_ID_, _DELTA_DIAS_, _DELTA_IMPORTE_), no una lista: "Correctos" sale de
+    tomar (take) las filas de cada lado por posición, sin recorrer pares en
+    Python. _DELTA_IMPORTE_ va en unidades de la clave entera: lo paso a
+    importe con 'decimales'.
+    """
     ext_col_fecha, ext_col_concepto, ext_col_importe, ext_col_debito, ext_col_credito = ext_cols
     sys_col_emision, sys_col_venc, sys_col_importe, sys_col_debe, sys_col_haber = sys_cols
 
     sys_columna_unica = _mode_is_columna_unica(modo_importe_sys)
     ext_columna_unica = _mode_is_columna_unica(modo_importe_ext)
 
-    correctos_rows = []
-    for s, e, delta in pairs:
-        row = {
-            "Emision (Sistema)": s.get(sys_col_emision),
-            "Vencimiento (Sistema)": s.get(sys_col_venc),
-        }
-        if sys_columna_unica and sys_col_importe:
-            row["Importe (Sistema)"] = s.get(sys_col_importe)
-        else:
-            if sys_col_debe:
-                row["Debe (Sistema)"] = s.get(sys_col_debe)
-            if sys_col_haber:
-                row["Haber (Sistema)"] = s.get(sys_col_haber)
-
-        row["Fecha (Extracto)"] = e.get(ext_col_fecha)
-        row["Concepto (Extracto)"] = e.get(ext_col_concepto)
-
-        if ext_columna_unica:
-            if ext_col_importe:
-                row["Importe (Extracto +/-)"] = e.get(ext_col_importe)
-            else:
-                row["Importe (Extracto +/-)"] = e.get("_IMPORTE_SIGNED_")
-        else:
-            if ext_col_debito:
-                row["Debito (Extracto)"] = e.get(ext_col_debito)
-            if ext_col_credito:
-                row["Credito (Extracto)"] = e.get(ext_col_credito)
-            row["Importe (Extracto +/-)"] = e.get("_IMPORTE_SIGNED_")
+    pos_sys = df_sys.index.get_indexer(pairs["_SYS_ID_"])
+    pos_ext = df_ext.index.get_indexer(pairs["_EXT_ID_"])
+
+    def _take(df, pos, col):
+        # columna ausente o sin mapear -> vacía (como dict.get)
+        if col is None or col not in df.columns:
+            return np.full(len(pos), None, dtype=object)
+        return df[col].take(pos).to_numpy()
+
+    correctos = {
+        "Emision (Sistema)": _take(df_sys, pos_sys, sys_col_emision),
+        "Vencimiento (Sistema)": _take(df_sys, pos_sys, sys_col_venc),
+    }
+    if sys_columna_unica and sys_col_importe:
+        correctos["Importe (Sistema)"] = _take(df_sys, pos_sys, sys_col_importe)
+    else:
+        if sys_col_debe:
+            correctos["Debe (Sistema)"] = _take(df_sys, pos_sys, sys_col_debe)
+        if sys_col_haber:
+            correctos["Haber (Sistema)"] = _take(df_sys, pos_sys, sys_col_haber)
+
+    correctos["Fecha (Extracto)"] = _take(df_ext, pos_ext, ext_col_fecha)
+    correctos["Concepto (Extracto)"] = _take(df_ext, pos_ext, ext_col_concepto)
 
-        row["Delta dias |fecha ext - emision/venc|"] = delta
-        correctos_rows.append(row)
-    correctos = pd.DataFrame(correctos_rows)
+    if ext_columna_unica:
+        correctos["Importe (Extracto +/-)"] = _take(df_ext, pos_ext, ext_col_importe or "_IMPORTE_SIGNED_")
+    else:
+        if ext_col_debito:
+            correctos["Debito (Extracto)"] = _take(df_ext, pos_ext, ext_col_debito)
+        if ext_col_credito:
+            correctos["Credito (Extracto)"] = _take(df_ext, pos_ext, ext_col_credito)
+        correctos["Importe (Extracto +/-)"] = _take(df_ext, pos_ext, "_IMPORTE_SIGNED_")
+
+    correctos["Delta dias |fecha ext - emision/venc|"] = pairs["_DELTA_DIAS_"].to_numpy()
+    correctos["Delta importe (extracto - sistema)"] = pairs["_DELTA_IMPORTE_"].to_numpy() / 10 ** int(decimales)
+    correctos = pd.DataFrame(correctos)
 
     ext_idx = df_ext.reset_index().rename(columns={"index": "_EXT_ID_"})
     mask_ext = ~ext_idx["_EXT_ID_"].isin(used_ext)
@@ -297,8 +395,10 @@ def split_system_unmatched_by_due(
     fecha_corte: date,
     modo_importe: str,
 ):
-    solo_sys_venc = solo_sys[solo_sys["_VENC_"].apply(lambda d: pd.notna(d) and d <= fecha_corte)]
-    solo_sys_dif = solo_sys[solo_sys["_VENC_"].apply(lambda d: pd.notna(d) and d > fecha_corte)]
+    # _VENC_ es datetime64: NaT no cae en ninguna de las dos
+    corte = pd.Timestamp(fecha_corte)
+    solo_sys_venc = solo_sys[solo_sys["_VENC_"] <= corte]
+    solo_sys_dif = solo_sys[solo_sys["_VENC_"] > corte]
 
     is_columna_unica = _mode_is_columna_unica(modo_importe)
 
@@ -312,7 +412,6 @@ def split_system_unmatched_by_due(
                 cols.append(col_debe)
             if col_haber:
                 cols.append(col_haber)
-        out = df[cols].copy()
         rename_map = {
             col_emision: "Emision",
             col_venc: "Vencimiento",
@@ -325,8 +424,70 @@ def split_system_unmatched_by_due(
                 rename_map[col_debe] = "Debe"
             if col_haber:
                 rename_map[col_haber] = "Haber"
-        out.rename(columns=rename_map, inplace=True)
-        return out
+        return df[cols].rename(columns=rename_map)
 
     return sys_view(solo_sys_venc), sys_view(solo_sys_dif)
 
+
+def summarize_excluded(df_ext_excl: pd.DataFrame) -> pd.DataFrame:
+    """Resumen de los descartados por concepto: Cantidad y Total, ordenado por Total (asc)."""
+    if df_ext_excl is None or df_ext_excl.empty:
+        return pd.DataFrame()
+    return (
+        df_ext_excl
+        .groupby("_CONCEPTO_", dropna=False, observed=True)["_IMPORTE_SIGNED_"]
+        .agg(Cantidad="count", Total="sum")
+        .reset_index()
+        .rename(columns={"_CONCEPTO_": "Concepto"})
+        .astype({"Concepto": str})
+        .sort_values("Total", ascending=True)
+    )
+
+
+
+_SENTIDO_LABELS = {
+    "varios_sistema": "Varios sistema -> 1 extracto",
+    "varios_extracto": "1 sistema -> varios extracto",
+}
+
+
+def build_group_view(
+    grupos: list,
+    df_ext: pd.DataFrame,
+    df_sys: pd.DataFrame,
+    ext_cols: tuple,
+    sys_cols: tuple,
+):
+    """
+    Una fila por integrante de cada grupo (ver match_groups_by_amount_sum),
+    con el importe normalizado con signo para que se vea que las sumas cierran.
+    """
+    ext_col_fecha, ext_col_concepto = ext_cols[0], ext_cols[1]
+    sys_col_emision, sys_col_venc = sys_cols[0], sys_cols[1]
+
+    rows = []
+    for n, (sentido, ids_sys, ids_ext, delta_max) in enumerate(grupos, start=1):
+        base = {"Grupo": n, "Tipo": _SENTIDO_LABELS.get(sentido, sentido)}
+        for s in ids_sys:
+            r = df_sys.loc[s]
+            rows.append({
+                **base,
+                "Lado": "Sistema",
+                "Fecha / Emision": r.get(sys_col_emision),
+                "Vencimiento": r.get(sys_col_venc),
+                "Concepto": None,
+                "Importe (+/-)": r.get("_IMPORTE_MATCH_KEY_"),
+                "Delta dias max": delta_max,
+            })
+        for e in ids_ext:
+            r = df_ext.loc[e]
+            rows.append({
+                **base,
+                "Lado": "Extracto",
+                "Fecha / Emision": r.get(ext_col_fecha),
+                "Vencimiento": None,
+                "Concepto": r.get(ext_col_concepto),
+                "Importe (+/-)": r.get("_IMPORTE_SIGNED_"),
+                "Delta dias max": delta_max,
+            })
+    return pd.DataFrame(rows)
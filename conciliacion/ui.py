@@ -2,16 +2,23 @@
 """
 UI de la app (compatible con app.py)
 - Autodetección de columnas del Sistema (Emisión, Vencimiento, Debe, Haber).
-- Header del Sistema por defecto = fila 6.
+- Fila de encabezado detectada por alias (si no aparece, Sistema = fila 6).
 - Filtro de conceptos con checklist (sin input de palabras clave).
 - Sección mínima para elegir SOLO los decimales.
 """
 
 import unicodedata
+import weakref
 import streamlit as st
 import pandas as pd
 from datetime import date
-from .utils import read_any_excel, list_sheets, normalize_text
+from .exclusion import compile_exclusions, parse_exclusion_rules, search_concepts, exclusion_impact
+from .utils import (
+    read_preview_cached, read_columns_cached, list_sheets_cached, normalize_text,
+    ingest_cache_stats, clear_ingest_cache, read_header_window_cached,
+    layout_fingerprint, recall_header_row, remember_header_row, content_hash, retain_upload, drop_upload,
+    memory_usage_mb, CSV_STREAMING_MIN_BYTES,
+)
 
 
 # ---------- helpers de headers ----------
@@ -35,6 +42,44 @@ def _find_col(cols, aliases):
     return 0
 
 
+# columnas que espero en cada archivo: cada grupo suma un punto si alguna
+# celda de la fila lo contiene (mismos alias que usa el mapeo)
+_HEADER_ALIASES_EXT = (("FECHA",), ("CONCEPTO",), ("IMPORTE",), ("DEBITO", "DEBE"), ("CREDITO", "HABER"))
+_HEADER_ALIASES_SYS = (("EMISION",), ("VENCIMIENTO",), ("DEBE",), ("HABER",))
+# con menos grupos no me animo a decir que es el encabezado
+_HEADER_MIN_PUNTOS = 2
+
+
+def detect_header_row(window: pd.DataFrame, aliases) -> int:
+    """
+    Fila de la ventana (0 = primera) que más grupos de alias contiene; ante
+    empate, la primera. None si ninguna llega a _HEADER_MIN_PUNTOS.
+    """
+    mejor, mejor_puntos = None, _HEADER_MIN_PUNTOS - 1
+    for i, row in enumerate(window.itertuples(index=False, name=None)):
+        norm = [_norm_hdr(v) for v in row if not pd.isna(v)]
+        puntos = sum(any(a in n for a in grupo for n in norm) for grupo in aliases)
+        if puntos > mejor_puntos:
+            mejor, mejor_puntos = i, puntos
+    return mejor
+
+
+def _header_detectado(f, sheet, aliases):
+    """
+    (huella del diseño, fila detectada 0-based o None). Si ya vi ese diseño
+    devuelvo la fila recordada sin puntuar. En CSV no aplica: se lee con la
+    primera fila como encabezado.
+    """
+    if sheet == "(CSV)":
+        return None, None
+    window = read_header_window_cached(f, sheet_name=sheet)
+    huella = layout_fingerprint(window)
+    fila = recall_header_row(huella)
+    if fila is None:
+        fila = detect_header_row(window, aliases)
+    return huella, fila
+
+
 # ---------- secciones esperadas por app.py ----------
 def draw_header():
     st.title("Conciliación Extracto vs. Sistema Lince SA")
@@ -50,22 +95,125 @@ def upload_files_section():
     return f_ext, f_sys
 
 
+class _FinDeSesion:
+    """Objeto guardado en session_state: cuando Streamlit descarta la sesión, se recolecta."""
+
+
+def _release_all(libros: dict):
+    for h in set(libros.values()):
+        drop_upload(h)
+    libros.clear()
+
+
+def _bind_upload(slot: str, f):
+    """
+    Si en este lugar (extracto / sistema) se subió otro archivo, suelto el
+    anterior: no espero a que lo saque la LRU. Libro y copia en disco son del
+    proceso, así que cuento las sesiones que tienen cada contenido
+    (retain_upload / drop_upload) y se liberan cuando lo suelta la última.
+    Al terminar la sesión suelto los archivos que le quedaban.
+    """
+    libros = st.session_state.setdefault("_libros_abiertos", {})
+    if "_fin_de_sesion" not in st.session_state:
+        fin = _FinDeSesion()
+        weakref.finalize(fin, _release_all, libros)
+        st.session_state["_fin_de_sesion"] = fin
+    antes = set(libros.values())
+    libros[slot] = content_hash(f)
+    despues = set(libros.values())
+    for h in despues - antes:
+        retain_upload(h)
+    for h in antes - despues:
+        drop_upload(h)
+
+
 def sheet_and_header_section(f_ext, f_sys):
-    sheets_ext = list_sheets(f_ext)
-    sheets_sys = list_sheets(f_sys)
+    _bind_upload("ext", f_ext)
+    _bind_upload("sys", f_sys)
+    sheets_ext = list_sheets_cached(f_ext)
+    sheets_sys = list_sheets_cached(f_sys)
 
     c_sh1, c_sh2 = st.columns(2)
     with c_sh1:
         sh_ext = st.selectbox("Hoja (Extracto)", options=sheets_ext, index=0)
-        hd_ext = st.number_input("Fila de encabezado (Extracto) [1 = primera fila]", min_value=1, value=1, step=1)
+        huella_ext, det_ext = _header_detectado(f_ext, sh_ext, _HEADER_ALIASES_EXT)
+        hd_ext = st.number_input(
+            "Fila de encabezado (Extracto) [1 = primera fila]"
+            + (f" (detectada: {det_ext + 1})" if det_ext is not None else ""),
+            min_value=1, value=1 if det_ext is None else det_ext + 1, step=1,
+        )
     with c_sh2:
         sh_sys = st.selectbox("Hoja (Sistema)", options=sheets_sys, index=0)
-        hd_sys = st.number_input("Fila de encabezado (Sistema) [1 = primera fila] (por defecto: 6)", min_value=1, value=6, step=1)
+        huella_sys, det_sys = _header_detectado(f_sys, sh_sys, _HEADER_ALIASES_SYS)
+        hd_sys = st.number_input(
+            "Fila de encabezado (Sistema) [1 = primera fila]"
+            + (f" (detectada: {det_sys + 1})" if det_sys is not None else " (por defecto: 6)"),
+            min_value=1, value=6 if det_sys is None else det_sys + 1, step=1,
+        )
+
+    # recuerdo la fila en uso (detectada o corregida a mano) para ese diseño:
+    # el próximo archivo con el mismo diseño arranca con esa fila
+    if huella_ext is not None:
+        remember_header_row(huella_ext, hd_ext - 1)
+    if huella_sys is not None:
+        remember_header_row(huella_sys, hd_sys - 1)
+
+    # primera fase: solo las primeras filas (vista previa y mapeo); mover el
+    # encabezado no relee el archivo entero
+    prev_ext = read_preview_cached(f_ext, sheet_name=_sheet_arg(sh_ext), header_row=hd_ext - 1)
+    prev_sys = read_preview_cached(f_sys, sheet_name=_sheet_arg(sh_sys), header_row=hd_sys - 1)
+
+    return sh_ext, hd_ext, sh_sys, hd_sys, prev_ext, prev_sys
 
-    df_ext_raw = read_any_excel(f_ext, sheet_name=None if sheets_ext == ["(CSV)"] else sh_ext, header_row=hd_ext - 1)
-    df_sys_raw = read_any_excel(f_sys, sheet_name=None if sheets_sys == ["(CSV)"] else sh_sys, header_row=hd_sys - 1)
 
-    return sh_ext, hd_ext, sh_sys, hd_sys, df_ext_raw, df_sys_raw
+def _sheet_arg(sheet):
+    return None if sheet == "(CSV)" else sheet
+
+
+def read_mapped_columns(f, sheet, header, columns, preview: pd.DataFrame) -> pd.DataFrame:
+    """Segunda fase: el archivo completo, solo con las columnas mapeadas."""
+    return read_columns_cached(f, _sheet_arg(sheet), header - 1, columns, preview)
+
+
+def csv_streaming_section(f_ext) -> bool:
+    """
+    Solo para extractos CSV: leer y transformar por bloques. Por defecto
+    activado desde CSV_STREAMING_MIN_BYTES.
+    """
+    if not f_ext.name.lower().endswith(".csv"):
+        return False
+    return st.checkbox(
+        "Leer el extracto CSV por bloques (archivos grandes)",
+        value=f_ext.size >= CSV_STREAMING_MIN_BYTES,
+        key="csv_streaming",
+        help="Normaliza y filtra cada bloque a medida que lo lee; guarda solo las columnas mapeadas ya transformadas.",
+    )
+
+
+def streaming_stats_section(stats: dict):
+    """Filas leídas y filas por segundo de la última lectura por bloques."""
+    if not stats:
+        return
+    with st.sidebar:
+        st.markdown("### Lectura por bloques")
+        st.caption(
+            f"{stats['filas']:,} filas en {stats['bloques']} bloques · {stats['segundos']:.1f} s · "
+            f"{stats['filas_seg']:,.0f} filas/s"
+        )
+
+
+def ingest_cache_section():
+    """Estado de la caché de archivos leídos (barra lateral) y botón para vaciarla."""
+    with st.sidebar:
+        st.markdown("### Caché de archivos")
+        if st.button("Vaciar caché", key="ingest_cache_clear"):
+            clear_ingest_cache()
+        stats = ingest_cache_stats()
+        st.caption(
+            f"Aciertos: {stats['hits']} · Lecturas: {stats['misses']} · "
+            f"Entradas: {stats['entradas']}/{stats['max']} · Libros abiertos: {stats['libros']} · "
+            f"En disco: {stats['en_disco'] / 2**20:.1f} MB"
+        )
 
 
 def preview_tabs(df_ext_raw: pd.DataFrame, df_sys_raw: pd.DataFrame):
@@ -140,28 +288,23 @@ def decimals_section():
 
 
 # --------- Filtros (checklist) --------
-def _concept_list_for_checklist(df_ext_raw: pd.DataFrame, col_concepto: str, top: int = 500):
+def _concept_list_for_checklist(indice: dict, top: int = 500):
     """Devuelvo una lista (ordenada por frecuencia desc) de conceptos normalizados para el checklist."""
-    s = df_ext_raw[col_concepto].astype(str).map(normalize_text)
-    counts = s.value_counts(dropna=False)
-    opts = counts.index.tolist()[:top]
-    return opts
+    return indice["conceptos"][:top].tolist()
 
 
-def filters_section(df_ext_raw: pd.DataFrame, ext_col_concepto: str):
-    """Filtros del extracto con checklist (multiselect). Sin palabras clave."""
+def filters_section(indice: dict):
+    """Filtros del extracto con checklist (multiselect), desde el índice de conceptos."""
     st.markdown("### Filtros del extracto")
 
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        opciones = _concept_list_for_checklist(df_ext_raw, ext_col_concepto)
+        sugeridos = _concept_list_for_checklist(indice)
         selection_key = "filters_excluir_exact_selection"
         if selection_key not in st.session_state:
             st.session_state[selection_key] = []
 
-        opciones = sorted(set(opciones) | set(st.session_state[selection_key]))
-
         search_key = "filters_excluir_exact_search"
         search_raw = st.text_input(
             "Buscar coincidencias (contiene)",
@@ -170,7 +313,8 @@ def filters_section(df_ext_raw: pd.DataFrame, ext_col_concepto: str):
         )
         search_norm = normalize_text(search_raw) if search_raw else ""
 
-        matches = [opt for opt in opciones if search_norm and search_norm in opt]
+        # busca en todos los conceptos del archivo (no solo en los sugeridos)
+        matches = search_concepts(indice, search_norm)
         col_btn_add, col_btn_remove = st.columns(2)
         with col_btn_add:
             if st.button("Seleccionar coincidencias", key="filters_select_matches", disabled=not matches):
@@ -179,6 +323,8 @@ def filters_section(df_ext_raw: pd.DataFrame, ext_col_concepto: str):
             if st.button("Quitar coincidencias", key="filters_remove_matches", disabled=not matches):
                 st.session_state[selection_key] = [opt for opt in st.session_state[selection_key] if opt not in matches]
 
+        # después de los botones: lo que se acaba de seleccionar tiene que estar entre las opciones
+        opciones = sorted(set(sugeridos) | set(st.session_state[selection_key]))
         excluir_exact = st.multiselect(
             "Selecciona conceptos a EXCLUIR (exactos, ya normalizados)",
             options=opciones,
@@ -195,12 +341,175 @@ def filters_section(df_ext_raw: pd.DataFrame, ext_col_concepto: str):
     return excluir_exact, fecha_corte
 
 
+def exclusion_rules_section(normalizar_texto: bool = True):
+    """
+    Reglas de exclusión escritas a mano (además de la checklist), una por
+    línea: "contiene:IVA", "regex:^RET\\s", "exacto:COMISION". Sin prefijo es
+    contiene. Devuelvo (contiene, regex, exacto) listas para
+    apply_extract_transformations; las regex inválidas se avisan y se saltean.
+    """
+    with st.expander("Reglas de exclusión (contiene / regex)"):
+        texto = st.text_area(
+            "Una regla por línea",
+            key="filters_reglas",
+            height=150,
+            placeholder="contiene:SIRCREB\nregex:^RET(ENCION)?\\s+IIBB\nexacto:COMISION MANTENIMIENTO",
+        )
+        reglas = parse_exclusion_rules(texto)
+        contiene = reglas["contiene"]
+        exacto = reglas["exacto"]
+        if normalizar_texto:
+            # los conceptos ya están normalizados (mayúsculas, sin espacios en los bordes)
+            contiene = [normalize_text(x) for x in contiene]
+            exacto = [normalize_text(x) for x in exacto]
+        regex = []
+        for patron in reglas["regex"]:
+            try:
+                compile_exclusions(regex=[patron])
+            except ValueError as e:
+                st.error(str(e))
+                continue
+            regex.append(patron)
+        if contiene or regex or exacto:
+            st.caption(f"{len(exacto)} exactas · {len(contiene)} contiene · {len(regex)} regex")
+    return contiene, regex, exacto
+
+
+def exclusion_impact_section(indice: dict, excluir_exact, excluir_contains, excluir_regex, normalizar_texto: bool = True):
+    """Filas e importe que sacan las exclusiones elegidas, calculado sobre el índice (antes de correr el resto)."""
+    exactos = {(normalize_text(x) if normalizar_texto else str(x).strip()) for x in excluir_exact}
+    filas, total = exclusion_impact(indice, compile_exclusions(exactos, excluir_contains, excluir_regex))
+    if filas:
+        st.info(f"Las exclusiones sacan {filas:,} filas del extracto (importe neto {total:,.2f}).")
+
 
 # ----- Parámetros de matching -----
-def matching_params_section():
-    c8, c9 = st.columns(2)
+_ASIGNACION_LABELS = {
+    "Secuencial (por emisión)": "secuencial",
+    "Global (menor delta primero)": "global",
+}
+
+
+def matching_params_section(decimales: int = 2):
+    c8, c9, c10 = st.columns(3)
     with c8:
         ventana_dias = st.number_input("Ventana máx. de días para matchear (0 = sin tope)", min_value=0, value=0, step=1)
     with c9:
         ordenar_por_emision = st.checkbox("Priorizar emisiones más antiguas primero", value=True)
-    return ventana_dias, ordenar_por_emision
+    with c10:
+        asignacion_label = st.radio(
+            "Asignación",
+            list(_ASIGNACION_LABELS),
+            index=0,
+            help="Secuencial: cada fila del sistema toma su extracto más cercano en orden. "
+                 "Global: se confirman primero los pares con menor diferencia de días de todo el conjunto.",
+        )
+
+    c11, c12 = st.columns(2)
+    paso = 10 ** -int(decimales)
+    with c11:
+        tolerancia_abs = st.number_input(
+            "Tolerancia de importe (± monto, 0 = exacto)",
+            min_value=0.0, value=0.0, step=paso, format=f"%.{int(decimales)}f",
+            help="Lo que no matchea exacto se vuelve a buscar admitiendo esta diferencia "
+                 "(redondeos, comisiones descontadas).",
+        )
+    with c12:
+        tolerancia_pct = st.number_input(
+            "Tolerancia de importe (± % del importe del sistema)",
+            min_value=0.0, max_value=100.0, value=0.0, step=0.1,
+            help="Se usa la mayor de las dos tolerancias.",
+        )
+    # la tolerancia absoluta va en unidades de la clave entera (p.ej. centavos)
+    tolerancia_importe = int(round(tolerancia_abs * 10 ** int(decimales)))
+    return (
+        ventana_dias, ordenar_por_emision, _ASIGNACION_LABELS[asignacion_label],
+        tolerancia_importe, float(tolerancia_pct),
+    )
+
+
+# ----- Grupos (N-1 / 1-N) -----
+def group_matching_section():
+    """Segunda etapa opcional: grupos de filas que suman la contraparte. 0 filas = desactivada."""
+    c13, c14, c15 = st.columns(3)
+    with c13:
+        activar = st.checkbox(
+            "Buscar grupos (varias facturas en un pago / pago partido)",
+            value=False,
+            help="Sobre lo que quedó sin par, busca grupos de filas cuya suma coincide exacto con la contraparte.",
+        )
+    with c14:
+        max_filas = st.number_input("Máx. filas por grupo", min_value=2, max_value=6, value=3, step=1, disabled=not activar)
+    with c15:
+        presupuesto_seg = st.number_input(
+            "Tiempo máx. por etapa (seg)", min_value=1.0, max_value=120.0, value=5.0, step=1.0, disabled=not activar,
+        )
+    return (int(max_filas) if activar else 0), float(presupuesto_seg)
+
+
+# ----- Log de etapas (pipeline memoizado) -----
+def stage_log_section(log: list):
+    """Qué etapas se recalcularon en este rerun y cuáles salieron de la caché."""
+    with st.sidebar:
+        st.markdown("### Etapas (este rerun)")
+        recalculadas = sum(1 for _, acierto, _ in log if not acierto)
+        st.caption(f"{len(log) - recalculadas} en caché · {recalculadas} recalculadas")
+        st.dataframe(
+            pd.DataFrame(
+                [(nombre, "caché" if acierto else "recalculada", round(seg, 3)) for nombre, acierto, seg in log],
+                columns=["Etapa", "Estado", "Segundos"],
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+def frames_memory_section(memoria: pd.DataFrame):
+    """MB de cada frame (crudos y de trabajo), de transform.frame_memory."""
+    with st.sidebar:
+        st.markdown("### Memoria por frame")
+        st.dataframe(memoria, hide_index=True, use_container_width=True)
+
+
+def memory_section():
+    """RSS del proceso: actual y pico desde el arranque (para dimensionar el contenedor)."""
+    mem = memory_usage_mb()
+    with st.sidebar:
+        st.markdown("### Memoria")
+        st.caption(
+            f"Actual: {mem['actual']:.0f} MB · Pico: {mem['pico']:.0f} MB — de todo el proceso "
+            f"(todas las sesiones abiertas, desde que arrancó el servidor)"
+        )
+
+
+# ----- Exportación (a pedido) -----
+_FORMATO_LABELS = {
+    "Excel (.xlsx)": "xlsx",
+    "ZIP con CSV": "csv",
+    "ZIP con Parquet": "parquet",
+    "ZIP con CSV + Parquet": "csv+parquet",
+}
+
+
+def export_section():
+    """Opciones del reporte y botón para generarlo. Devuelvo (pedido, modo de resumen, formato)."""
+    st.markdown("---")
+    st.subheader("Reporte")
+    c16, c17, c18 = st.columns([2, 2, 1])
+    with c16:
+        formato_label = st.selectbox(
+            "Formato",
+            list(_FORMATO_LABELS),
+            index=0,
+            help="Los ZIP traen un archivo por tabla y un manifest.json con parámetros y cantidad de filas.",
+        )
+    with c17:
+        completo = st.checkbox(
+            "Resumen con todas las filas de cada sección",
+            value=True,
+            help="Solo Excel. Desmarcado, la hoja Resumen queda con cantidad y total por sección "
+                 "(las filas ya están en las hojas de cada tabla).",
+        )
+    with c18:
+        pedido = st.button("Generar reporte", key="export_generar")
+    return pedido, ("completo" if completo else "conteos"), _FORMATO_LABELS[formato_label]
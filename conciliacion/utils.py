@@ -3,7 +3,15 @@
 Utils: lectura de archivos, parseos robustos de número/fecha y helpers.
 """
 
+import os
 import re
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import numpy as np
 import pandas as pd
 import streamlit as st
@@ -12,15 +20,31 @@ import streamlit as st
 # -----------------------------
 # Lectura de archivos y hojas
 # -----------------------------
-def read_any_excel(uploaded, sheet_name=0, header_row=0):
-    """Leo CSV/XLS/XLSX y devuelvo DataFrame."""
+# filas que lee la primera fase (vista previa, encabezados, mapeo)
+PREVIEW_FILAS = 200
+# filas que miro (sin encabezado) para detectar la fila de títulos
+HEADER_SCAN_FILAS = 30
+# CSV por bloques: filas por bloque y tamaño desde el que se propone por defecto
+CSV_CHUNK_FILAS = 200_000
+CSV_STREAMING_MIN_BYTES = 50 * 2**20
+
+
+def read_any_excel(uploaded, sheet_name=0, header_row=0, nrows=None, usecols=None):
+    """
+    Leo CSV/XLS/XLSX y devuelvo DataFrame.
+    nrows: solo las primeras filas (vista previa); usecols: posiciones de las
+    columnas a leer. Los tipos los infiere pandas (fechas como datetime64,
+    importes como float64) para que los parseos por columna tomen sus
+    caminos rápidos; lo mezclado queda object y va por el camino de texto.
+    """
     name = uploaded.name.lower()
     if name.endswith(".csv"):
-        return pd.read_csv(uploaded)
-    elif name.endswith(".xlsx"):
-        return pd.read_excel(uploaded, sheet_name=sheet_name, engine="openpyxl", header=header_row)
-    elif name.endswith(".xls"):
-        return pd.read_excel(uploaded, sheet_name=sheet_name, engine="xlrd", header=header_row)
+        return pd.read_csv(spool_upload(uploaded), nrows=nrows, usecols=usecols, memory_map=True)
+    elif name.endswith((".xlsx", ".xls")):
+        # el libro se abre una sola vez (open_workbook) y sirve todas las lecturas
+        return open_workbook(uploaded).parse(
+            sheet_name=sheet_name, header=header_row, nrows=nrows, usecols=usecols,
+        )
     else:
         st.error("Formato no soportado. Usa .xls, .xlsx, o .csv")
         st.stop()
@@ -29,18 +53,362 @@ def read_any_excel(uploaded, sheet_name=0, header_row=0):
 def list_sheets(uploaded):
     """Devuelvo lista de hojas de XLS/XLSX; si es CSV, devuelvo ['(CSV)']."""
     name = uploaded.name.lower()
+    if not name.endswith((".xlsx", ".xls")):
+        return ["(CSV)"]
     try:
-        if name.endswith(".xlsx"):
-            xf = pd.ExcelFile(uploaded, engine="openpyxl")
-        elif name.endswith(".xls"):
-            xf = pd.ExcelFile(uploaded, engine="xlrd")
-        else:
-            return ["(CSV)"]
-        return xf.sheet_names
+        return open_workbook(uploaded).sheet_names
     except Exception:
         return ["(CSV)"]
 
 
+# -----------------------------
+# Caché de lecturas (entre reruns de Streamlit)
+# -----------------------------
+# cada widget re-ejecuta app.py entero: sin esto, cada click vuelve a parsear
+# los dos archivos. Clave: (hash del contenido, hoja, fila de encabezado);
+# LRU acotada por cantidad de entradas, compartida por todo el proceso (las
+# sesiones corren en hilos distintos: _INGEST_LOCK cubre caché y contadores).
+INGEST_CACHE_MAX = 8
+_INGEST_CACHE = OrderedDict()
+_INGEST_STATS = {"hits": 0, "misses": 0}
+_INGEST_LOCK = threading.Lock()
+
+
+def content_hash(uploaded) -> str:
+    """Hash (blake2b) del contenido de un archivo subido, sin mover su puntero."""
+    # lo guardo en el objeto: en un rerun se pide varias veces para el mismo archivo
+    memo = getattr(uploaded, "_conciliacion_hash", None)
+    if memo is not None:
+        return memo
+    if hasattr(uploaded, "getbuffer"):
+        # vista sobre el buffer del archivo subido, sin copiar los bytes
+        with uploaded.getbuffer() as data:
+            memo = hashlib.blake2b(data, digest_size=16).hexdigest()
+    else:
+        pos = uploaded.tell()
+        memo = hashlib.blake2b(uploaded.read(), digest_size=16).hexdigest()
+        uploaded.seek(pos)
+    try:
+        uploaded._conciliacion_hash = memo
+    except AttributeError:
+        pass
+    return memo
+
+
+# -----------------------------
+# Archivos subidos volcados a disco
+# -----------------------------
+# Streamlit ya tiene el archivo en memoria; en vez de sumar copias propias
+# (BytesIO, bytes leídos por pandas/xlrd) lo escribo una vez a un directorio
+# temporal y leo desde ahí: CSV con memory_map, .xls mapeado por xlrd, y en
+# .xlsx el zip lee cada hoja del archivo a medida que la necesita.
+_SPOOL_DIR = None
+_SPOOL = {}
+
+
+def spool_upload(uploaded) -> str:
+    """Ruta del archivo subido volcado a disco (lo escribo la primera vez, por contenido)."""
+    global _SPOOL_DIR
+    key = content_hash(uploaded)
+    with _UPLOAD_LOCK:
+        path = _SPOOL.get(key)
+        if path is not None and os.path.exists(path):
+            return path
+        if _SPOOL_DIR is None:
+            _SPOOL_DIR = tempfile.mkdtemp(prefix="conciliacion-")
+            atexit.register(shutil.rmtree, _SPOOL_DIR, True)
+    path = os.path.join(_SPOOL_DIR, key + os.path.splitext(uploaded.name.lower())[1])
+    # escribo fuera del lock a un nombre propio y lo renombro (atómico): otra
+    # sesión con el mismo contenido nunca lee un archivo a medio escribir
+    fd, parcial = tempfile.mkstemp(dir=_SPOOL_DIR, suffix=".parcial")
+    with os.fdopen(fd, "wb") as out:
+        if hasattr(uploaded, "getbuffer"):
+            with uploaded.getbuffer() as data:
+                out.write(data)
+        else:
+            pos = uploaded.tell()
+            uploaded.seek(0)
+            shutil.copyfileobj(uploaded, out)
+            uploaded.seek(pos)
+    os.replace(parcial, path)
+    with _UPLOAD_LOCK:
+        _SPOOL[key] = path
+    return path
+
+
+def release_upload(hash_contenido: str):
+    """Cierro el libro abierto de ese contenido y borro su copia en disco."""
+    with _UPLOAD_LOCK:
+        release_workbook(hash_contenido)
+        path = _SPOOL.pop(hash_contenido, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+# libros y copias en disco son del proceso (por contenido) y los comparten
+# las sesiones que subieron el mismo archivo: cuento cuántas lo tienen y lo
+# libero recién cuando lo suelta la última. Cada sesión corre en su hilo: un
+# solo lock (reentrante) cubre los contadores, _SPOOL y _WORKBOOKS.
+_UPLOAD_REFS = {}
+_UPLOAD_LOCK = threading.RLock()
+
+
+def retain_upload(hash_contenido: str):
+    """Una sesión más tiene subido ese contenido."""
+    with _UPLOAD_LOCK:
+        _UPLOAD_REFS[hash_contenido] = _UPLOAD_REFS.get(hash_contenido, 0) + 1
+
+
+def drop_upload(hash_contenido: str):
+    """Una sesión soltó ese contenido; si era la última, lo libero (release_upload)."""
+    with _UPLOAD_LOCK:
+        n = _UPLOAD_REFS.get(hash_contenido, 0) - 1
+        if n > 0:
+            _UPLOAD_REFS[hash_contenido] = n
+            return
+        _UPLOAD_REFS.pop(hash_contenido, None)
+        release_upload(hash_contenido)
+        # lo que quedó por encima del tope mientras todo estaba en uso
+        _evict_workbooks()
+
+
+def upload_in_use(hash_contenido: str) -> bool:
+    """¿Alguna sesión tiene subido ese contenido?"""
+    with _UPLOAD_LOCK:
+        return _UPLOAD_REFS.get(hash_contenido, 0) > 0
+
+
+def spooled_bytes() -> int:
+    """Bytes en disco de los archivos volcados."""
+    with _UPLOAD_LOCK:
+        paths = list(_SPOOL.values())
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+# -----------------------------
+# Libros abiertos (un handle por archivo subido)
+# -----------------------------
+# pd.ExcelFile abierto una vez por contenido: hojas, vistas previas y
+# lecturas por columnas salen del mismo handle (openpyxl no vuelve a abrir el
+# zip ni a leer los textos compartidos; xlrd no vuelve a parsear el .xls).
+# Pocos a la vez: cada uno retiene el archivo y lo que el motor ya cargó.
+WORKBOOKS_MAX = 4
+_WORKBOOKS = OrderedDict()
+
+
+def open_workbook(uploaded) -> pd.ExcelFile:
+    """Handle abierto (pd.ExcelFile) de un XLS/XLSX subido; lo abro la primera vez que se pide."""
+    key = content_hash(uploaded)
+    with _UPLOAD_LOCK:
+        xf = _WORKBOOKS.get(key)
+        if xf is not None:
+            _WORKBOOKS.move_to_end(key)
+            return xf
+    engine = "xlrd" if uploaded.name.lower().endswith(".xls") else "openpyxl"
+    # abro fuera del lock (puede tardar); desde la copia en disco: el handle
+    # no comparte el puntero del archivo subido
+    nuevo = pd.ExcelFile(spool_upload(uploaded), engine=engine)
+    with _UPLOAD_LOCK:
+        xf = _WORKBOOKS.get(key)
+        if xf is None:
+            xf = _WORKBOOKS[key] = nuevo
+            _evict_workbooks(conservar=key)
+        else:
+            # otra sesión lo abrió mientras tanto: uso el suyo
+            _WORKBOOKS.move_to_end(key)
+            nuevo.close()
+        return xf
+
+
+def _evict_workbooks(conservar: str = None):
+    """
+    Bajo el lock: cierro los más viejos hasta WORKBOOKS_MAX, pero solo los
+    que ninguna sesión tiene subidos (otra sesión puede estar leyendo de
+    ese handle). Si todos están en uso, la caché queda por encima del tope
+    hasta que alguna sesión suelte su archivo (drop_upload vuelve a probar).
+    """
+    sobran = len(_WORKBOOKS) - WORKBOOKS_MAX
+    for k in [k for k in _WORKBOOKS if k != conservar and not upload_in_use(k)][:max(sobran, 0)]:
+        release_upload(k)
+
+
+def release_workbook(hash_contenido: str):
+    """Cierro y olvido el libro abierto de ese contenido (si lo hay)."""
+    with _UPLOAD_LOCK:
+        xf = _WORKBOOKS.pop(hash_contenido, None)
+    if xf is not None:
+        xf.close()
+
+
+# -----------------------------
+# Memoria del proceso
+# -----------------------------
+def _proc_status_kb(campo: str):
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith(campo + ":"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def memory_usage_mb() -> dict:
+    """
+    RSS actual y pico del proceso desde el arranque, en MB. Es de todo el
+    proceso: con varias sesiones abiertas, incluye la memoria de todas (no
+    lo reinicio por rerun: /proc/self/clear_refs también es del proceso y
+    una sesión le borraría el pico a las demás).
+    """
+    actual = _proc_status_kb("VmRSS")
+    pico = _proc_status_kb("VmHWM")
+    if pico is None:
+        import resource
+        # ru_maxrss: KB en Linux (pico desde el arranque)
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"actual": (actual or 0) / 1024, "pico": pico / 1024}
+
+
+def _cached(key, loader):
+    with _INGEST_LOCK:
+        if key in _INGEST_CACHE:
+            _INGEST_STATS["hits"] += 1
+            _INGEST_CACHE.move_to_end(key)
+            return _INGEST_CACHE[key]
+        _INGEST_STATS["misses"] += 1
+    # la lectura va fuera del lock: una lectura lenta no frena a las otras
+    # sesiones (si dos piden lo mismo a la vez, las dos leen y queda una)
+    value = loader()
+    with _INGEST_LOCK:
+        _INGEST_CACHE[key] = value
+        _INGEST_CACHE.move_to_end(key)
+        while len(_INGEST_CACHE) > INGEST_CACHE_MAX:
+            _INGEST_CACHE.popitem(last=False)
+    return value
+
+
+def read_preview_cached(uploaded, sheet_name=0, header_row=0, nrows=PREVIEW_FILAS):
+    """
+    Primera fase: solo las primeras filas (todas las columnas), con caché.
+    Devuelvo el DataFrame guardado tal cual: quien lo use no debe
+    modificarlo in-place.
+    """
+    key = (content_hash(uploaded), uploaded.name.lower().rsplit(".", 1)[-1], sheet_name, header_row, "preview", nrows)
+    return _cached(key, lambda: read_any_excel(uploaded, sheet_name=sheet_name, header_row=header_row, nrows=nrows))
+
+
+def read_columns_cached(uploaded, sheet_name, header_row, columns, preview: pd.DataFrame):
+    """
+    Segunda fase: todas las filas pero solo 'columns' (nombres de la vista
+    previa, sin repetidos ni None). Leo por posición y devuelvo las columnas
+    con los mismos nombres que en la vista previa.
+    """
+    posiciones = sorted({preview.columns.get_loc(c) for c in columns if c is not None})
+    key = (content_hash(uploaded), uploaded.name.lower().rsplit(".", 1)[-1], sheet_name, header_row,
+           "cols", tuple(posiciones))
+
+    def _leer():
+        df = read_any_excel(uploaded, sheet_name=sheet_name, header_row=header_row, usecols=posiciones)
+        df.columns = [preview.columns[i] for i in posiciones]
+        return df
+
+    return _cached(key, _leer)
+
+
+def iter_csv_chunks(uploaded, columns, preview: pd.DataFrame, chunksize: int = None):
+    """
+    Lectura por bloques de un CSV subido: solo 'columns' (como en
+    read_columns_cached), de a 'chunksize' filas, desde la copia en disco.
+    El índice sigue corrido entre bloques (0..n-1 en todo el archivo).
+    """
+    chunksize = chunksize or CSV_CHUNK_FILAS
+    posiciones = sorted({preview.columns.get_loc(c) for c in columns if c is not None})
+    nombres = [preview.columns[i] for i in posiciones]
+    with pd.read_csv(spool_upload(uploaded), usecols=posiciones, chunksize=chunksize, memory_map=True) as reader:
+        for chunk in reader:
+            chunk.columns = nombres
+            yield chunk
+
+
+def list_sheets_cached(uploaded):
+    """list_sheets con la misma caché de lecturas (_INGEST_CACHE)."""
+    key = (content_hash(uploaded), uploaded.name.lower().rsplit(".", 1)[-1], "(hojas)")
+    return _cached(key, lambda: list_sheets(uploaded))
+
+
+def read_header_window_cached(uploaded, sheet_name=0, nrows=None):
+    """Primeras filas de la hoja sin encabezado (header=None), para buscar la fila de títulos."""
+    nrows = nrows or HEADER_SCAN_FILAS
+    key = (content_hash(uploaded), uploaded.name.lower().rsplit(".", 1)[-1], sheet_name, "ventana", nrows)
+    return _cached(key, lambda: read_any_excel(uploaded, sheet_name=sheet_name, header_row=None, nrows=nrows))
+
+
+# -----------------------------
+# Fila de encabezado por diseño de planilla
+# -----------------------------
+# diseño de planilla -> fila de encabezado (0 = primera); el mismo reporte
+# del sistema o del banco, con otros datos, tiene el mismo diseño
+HEADER_LAYOUTS_MAX = 64
+_HEADER_LAYOUTS = OrderedDict()
+_DIGITOS_RE = re.compile(r"\d")
+
+
+def layout_fingerprint(window: pd.DataFrame) -> str:
+    """
+    Huella del diseño de una hoja: las filas de la ventana que son solo texto
+    sin dígitos (títulos y encabezados), con su posición y la cantidad de
+    columnas. Las filas de datos (importes, fechas) y los títulos con fechas
+    quedan afuera, así que cambiar de mes o de archivo no cambia la huella.
+    """
+    filas = []
+    for i, row in enumerate(window.itertuples(index=False, name=None)):
+        celdas = [str(v).strip().upper() for v in row if not pd.isna(v) and str(v).strip() != ""]
+        if celdas and not any(_DIGITOS_RE.search(c) for c in celdas):
+            filas.append((i, tuple(celdas)))
+    return hashlib.blake2b(repr((window.shape[1], filas)).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def recall_header_row(fingerprint: str):
+    """Fila de encabezado (0 = primera) recordada para un diseño, o None."""
+    with _INGEST_LOCK:
+        fila = _HEADER_LAYOUTS.get(fingerprint)
+        if fila is not None:
+            _HEADER_LAYOUTS.move_to_end(fingerprint)
+    return fila
+
+
+def remember_header_row(fingerprint: str, fila: int):
+    """Recuerdo la fila de encabezado de un diseño (LRU acotada, como la caché de lecturas)."""
+    with _INGEST_LOCK:
+        _HEADER_LAYOUTS[fingerprint] = int(fila)
+        _HEADER_LAYOUTS.move_to_end(fingerprint)
+        while len(_HEADER_LAYOUTS) > HEADER_LAYOUTS_MAX:
+            _HEADER_LAYOUTS.popitem(last=False)
+
+
+def ingest_cache_stats() -> dict:
+    """Aciertos, fallos y entradas actuales de la caché de lecturas, y libros abiertos."""
+    with _INGEST_LOCK:
+        stats = {**_INGEST_STATS, "entradas": len(_INGEST_CACHE)}
+    return {**stats, "max": INGEST_CACHE_MAX, "libros": len(_WORKBOOKS), "en_disco": spooled_bytes()}
+
+
+def clear_ingest_cache():
+    """
+    Vacío la caché de lecturas y reinicio los contadores. Libros abiertos y
+    copias en disco: solo los que ninguna sesión tiene subidos.
+    """
+    with _INGEST_LOCK:
+        _INGEST_CACHE.clear()
+        _INGEST_STATS["hits"] = 0
+        _INGEST_STATS["misses"] = 0
+    with _UPLOAD_LOCK:
+        for key in set(_WORKBOOKS) | set(_SPOOL):
+            if not upload_in_use(key):
+                release_upload(key)
+
+
 # -----------------------------
 # Normalización de valores
 # -----------------------------
@@ -51,6 +419,36 @@ def normalize_text(x):
     return str(x).strip().upper()
 
 
+def normalize_text_series(col: pd.Series, categorical: bool = False) -> pd.Series:
+    """
+    normalize_text por columna: paso a texto, normalizo solo los valores
+    únicos y los expando con factorize. Factorizo el texto y no el valor
+    crudo: 1 y 1.0 son iguales como valor pero dan "1" y "1.0".
+    categorical=True: devuelvo una columna category armada con esos mismos
+    códigos (sin volver a hashear los textos).
+    """
+    na = col.isna().to_numpy()
+    codes, uniques = pd.factorize(col.astype(object).astype(str), use_na_sentinel=True)
+    norm = np.array([u.strip().upper() for u in uniques] + [""], dtype=object)
+    codes[na] = -1
+    # código -1 (NaN) -> último lugar: ""
+    if not categorical:
+        return pd.Series(norm[codes], index=col.index)
+    # dos crudos pueden normalizar igual (" a" y "A"): las categorías van sin repetir
+    norm_codes, categorias = pd.factorize(norm)
+    cat = pd.Categorical.from_codes(norm_codes[codes], categories=pd.Index(categorias, dtype=object))
+    return pd.Series(cat, index=col.index)
+
+
+_CURRENCY_RE = re.compile(r"[A-Za-z$€£¥₱₡₲₵₴₦₹]")
+_UNICODE_MINUS_RE = "[\u2212\u2012\u2013\u2014]"
+# Lo que float() acepta sin sorpresas; el resto cae al parser escalar.
+_PLAIN_NUMBER_RE = r"^-?(?:[0-9]{1,300}\.?[0-9]*|\.[0-9]+)$"
+# tope de las claves enteras: entra holgado en int64
+_MAX_CENTS = 10 ** 18
+_UNUSUAL_CHAR_RE = "[^0-9A-Za-z$€£¥₱₡₲₵₴₦₹ ,.()+\\-\t\n\r\xa0\u2212\u2012\u2013\u2014]"
+
+
 def _normalize_minus_signs(s: str) -> str:
     """Unifico guiones unicode a '-'."""
     return (s
@@ -81,7 +479,7 @@ def parse_number_locale(s_raw: str, decimals=2):
             s = s[1:-1].strip()
 
         # saco símbolos de moneda / letras (dejo + y -)
-        s = re.sub(r"[A-Za-z$€£¥₱₡₲₵₴₦₹]", "", s)
+        s = _CURRENCY_RE.sub("", s)
         s = s.replace(" ", "")
 
         # sufijo negativo '1234-'
@@ -127,9 +525,376 @@ def normalize_amount(x, decimals=2, use_abs=False):
     return v
 
 
+def _round_like_python(values: np.ndarray, decimals: int) -> np.ndarray:
+    """
+    np.round no siempre coincide con round() de Python (que redondea sobre el
+    valor binario exacto). Uso np.round y corrijo con round() solo los casos
+    dudosos: fracciones pegadas a .5 o magnitudes donde el escalado pierde precisión.
+    """
+    scale = 10.0 ** decimals
+    with np.errstate(invalid="ignore", over="ignore"):
+        out = np.round(values, decimals)
+        scaled = values * scale
+        frac = np.abs(scaled - np.floor(scaled) - 0.5)
+        dudoso = np.isfinite(values) & ((frac < 1e-6) | (np.abs(scaled) >= 1e15))
+    if dudoso.any():
+        out[dudoso] = [round(float(v), decimals) for v in values[dudoso]]
+    return out
+
+
+def _float_repr_is_plain(values: np.ndarray) -> np.ndarray:
+    """True donde str(float) no usa notación científica ni es nan/inf."""
+    a = np.abs(values)
+    with np.errstate(invalid="ignore"):
+        return np.isfinite(values) & ((a == 0) | ((a >= 1e-4) & (a < 1e16)))
+
+
+def _clean_number_strings(orig: np.ndarray):
+    """
+    La cirugía de parse_number_locale, pero por columna (Arrow, corre en C++).
+    Devuelvo (s, neg, plain, resto):
+      - s: texto limpio; donde plain=True es un número plano '-?123.45'
+      - neg: paréntesis contables o sufijo '-' (el signo se aplica al final)
+      - resto: celdas que tiene que resolver el parser escalar
+    Donde ni plain ni resto, el escalar daría NaN.
+    """
+    # texto en Arrow (string[pyarrow]; pyarrow está en requirements.txt)
+    s = pd.Series([str(v) for v in orig], dtype="string[pyarrow]")
+
+    # celdas con caracteres fuera de lo habitual (whitespace unicode, otros
+    # alfabetos, '_', etc.) las resuelve el escalar tal cual
+    raro = s.str.contains(_UNUSUAL_CHAR_RE, regex=True).to_numpy(dtype=bool)
+
+    s = (s.str.replace(_UNICODE_MINUS_RE, "-", regex=True)
+          .str.replace("\xa0", " ", regex=False)
+          .str.strip())
+
+    # paréntesis contables
+    neg_paren = (s.str.startswith("(") & s.str.endswith(")")).to_numpy(dtype=bool)
+    if neg_paren.any():
+        s = s.where(~neg_paren, s.str.slice(1, -1).str.strip())
+
+    # símbolos de moneda / letras y espacios
+    s = s.str.replace(_CURRENCY_RE.pattern, "", regex=True).str.replace(" ", "", regex=False)
+
+    # sufijo negativo '1234-'
+    suf_neg = s.str.endswith("-").to_numpy(dtype=bool)
+    if suf_neg.any():
+        s = s.where(~suf_neg, s.str.slice(0, -1))
+
+    def _minus_to_leading(t: pd.Series) -> pd.Series:
+        mover = t.str.contains("-", regex=False) & ~t.str.startswith("-")
+        if mover.any():
+            t = t.where(~mover, "-" + t.str.replace("-", "", regex=False))
+        return t
+
+    s = _minus_to_leading(s)
+
+    plus = s.str.startswith("+")
+    if plus.any():
+        s = s.where(~plus, s.str.slice(1))
+
+    # decidir decimal según la última aparición entre ',' y '.'
+    has_comma = s.str.contains(",", regex=False)
+    has_dot = s.str.contains(".", regex=False)
+    both = has_comma & has_dot
+    if both.any():
+        comma_last = both & s.str.contains(",[^.]*$", regex=True)
+        dot_last = both & ~comma_last
+        s = s.where(~comma_last, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+        s = s.where(~dot_last, s.str.replace(",", "", regex=False))
+    only_comma = has_comma & ~has_dot
+    if only_comma.any():
+        s = s.where(~only_comma, s.str.replace(",", ".", regex=False))
+
+    s = _minus_to_leading(s)
+
+    plain = s.str.match(_PLAIN_NUMBER_RE).to_numpy(dtype=bool) & ~raro
+
+    # con solo dígitos, '.', '-' y paréntesis float() acepta exactamente
+    # _PLAIN_NUMBER_RE: el resto es NaN salvo lo que tenga otros caracteres
+    # (o dígitos de más), que lo resuelve el escalar
+    dudoso = s.str.contains("[^0-9.()\\-]", regex=True) | (s.str.len() > 300)
+    resto = ~plain & (raro | dudoso.to_numpy(dtype=bool))
+
+    return s, neg_paren | suf_neg, plain, resto
+
+
+def parse_number_locale_series(col: pd.Series, decimals=2) -> pd.Series:
+    """
+    Versión por columna de parse_number_locale (mismo resultado, celda a celda).
+    - Columnas ya numéricas: camino rápido sin pasar por strings.
+    - Texto: la misma cirugía que el escalar pero con .str vectorizado.
+    Lo raro (lo que no queda como número plano) cae al parser escalar.
+    """
+    index = col.index
+    out = np.full(len(col), np.nan, dtype="float64")
+
+    if pd.api.types.is_integer_dtype(col.dtype) or pd.api.types.is_float_dtype(col.dtype):
+        if col.dtype == "float32":
+            # str(np.float32) no da el mismo float64: mejor por el camino de texto
+            col = col.astype(object)
+        else:
+            vals = col.to_numpy(dtype="float64", na_value=np.nan)
+            plain = _float_repr_is_plain(vals)
+            out[plain] = _round_like_python(vals[plain], decimals)
+            raro = ~plain & ~np.isnan(vals)
+            if raro.any():
+                # enteros gigantes / notación científica: como lo haría el escalar
+                orig = col.to_numpy(dtype=object)
+                out[raro] = [parse_number_locale(v, decimals) for v in orig[raro]]
+            return pd.Series(out, index=index, dtype="float64")
+
+    present = ~col.isna().to_numpy()
+    if not present.any():
+        return pd.Series(out, index=index, dtype="float64")
+
+    orig = col.to_numpy(dtype=object)[present]
+    s, neg, plain, resto = _clean_number_strings(orig)
+
+    vals = np.full(len(s), np.nan, dtype="float64")
+    if plain.any():
+        vals[plain] = s[plain].astype("float64").to_numpy()
+        vals = np.where(plain & neg, -vals, vals)
+        vals[plain] = _round_like_python(vals[plain], decimals)
+
+    if resto.any():
+        vals[resto] = [parse_number_locale(v, decimals) for v in orig[resto]]
+
+    out[present] = vals
+    return pd.Series(out, index=index, dtype="float64")
+
+
+def _decimal_to_cents(d: Decimal, decimals: int):
+    """Decimal -> entero en unidades mínimas (redondeo comercial, .5 se aleja del cero)."""
+    try:
+        c = int(d.scaleb(decimals).to_integral_value(rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError, OverflowError):
+        return pd.NA
+    return c if abs(c) <= _MAX_CENTS else pd.NA
+
+
+def _plain_strings_to_cents(s: pd.Series, decimals: int) -> np.ndarray:
+    """'-?123.456' -> centavos int64 operando sobre los dígitos (sin pasar por float)."""
+    negativo = s.str.startswith("-").to_numpy(dtype=bool)
+    # fuerzo '<entero>.<fraccion>' con al menos decimals+1 dígitos de fracción
+    s = s.str.replace("-", "", regex=False)
+    s = s.where(s.str.contains(".", regex=False), s + ".") + "0" * (decimals + 1)
+    ent = "0" + s.str.replace("\\.[0-9]*$", "", regex=True)
+    # me quedo con 'decimals' dígitos + uno más para redondear
+    frac = s.str.replace("^[0-9]*\\.", "", regex=True).str.slice(0, decimals + 1)
+    ent = ent.astype("int64").to_numpy()
+    frac = frac.astype("int64").to_numpy()
+    cents = ent * (10 ** decimals) + frac // 10 + (frac % 10 >= 5)
+    return np.where(negativo, -cents, cents)
+
+
+def parse_amount_cents_series(col: pd.Series, decimals=2) -> pd.Series:
+    """
+    Parseo de importes directo a clave entera (Int64 nullable) en unidades de
+    10**-decimals, sin ida y vuelta por float:
+      "1.200,35" -> 120035 ; "(1,200.355)" -> -120036
+    Redondeo comercial sobre el número escrito (.5 se aleja del cero).
+    Mismos formatos que parse_number_locale; para columnas numéricas uso el
+    valor del float tal como se muestra (repr) en los casos dudosos.
+    """
+    index = col.index
+    out = pd.array(np.zeros(len(col), dtype="int64"), dtype="Int64")
+    out[:] = pd.NA
+    scale = 10 ** int(decimals)
+
+    if pd.api.types.is_integer_dtype(col.dtype):
+        vals = col.to_numpy(dtype="float64", na_value=np.nan)
+        ok = ~np.isnan(vals) & (np.abs(vals) <= _MAX_CENTS / scale)
+        ints = col[ok].to_numpy(dtype="int64")
+        out[ok] = ints * scale
+        return pd.Series(out, index=index)
+
+    if pd.api.types.is_float_dtype(col.dtype) and col.dtype != "float32":
+        vals = col.to_numpy(dtype="float64", na_value=np.nan)
+        with np.errstate(invalid="ignore", over="ignore"):
+            scaled = vals * scale
+            frac = np.abs(scaled - np.floor(scaled) - 0.5)
+            finite = np.isfinite(scaled) & (np.abs(scaled) <= _MAX_CENTS)
+            # .5 "de verdad" (2.675 -> 267.4999...) o magnitudes sin precisión:
+            # lo decide el número escrito, no el binario
+            dudoso = finite & ((frac < 1e-6) | (np.abs(scaled) >= 2 ** 52))
+            simple = finite & ~dudoso
+            out[simple] = np.sign(scaled[simple]).astype("int64") * np.floor(np.abs(scaled[simple]) + 0.5).astype("int64")
+        if dudoso.any():
+            out[dudoso] = [_decimal_to_cents(Decimal(repr(float(v))), decimals) for v in vals[dudoso]]
+        return pd.Series(out, index=index)
+
+    present = ~col.isna().to_numpy()
+    if not present.any():
+        return pd.Series(out, index=index)
+
+    orig = col.to_numpy(dtype=object)[present]
+    s, neg, plain, resto = _clean_number_strings(orig)
+
+    cents = pd.array(np.zeros(len(s), dtype="int64"), dtype="Int64")
+    cents[:] = pd.NA
+    # parte entera acotada para que el int64 no desborde
+    corto = plain & (s.str.len() <= 15).to_numpy(dtype=bool)
+    if corto.any():
+        c = _plain_strings_to_cents(s[corto], decimals)
+        cents[corto] = np.where(neg[corto], -c, c)
+    largo = plain & ~corto
+    if largo.any():
+        cents[largo] = [
+            _decimal_to_cents(-Decimal(t) if n else Decimal(t), decimals)
+            for t, n in zip(s[largo], neg[largo])
+        ]
+    if resto.any():
+        # el escalar ya redondea a 'decimals': lo paso a entero tal cual
+        cents[resto] = [
+            pd.NA if pd.isna(v) else _decimal_to_cents(Decimal(repr(v)), decimals)
+            for v in (parse_number_locale(x, decimals) for x in orig[resto])
+        ]
+
+    out[present] = cents
+    return pd.Series(out, index=index)
+
+
+def normalize_amount_cents_series(col: pd.Series, decimals=2, use_abs=False) -> pd.Series:
+    """normalize_amount por columna, pero devolviendo la clave entera (Int64)."""
+    v = parse_amount_cents_series(col, decimals)
+    if use_abs:
+        v = v.abs()
+    return v
+
+
+def cents_to_amount(cents: pd.Series, decimals=2) -> pd.Series:
+    """Clave entera (Int64) -> importe float64 con NaN."""
+    vals = cents.to_numpy(dtype="float64", na_value=np.nan) / (10 ** int(decimals))
+    return pd.Series(vals, index=cents.index, dtype="float64")
+
+
 def normalize_date(x):
     """Fecha robusta con dayfirst=True; NaT si no se puede."""
     try:
         return pd.to_datetime(x, dayfirst=True, errors="coerce").date()
     except Exception:
         return pd.NaT
+
+
+# serial de Excel: días desde 1899-12-30 (hasta 9999-12-31)
+_EXCEL_EPOCH = np.datetime64("1899-12-30", "D")
+_EXCEL_MAX_SERIAL = 2958465
+# ordinal (días desde 1970-01-01) para fechas inválidas
+NAT_ORDINAL = np.iinfo(np.int32).min
+
+
+def _numbers_to_days(vals: np.ndarray) -> np.ndarray:
+    """
+    Números -> datetime64[D]:
+      - 1..2958465: serial de Excel (la parte decimal es la hora, la descarto)
+      - 19000101..29991231 enteros: AAAAMMDD
+    El resto, NaT.
+    """
+    vals = np.asarray(vals, dtype="float64")
+    out = np.full(len(vals), np.datetime64("NaT"), dtype="datetime64[D]")
+    with np.errstate(invalid="ignore"):
+        serial = np.isfinite(vals) & (vals >= 1) & (vals <= _EXCEL_MAX_SERIAL)
+        out[serial] = _EXCEL_EPOCH + np.floor(vals[serial]).astype("int64")
+        ymd = (vals >= 19000101) & (vals <= 29991231) & (vals == np.floor(vals))
+    if ymd.any():
+        txt = pd.Series(vals[ymd].astype("int64").astype(str))
+        out[ymd] = pd.to_datetime(txt, format="%Y%m%d", errors="coerce").to_numpy(dtype="datetime64[D]")
+    return out
+
+
+def _dates_to_days(values) -> np.ndarray:
+    """Resultado de normalize_date (date / NaT) -> datetime64[D]."""
+    return np.array(
+        [np.datetime64("NaT") if pd.isna(d) else np.datetime64(d, "D") for d in values],
+        dtype="datetime64[D]",
+    )
+
+
+def _parse_unique_date_strings(strs: np.ndarray) -> np.ndarray:
+    """
+    Textos únicos -> datetime64[D]. Infiero el formato con el primero y lo
+    aplico vectorizado; lo valido contra normalize_date en una muestra (y
+    descarto formatos mes/día) para no cambiar el criterio dayfirst.
+    Lo que no entra en el formato lo resuelvo con normalize_date.
+    """
+    out = np.full(len(strs), np.datetime64("NaT"), dtype="datetime64[D]")
+    if len(strs) == 0:
+        return out
+
+    pendientes = np.ones(len(strs), dtype=bool)
+    fmt = None
+    try:
+        fmt = pd.tseries.api.guess_datetime_format(strs[0], dayfirst=True)
+    except Exception:
+        fmt = None
+    if fmt and "%d" in fmt and "%m" in fmt and fmt.index("%m") < fmt.index("%d"):
+        fmt = None
+
+    if fmt:
+        parsed = pd.to_datetime(pd.Series(strs, dtype=object), format=fmt, errors="coerce")
+        days = parsed.to_numpy(dtype="datetime64[D]")
+        ok = ~np.isnat(days)
+        muestra = np.flatnonzero(ok)[:50]
+        if np.array_equal(days[muestra], _dates_to_days(normalize_date(x) for x in strs[muestra])):
+            out[ok] = days[ok]
+            pendientes = ~ok
+
+    if pendientes.any():
+        out[pendientes] = _dates_to_days(normalize_date(x) for x in strs[pendientes])
+    return out
+
+
+def normalize_date_series(col: pd.Series) -> pd.Series:
+    """
+    normalize_date por columna, devolviendo fechas (sin hora) como datetime64.
+    pandas no tiene unidad [D] en Series: queda en datetime64[s] a medianoche.
+    - datetime64: solo trunco al día.
+    - numéricas: serial de Excel / AAAAMMDD.
+    - texto / mixtas: parseo solo los valores únicos (formato inferido) y
+      los vuelvo a expandir con los códigos de factorize.
+    """
+    dtype = col.dtype
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, "tz", None) is not None:
+            col = col.dt.tz_localize(None)
+        days = col.to_numpy(dtype="datetime64[D]")
+    elif (pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype)) \
+            and not pd.api.types.is_bool_dtype(dtype):
+        days = _numbers_to_days(col.to_numpy(dtype="float64", na_value=np.nan))
+    else:
+        codes, uniques = pd.factorize(col, use_na_sentinel=True)
+        uniques = np.asarray(uniques, dtype=object)
+        parsed = np.full(len(uniques), np.datetime64("NaT"), dtype="datetime64[D]")
+
+        es_texto = np.array([isinstance(u, str) for u in uniques], dtype=bool)
+        es_numero = np.array(
+            [isinstance(u, (int, float, np.integer, np.floating)) and not isinstance(u, (bool, np.bool_))
+             for u in uniques],
+            dtype=bool,
+        )
+        otros = ~es_texto & ~es_numero
+
+        if es_texto.any():
+            parsed[es_texto] = _parse_unique_date_strings(uniques[es_texto])
+        if es_numero.any():
+            parsed[es_numero] = _numbers_to_days(uniques[es_numero].astype("float64"))
+        if otros.any():
+            parsed[otros] = _dates_to_days(normalize_date(x) for x in uniques[otros])
+
+        days = np.where(codes >= 0, parsed[np.maximum(codes, 0)], np.datetime64("NaT"))
+
+    return pd.Series(days.astype("datetime64[s]"), index=col.index)
+
+
+def date_ordinals(col: pd.Series) -> np.ndarray:
+    """Fechas -> días desde 1970-01-01 (int32); inválidas = NAT_ORDINAL."""
+    if not pd.api.types.is_datetime64_any_dtype(col.dtype):
+        col = normalize_date_series(col)
+    elif getattr(col.dtype, "tz", None) is not None:
+        col = col.dt.tz_localize(None)
+    days = col.to_numpy(dtype="datetime64[D]")
+    out = days.astype("int64")
+    out[np.isnat(days)] = NAT_ORDINAL
+    return out.astype("int32")
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Modo batch: validación del archivo de trabajos (todo error es ValueError
+con el trabajo que falla) y un trabajo chico de punta a punta.
+"""
+
+import copy
+import json
+import os
+import re
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from conciliacion.batch import load_jobs, run_job
+
+_EXTRACTO = pd.DataFrame({
+    "Fecha": ["02/01/2024", "03/01/2024", "05/01/2024", "08/01/2024"],
+    "Concepto": ["TRANSFERENCIA A", "CHEQUE 123", "SIRCREB", "DEPOSITO B"],
+    "Importe": [-1500.0, -230.5, -12.0, 800.0],
+})
+_SISTEMA = pd.DataFrame({
+    "Emision": ["02/01/2024", "03/01/2024", "08/01/2024", "20/01/2024"],
+    "Vencimiento": ["02/01/2024", "03/01/2024", "08/01/2024", "30/07/2024"],
+    "Debe": [0.0, 0.0, 800.0, 0.0],
+    "Haber": [1500.0, 230.5, 0.0, 99.0],
+})
+_VALIDO = {
+    "salida": "out",
+    "procesos": 1,
+    "defaults": {"fecha_corte": "2024-06-30",
+                 "sistema": {"archivo": "sys.xlsx", "encabezado": 3, "emision": "Emision",
+                             "vencimiento": "Vencimiento", "modo_importe": "Debe/Haber",
+                             "debe": "Debe", "haber": "Haber"}},
+    "trabajos": [
+        {"nombre": "banco",
+         "extracto": {"archivo": "ext.csv", "fecha": "Fecha", "concepto": "Concepto",
+                      "modo_importe": "Columna unica", "importe": "Importe"},
+         "excluir_contains": ["sircreb"]},
+    ],
+}
+
+
+@pytest.fixture
+def carpeta(tmp_path):
+    _EXTRACTO.to_csv(tmp_path / "ext.csv", index=False)
+    # dos filas de título arriba: el encabezado queda en la fila 3
+    with pd.ExcelWriter(tmp_path / "sys.xlsx") as w:
+        pd.DataFrame([["Mayor de proveedores"], [""]]).to_excel(w, index=False, header=False)
+        _SISTEMA.to_excel(w, index=False, startrow=2)
+    return tmp_path
+
+
+def _escribir(carpeta, data) -> str:
+    path = os.path.join(carpeta, "trabajos.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    return path
+
+
+def _con(cambio):
+    data = copy.deepcopy(_VALIDO)
+    cambio(data)
+    return data
+
+
+def test_load_jobs_valid_file(carpeta):
+    jobs = load_jobs(_escribir(carpeta, _VALIDO))
+    assert jobs["procesos"] == 1
+    assert jobs["salida"] == os.path.join(str(carpeta), "out")
+    (t,) = jobs["trabajos"]
+    assert t["nombre"] == "banco"
+    assert t["fecha_corte"] == date(2024, 6, 30)
+    assert t["extracto"]["archivo"] == os.path.join(str(carpeta), "ext.csv")
+    assert t["sistema"]["hoja"] == 0 and t["sistema"]["encabezado"] == 3
+    assert t["decimales"] == 2 and t["max_filas_grupo"] == 0
+
+
+def _sin(d, clave):
+    del d[clave]
+
+
+_RECHAZOS = {
+    "trabajos no es lista": (lambda d: d.update(trabajos={"a": 1}), "'trabajos' debe ser una lista"),
+    "trabajo no es objeto": (lambda d: d["trabajos"].append("otro"), "Trabajo #2: debe ser un objeto"),
+    "defaults no es objeto": (lambda d: d.update(defaults=[1]), "'defaults' debe ser un objeto"),
+    "defaults.sistema no es objeto": (lambda d: d["defaults"].update(sistema="sys.xlsx"), "'defaults.sistema'"),
+    "lado no es objeto": (lambda d: d["trabajos"][0].update(extracto="ext.csv"), "Trabajo #1: 'extracto'"),
+    "falta un lado": (lambda d: _sin(d["defaults"], "sistema"), "falta 'sistema'"),
+    "procesos no entero": (lambda d: d.update(procesos="4"), "'procesos'"),
+    "salida no es texto": (lambda d: d.update(salida=3), "'salida'"),
+    "archivo no es texto": (lambda d: d["defaults"]["sistema"].update(archivo=3), "sistema.archivo"),
+    "archivo inexistente": (lambda d: d["defaults"]["sistema"].update(archivo="no.xlsx"), "no.xlsx"),
+    "extensión": (lambda d: d["defaults"]["sistema"].update(archivo="trabajos.json"), "'banco'"),
+    "encabezado null": (lambda d: d["defaults"]["sistema"].update(encabezado=None), "sistema.encabezado"),
+    "encabezado lista": (lambda d: d["defaults"]["sistema"].update(encabezado=[1]), "sistema.encabezado"),
+    "encabezado texto": (lambda d: d["defaults"]["sistema"].update(encabezado="tres"), "sistema.encabezado"),
+    "encabezado bool": (lambda d: d["defaults"]["sistema"].update(encabezado=True), "sistema.encabezado"),
+    "encabezado cero": (lambda d: d["defaults"]["sistema"].update(encabezado=0), "sistema.encabezado"),
+    "hoja bool": (lambda d: d["defaults"]["sistema"].update(hoja=False), "sistema.hoja"),
+    "modo_importe": (lambda d: _sin(d["trabajos"][0]["extracto"], "modo_importe"), "extracto.modo_importe"),
+    "falta columna": (lambda d: _sin(d["trabajos"][0]["extracto"], "fecha"), "faltan columnas de extracto: fecha"),
+    "columna no texto": (lambda d: d["trabajos"][0]["extracto"].update(concepto=2), "no son texto: concepto"),
+    "Debe/Haber sin haber": (lambda d: _sin(d["defaults"]["sistema"], "haber"), "necesita debe y haber"),
+    "numérico como texto": (lambda d: d["trabajos"][0].update(ventana_dias="5"), "ventana_dias"),
+    "numérico negativo": (lambda d: d["trabajos"][0].update(tolerancia_pct=-1), "tolerancia_pct"),
+    "exclusión no lista": (lambda d: d["trabajos"][0].update(excluir_contains="sircreb"), "excluir_contains"),
+    "flag no bool": (lambda d: d["trabajos"][0].update(ordenar_por_emision="si"), "ordenar_por_emision"),
+    "asignación": (lambda d: d["trabajos"][0].update(asignacion="azar"), "asignación desconocida"),
+    "formato": (lambda d: d["trabajos"][0].update(formato="pdf"), "formato desconocido"),
+    "resumen": (lambda d: d["trabajos"][0].update(resumen="corto"), "resumen desconocido"),
+    "fecha_corte": (lambda d: d["trabajos"][0].update(fecha_corte="30/06/2024"), "fecha_corte"),
+    "regex": (lambda d: d["trabajos"][0].update(excluir_regex=["("]), "'banco'"),
+    "nombre repetido": (lambda d: d["trabajos"].append(copy.deepcopy(d["trabajos"][0])), "repetido"),
+}
+
+
+@pytest.mark.parametrize("cambio,mensaje", _RECHAZOS.values(), ids=_RECHAZOS.keys())
+def test_load_jobs_rejects_with_value_error(carpeta, cambio, mensaje):
+    with pytest.raises(ValueError, match=re.escape(mensaje)):
+        load_jobs(_escribir(carpeta, _con(cambio)))
+
+
+def test_load_jobs_rejects_invalid_json(carpeta):
+    path = os.path.join(carpeta, "trabajos.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{\"trabajos\": [")
+    with pytest.raises(ValueError, match="inválido"):
+        load_jobs(path)
+
+
+def test_run_job_end_to_end(carpeta):
+    jobs = load_jobs(_escribir(carpeta, _VALIDO))
+    os.makedirs(jobs["salida"])      # lo crea run_batch
+    reg = run_job(jobs["trabajos"][0], jobs["salida"])
+    assert reg["estado"] == "ok", reg["error"]
+    assert os.path.isfile(reg["reporte"])
+    # SIRCREB queda excluido; las tres restantes cruzan 1-1; la del 20/01
+    # del sistema vence después del corte
+    assert reg["filas"]["extracto"] == 4 and reg["filas"]["sistema"] == 4
+    assert reg["filas"]["correctos"] == 3
+    assert reg["filas"]["solo_extracto"] == 0
+    assert reg["filas"]["diferidos"] == 1 and reg["filas"]["vencidos"] == 0
+    assert "lectura sys" in reg["segundos"] and "total" in reg["segundos"]
+
+
+def test_run_job_reports_missing_column_as_job_error(carpeta):
+    data = _con(lambda d: d["trabajos"][0]["extracto"].update(concepto="Detalle"))
+    jobs = load_jobs(_escribir(carpeta, data))
+    reg = run_job(jobs["trabajos"][0], jobs["salida"])
+    assert reg["estado"] == "error"
+    assert "Detalle" in reg["error"]
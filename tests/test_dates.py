@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Paridad de normalize_date_series contra el escalar normalize_date:
+    - texto (dd/mm, ISO, mixto, AAAAMMDD escrito), objetos y nulos: la misma
+      fecha celda a celda, incluso cuando el formato inferido del primer
+      valor no sirve para el resto
+    - tz-aware: la fecha local (como .date() del Timestamp)
+    - números: serial de Excel / AAAAMMDD (el escalar los lee como
+      nanosegundos desde 1970, ahí no hay paridad a propósito)
+y date_ordinals: días desde 1970-01-01, NaT -> NAT_ORDINAL.
+"""
+
+import random
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conciliacion import utils
+from conciliacion.utils import NAT_ORDINAL, date_ordinals, normalize_date, normalize_date_series
+
+
+def _escalar(col: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        fechas = [normalize_date(x) for x in col]
+    days = np.array([np.datetime64("NaT") if pd.isna(d) else np.datetime64(d, "D") for d in fechas],
+                    dtype="datetime64[D]")
+    return pd.Series(days.astype("datetime64[s]"), index=col.index)
+
+
+def _serie(col: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return normalize_date_series(col)
+
+
+def _dias(rng: random.Random, n: int) -> list:
+    return [date(2020, 1, 1) + timedelta(days=rng.randrange(2000)) for _ in range(n)]
+
+
+_RNG = random.Random(7)
+COLUMNAS = {
+    "dd/mm/aaaa": [d.strftime("%d/%m/%Y") for d in _dias(_RNG, 300)],
+    "d/m/aa": [f"{d.day}/{d.month}/{d:%y}" for d in _dias(_RNG, 300)],
+    "dd-mm-aaaa hh:mm": [d.strftime("%d-%m-%Y 10:45") for d in _dias(_RNG, 300)],
+    "iso": [d.isoformat() for d in _dias(_RNG, 300)],
+    "iso con hora": [d.strftime("%Y-%m-%d %H:%M:%S") for d in _dias(_RNG, 300)],
+    "aaaammdd texto": [d.strftime("%Y%m%d") for d in _dias(_RNG, 300)],
+    "mixto": ["13/02/2024", "2024-02-01", "3-4-2024", "15.06.2024", "01/02/24", "1 feb 2024",
+              "20240131", "basura", "", "  ", None, np.nan, "31/02/2024", "02/13/2024"] * 5,
+    "iso primero y después dd/mm": ["2024-02-01"] + [d.strftime("%d/%m/%Y") for d in _dias(_RNG, 80)],
+    "nulos": [None, np.nan, pd.NaT, pd.NA, "", "  "],
+    "objetos": [pd.Timestamp("2024-01-05 13:00"), date(2024, 3, 1), "05/01/2024", None],
+    "tz-aware objetos": [pd.Timestamp("2024-06-30 23:30", tz="America/Argentina/Buenos_Aires"), "01/07/2024"],
+}
+
+
+@pytest.mark.parametrize("valores", COLUMNAS.values(), ids=COLUMNAS.keys())
+def test_series_matches_scalar(valores):
+    col = pd.Series(valores, dtype=object)
+    pd.testing.assert_series_equal(_serie(col), _escalar(col))
+
+
+@pytest.mark.parametrize("guess", ["%y%d%m", "%m/%d/%Y", "%d/%m/%Y", "%Y-%d-%m"])
+def test_series_matches_scalar_whatever_format_is_guessed(monkeypatch, guess):
+    # el formato inferido es un atajo: bueno, malo o descartado, el resultado es el del escalar
+    monkeypatch.setattr(utils.pd.tseries.api, "guess_datetime_format", lambda *a, **kw: guess)
+    col = pd.Series([d.strftime("%d%m%y") for d in _dias(random.Random(2), 60)]
+                    + [d.isoformat() for d in _dias(random.Random(3), 60)]
+                    + [d.strftime("%d/%m/%Y") for d in _dias(random.Random(4), 60)], dtype=object)
+    pd.testing.assert_series_equal(_serie(col), _escalar(col))
+
+
+def test_month_first_format_is_not_used(monkeypatch):
+    llamadas = []
+    original = pd.to_datetime
+
+    def espia(*args, **kwargs):
+        llamadas.append(kwargs.get("format"))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(utils.pd.tseries.api, "guess_datetime_format", lambda *a, **kw: "%m/%d/%Y")
+    monkeypatch.setattr(utils.pd, "to_datetime", espia)
+    col = pd.Series(["01/02/2024", "03/04/2024"], dtype=object)
+    assert _serie(col).tolist() == [pd.Timestamp("2024-02-01"), pd.Timestamp("2024-04-03")]
+    assert "%m/%d/%Y" not in llamadas
+
+
+def test_sample_check_falls_back_to_scalar(monkeypatch):
+    # "%y%d%m" parsea todo pero no como el escalar (ddmmaa): la muestra lo rechaza
+    monkeypatch.setattr(utils.pd.tseries.api, "guess_datetime_format", lambda *a, **kw: "%y%d%m")
+    col = pd.Series(["010203", "040506", "070809"], dtype=object)
+    assert pd.to_datetime(col, format="%y%d%m").notna().all()
+    assert _serie(col).tolist() == [pd.Timestamp("2003-02-01"), pd.Timestamp("2006-05-04"),
+                                    pd.Timestamp("2009-08-07")]
+
+
+def test_tz_aware_column_keeps_local_date():
+    col = pd.Series(pd.to_datetime(["2024-01-01 23:30", "2024-06-30 01:00", None])
+                    .tz_localize("America/Argentina/Buenos_Aires"))
+    pd.testing.assert_series_equal(_serie(col), _escalar(col))
+
+
+def test_datetime_column_truncates_to_day():
+    col = pd.Series(pd.to_datetime(["2024-01-01 23:30", None, "2024-02-29 00:01"]))
+    pd.testing.assert_series_equal(_serie(col), _escalar(col))
+
+
+@pytest.mark.parametrize("col", [
+    pd.Series([45000, 45000.75, 1, 2958465, 20240131, 19000101, np.nan, 0, -5, 3e9]),
+    pd.Series([45000, "20240131", 20240131, None], dtype=object),
+    pd.Series([45000, 20240131, None], dtype="Int64"),
+], ids=["float", "object", "Int64"])
+def test_numbers_are_excel_serials_or_yyyymmdd(col):
+    excel = np.datetime64("1899-12-30", "D")
+    esperado = []
+    for v in col:
+        if pd.isna(v):
+            esperado.append(pd.NaT)
+        elif isinstance(v, str):
+            esperado.append(pd.Timestamp(normalize_date(v)))
+        elif 19000101 <= v <= 29991231 and v == int(v):
+            esperado.append(pd.Timestamp(str(int(v))))
+        elif 1 <= v <= 2958465:
+            esperado.append(pd.Timestamp(excel + int(np.floor(v))))
+        else:
+            esperado.append(pd.NaT)
+    got = _serie(col)
+    assert [None if pd.isna(g) else g for g in got] == [None if pd.isna(e) else e for e in esperado]
+
+
+def test_series_keeps_index():
+    col = pd.Series(["01/02/2024", None], index=[10, 20])
+    assert list(_serie(col).index) == [10, 20]
+
+
+@pytest.mark.parametrize("col", [
+    pd.Series(["01/01/1970", "02/01/1970", None, "basura", "31/12/1969"], dtype=object),
+    pd.Series(pd.to_datetime(["1970-01-01", "1970-01-02", None, None, "1969-12-31"])),
+    pd.Series(pd.to_datetime(["1970-01-01 10:00", "1970-01-02 00:00", None, None, "1969-12-31 23:00"])
+              .tz_localize("America/Argentina/Buenos_Aires")),
+], ids=["texto", "datetime", "tz-aware"])
+def test_date_ordinals_maps_nat_to_sentinel(col):
+    ords = date_ordinals(col)
+    assert ords.dtype == np.int32
+    assert ords.tolist() == [0, 1, NAT_ORDINAL, NAT_ORDINAL, -1]
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+Matching 1-1 sobre frames aleatorios: los motores y modos contra sus
+referencias (motor clásico o búsqueda exhaustiva).
+
+Los frames traen lo que complica los desempates: fechas NaT, filas con
+Debe y Haber, claves 0 y NA, pocos importes distintos (tramos repetidos) y
+un índice del extracto con huecos (como tras filtrar excluidos).
+"""
+
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conciliacion import matching
+from conciliacion.matching import match_one_to_one_by_amount_and_date
+
+
+def _fechas(rng, n: int, p_nat: float = 0.1) -> pd.Series:
+    d = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90, n), "D")).astype("datetime64[s]")
+    d[rng.random(n) < p_nat] = pd.NaT
+    return d
+
+
+def _frames(rng, n_sys: int, n_ext: int, n_claves: int):
+    """(df_sys, df_ext) con las columnas de trabajo que lee el matcher."""
+    claves = rng.integers(-n_claves, n_claves, n_sys) * 100
+    debe = pd.array(np.where(rng.random(n_sys) < 0.5, np.abs(claves), 0), dtype="Int64")
+    haber = pd.array(-np.abs(claves), dtype="Int64")
+    m = rng.random(n_sys)
+    debe[m < 0.3] = pd.NA
+    haber[(m >= 0.3) & (m < 0.6)] = pd.NA
+    primaria = pd.array(claves, dtype="Int64")
+    primaria[rng.random(n_sys) < 0.1] = pd.NA
+    df_sys = pd.DataFrame({
+        "_EMISION_": _fechas(rng, n_sys),
+        "_VENC_": _fechas(rng, n_sys),
+        "_AMT_KEY_DEBE_POS": debe,
+        "_AMT_KEY_HABER_NEG": haber,
+        "_AMT_KEY_PRIMARY_": primaria,
+    })
+    clave_ext = pd.array(rng.integers(-n_claves, n_claves, n_ext) * 100, dtype="Int64")
+    clave_ext[rng.random(n_ext) < 0.05] = pd.NA
+    df_ext = pd.DataFrame({"_FECHA_": _fechas(rng, n_ext), "_AMT_KEY_": clave_ext})
+    df_ext.index = np.sort(rng.choice(n_ext * 3, n_ext, replace=False))
+    return df_sys, df_ext
+
+
+def _casos(seed: int, n: int, max_filas: int = 60, max_claves: int = 8):
+    """n pares de frames aleatorios (reproducibles por seed)."""
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        n_sys, n_ext = rng.integers(0, max_filas, 2)
+        yield _frames(rng, int(n_sys), int(n_ext), int(rng.integers(1, max_claves)))
+
+
+# -----------------------------
+# Referencias exhaustivas (fila por fila, sin los internos del matcher)
+# -----------------------------
+_INVALIDA = 999_999
+
+
+def _dias(serie: pd.Series) -> list:
+    """Fechas como días enteros (None = NaT)."""
+    return [None if pd.isna(v) else (v - pd.Timestamp("1970-01-01")).days for v in serie]
+
+
+def _delta(f, em, ve) -> int:
+    de = _INVALIDA if f is None or em is None else abs(f - em)
+    dv = _INVALIDA if f is None or ve is None else abs(f - ve)
+    return min(de, dv)
+
+
+def _claves_sys(df_sys: pd.DataFrame) -> list:
+    """Claves de cada fila del sistema en el orden en que se prueban (Debe, Haber; si no, la primaria)."""
+    out = []
+    for debe, haber, primaria in zip(df_sys["_AMT_KEY_DEBE_POS"], df_sys["_AMT_KEY_HABER_NEG"], df_sys["_AMT_KEY_PRIMARY_"]):
+        claves = [int(k) for k in (debe, haber) if pd.notna(k)]
+        if not claves and pd.notna(primaria):
+            claves = [int(primaria)]
+        out.append(claves)
+    return out
+
+
+def _orden_sys(df_sys: pd.DataFrame, orden: bool) -> list:
+    """Posiciones del sistema en orden de recorrido: por emisión (NaT al final) o como vienen."""
+    em = _dias(df_sys["_EMISION_"])
+    filas = list(range(len(df_sys)))
+    if orden:
+        filas.sort(key=lambda i: (em[i] is None, em[i] or 0))
+    return filas
+
+
+def _contexto(df_sys: pd.DataFrame, df_ext: pd.DataFrame) -> dict:
+    return {
+        "em": _dias(df_sys["_EMISION_"]),
+        "ve": _dias(df_sys["_VENC_"]),
+        "f": _dias(df_ext["_FECHA_"]),
+        "claves_sys": _claves_sys(df_sys),
+        "clave_ext": [None if pd.isna(k) else int(k) for k in df_ext["_AMT_KEY_"]],
+        "sys_ids": [int(x) for x in df_sys.index],
+        "ext_ids": [int(x) for x in df_ext.index],
+    }
+
+
+def _pares(resultado) -> list:
+    """Pares como tuplas (id sys, id ext, delta días, delta importe), en orden de confirmación."""
+    pares, _, _ = resultado
+    return [tuple(int(x) for x in fila) for fila in pares.itertuples(index=False)]
+
+
+# -----------------------------
+# Motor columnar vs clásico
+# -----------------------------
+@pytest.mark.parametrize("seed", range(3))
+def test_columnar_matches_clasico(seed):
+    for df_sys, df_ext in _casos(seed, 15):
+        for ventana in (0, 1, 5, 30):
+            for orden in (True, False):
+                clasico = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden, motor="clasico")
+                columnar = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden, motor="columnar")
+                assert _pares(columnar) == _pares(clasico)
+                assert columnar[1] == clasico[1] and columnar[2] == clasico[2]
+
+
+def test_pairs_frame_columns_and_ids():
+    df_sys, df_ext = next(_casos(99, 1, max_filas=30))
+    pares, used_sys, used_ext = match_one_to_one_by_amount_and_date(df_sys, df_ext, 0, True)
+    assert list(pares.columns) == ["_SYS_ID_", "_EXT_ID_", "_DELTA_DIAS_", "_DELTA_IMPORTE_"]
+    assert set(pares["_SYS_ID_"]) == used_sys and set(pares["_EXT_ID_"]) == used_ext
+    assert used_ext <= set(df_ext.index)
+
+
+def test_unknown_engine_raises():
+    df_sys, df_ext = next(_casos(0, 1))
+    with pytest.raises(ValueError):
+        match_one_to_one_by_amount_and_date(df_sys, df_ext, 0, True, motor="otro")
+
+
+# -----------------------------
+# Tramos: loop, vectorizado e indexado por fecha
+# -----------------------------
+@pytest.mark.parametrize("chico, grande", [
+    (0, 1),          # todo tramo por _TramoIndexado
+    (0, 10**9),      # todo tramo vectorizado con NumPy
+], ids=["indexado", "vectorizado"])
+@pytest.mark.parametrize("seed", range(2))
+def test_bucket_paths_match_clasico(monkeypatch, seed, chico, grande):
+    monkeypatch.setattr(matching, "_TRAMO_CHICO", chico)
+    monkeypatch.setattr(matching, "_TRAMO_GRANDE", grande)
+    # pocas claves distintas: tramos largos con fechas repetidas y NaT
+    for df_sys, df_ext in _casos(100 + seed, 8, max_claves=3):
+        for ventana in (0, 1, 5):
+            for orden in (True, False):
+                clasico = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden, motor="clasico")
+                columnar = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden)
+                assert _pares(columnar) == _pares(clasico)
+
+
+# -----------------------------
+# Asignación global
+# -----------------------------
+def _global_exhaustivo(df_sys, df_ext, ventana: int, orden: bool) -> list:
+    """Todos los pares candidatos ordenados por (delta, rango sys, clave, fila ext) y confirmados en ese orden."""
+    c = _contexto(df_sys, df_ext)
+    candidatos = []
+    for rango, i in enumerate(_orden_sys(df_sys, orden)):
+        for n_clave, k in enumerate(c["claves_sys"][i]):
+            for j, kj in enumerate(c["clave_ext"]):
+                if kj != k:
+                    continue
+                d = _delta(c["f"][j], c["em"][i], c["ve"][i])
+                if ventana > 0 and d > ventana:
+                    continue
+                candidatos.append((d, rango, n_clave, j, i))
+    candidatos.sort()
+    usadas_sys, usadas_ext, pares = set(), set(), []
+    for d, _, _, j, i in candidatos:
+        if i in usadas_sys or j in usadas_ext:
+            continue
+        usadas_sys.add(i)
+        usadas_ext.add(j)
+        pares.append((c["sys_ids"][i], c["ext_ids"][j], d, 0))
+    return pares
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_global_matches_exhaustive_sort(seed):
+    for df_sys, df_ext in _casos(200 + seed, 20, max_filas=40, max_claves=6):
+        for ventana in (0, 3, 20):
+            for orden in (True, False):
+                res = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden, asignacion="global")
+                assert _pares(res) == _global_exhaustivo(df_sys, df_ext, ventana, orden)
+
+
+# -----------------------------
+# Tolerancia de importe
+# -----------------------------
+def _tolerancia_exhaustiva(df_sys, df_ext, ventana: int, orden: bool, tol_abs: int, tol_pct: float) -> list:
+    """Match exacto y, sobre lo libre, cada fila del sistema prueba todos los extractos libres en tolerancia."""
+    pares = _pares(match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden))
+    c = _contexto(df_sys, df_ext)
+    usadas_sys = {c["sys_ids"].index(p[0]) for p in pares}
+    usadas_ext = {c["ext_ids"].index(p[1]) for p in pares}
+    for i in _orden_sys(df_sys, orden):
+        if i in usadas_sys:
+            continue
+        mejor = None
+        for k in c["claves_sys"][i]:
+            tol = max(tol_abs, int(abs(k) * tol_pct / 100))
+            for j, kj in enumerate(c["clave_ext"]):
+                if j in usadas_ext or kj is None or abs(kj - k) > tol:
+                    continue
+                d = _delta(c["f"][j], c["em"][i], c["ve"][i])
+                if ventana > 0 and d > ventana:
+                    continue
+                cand = (abs(kj - k), d, j)
+                if mejor is None or cand < mejor[:3]:
+                    mejor = cand + (kj - k,)
+        if mejor is not None:
+            usadas_ext.add(mejor[2])
+            pares.append((c["sys_ids"][i], c["ext_ids"][mejor[2]], mejor[1], mejor[3]))
+    return pares
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_tolerance_matches_exhaustive_search(seed):
+    rng = np.random.default_rng(300 + seed)
+    for df_sys, df_ext in _casos(300 + seed, 10, max_filas=40, max_claves=6):
+        # ruido en las claves del extracto: casi nada calza exacto
+        df_ext["_AMT_KEY_"] = df_ext["_AMT_KEY_"] + pd.array(rng.integers(-150, 150, len(df_ext)), dtype="Int64")
+        for ventana in (0, 5):
+            for orden in (True, False):
+                for tol_abs, tol_pct in ((50, 0.0), (0, 30.0), (120, 1.0)):
+                    res = match_one_to_one_by_amount_and_date(
+                        df_sys, df_ext, ventana, orden, tolerancia_importe=tol_abs, tolerancia_pct=tol_pct,
+                    )
+                    assert _pares(res) == _tolerancia_exhaustiva(df_sys, df_ext, ventana, orden, tol_abs, tol_pct)
+
+
+def test_tolerance_hot_bucket_is_not_quadratic():
+    # un solo importe repetido, todo fuera de la ventana: cada fila del
+    # sistema tiene que descartar el tramo entero sin recorrerlo
+    n = 5_000
+    df_sys = pd.DataFrame({
+        "_EMISION_": pd.Series([pd.Timestamp("2024-01-01")] * n).astype("datetime64[s]"),
+        "_VENC_": pd.Series([pd.Timestamp("2024-01-10")] * n).astype("datetime64[s]"),
+        "_AMT_KEY_DEBE_POS": pd.array([10_000] * n, dtype="Int64"),
+        "_AMT_KEY_HABER_NEG": pd.array([None] * n, dtype="Int64"),
+        "_AMT_KEY_PRIMARY_": pd.array([10_000] * n, dtype="Int64"),
+    })
+    df_ext = pd.DataFrame({
+        "_FECHA_": pd.Series([pd.Timestamp("2025-01-01")] * n).astype("datetime64[s]"),
+        "_AMT_KEY_": pd.array([10_000] * n, dtype="Int64"),
+    })
+    t0 = time.perf_counter()
+    pares, _, _ = match_one_to_one_by_amount_and_date(df_sys, df_ext, 5, True, tolerancia_importe=1)
+    # recorriendo el tramo por fila son ~25M pasos (decenas de segundos)
+    assert time.perf_counter() - t0 < 5
+    assert pares.empty
+
+
+# -----------------------------
+# Grupos por suma
+# -----------------------------
+def _mejor_subconjunto(cand: list, claves: list, deltas: list, objetivo: int, max_filas: int):
+    """Menos filas; a igual tamaño, menor delta máximo, luego menor suma de deltas, luego la combinación."""
+    for r in range(2, max_filas + 1):
+        mejor = None
+        for comb in itertools.combinations(range(len(cand)), r):
+            if sum(claves[x] for x in comb) != objetivo:
+                continue
+            clave = (max(deltas[x] for x in comb), sum(deltas[x] for x in comb), comb)
+            if mejor is None or clave < mejor:
+                mejor = clave
+        if mejor is not None:
+            return [cand[x] for x in mejor[2]], mejor[0]
+    return None
+
+
+def _grupos_exhaustivos(df_sys, df_ext, used_sys, used_ext, ventana: int, orden: bool, max_filas: int) -> list:
+    """Cada contraparte libre prueba todas las combinaciones de sus 30 candidatos más cercanos en fecha."""
+    c = _contexto(df_sys, df_ext)
+    clave_sys = [None if pd.isna(k) else int(k) for k in df_sys["_AMT_KEY_PRIMARY_"]]
+    libre_sys = [k not in (None, 0) and c["sys_ids"][i] not in used_sys for i, k in enumerate(clave_sys)]
+    libre_ext = [k not in (None, 0) and c["ext_ids"][j] not in used_ext for j, k in enumerate(c["clave_ext"])]
+
+    def _candidatos(libres, claves, deltas, objetivo):
+        cand = [
+            x for x, libre in enumerate(libres)
+            if libre and (claves[x] > 0) == (objetivo > 0) and abs(claves[x]) < abs(objetivo)
+            and (ventana <= 0 or deltas[x] <= ventana)
+        ]
+        return sorted(cand, key=lambda x: (deltas[x], x))[:30]
+
+    grupos = []
+    for j in range(len(df_ext)):
+        if not libre_ext[j]:
+            continue
+        deltas = [_delta(c["f"][j], c["em"][i], c["ve"][i]) for i in range(len(df_sys))]
+        cand = _candidatos(libre_sys, clave_sys, deltas, c["clave_ext"][j])
+        sol = _mejor_subconjunto(cand, [clave_sys[i] for i in cand], [deltas[i] for i in cand], c["clave_ext"][j], max_filas)
+        if sol is not None:
+            for i in sol[0]:
+                libre_sys[i] = False
+            libre_ext[j] = False
+            grupos.append(("varios_sistema", [c["sys_ids"][i] for i in sol[0]], [c["ext_ids"][j]], sol[1]))
+    for i in _orden_sys(df_sys, orden):
+        if not libre_sys[i]:
+            continue
+        deltas = [_delta(c["f"][j], c["em"][i], c["ve"][i]) for j in range(len(df_ext))]
+        cand = _candidatos(libre_ext, c["clave_ext"], deltas, clave_sys[i])
+        sol = _mejor_subconjunto(cand, [c["clave_ext"][j] for j in cand], [deltas[j] for j in cand], clave_sys[i], max_filas)
+        if sol is not None:
+            for j in sol[0]:
+                libre_ext[j] = False
+            libre_sys[i] = False
+            grupos.append(("varios_extracto", [c["sys_ids"][i]], [c["ext_ids"][j] for j in sol[0]], sol[1]))
+    return grupos
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_groups_match_exhaustive_search(seed):
+    for df_sys, df_ext in _casos(400 + seed, 25, max_filas=18):
+        for ventana in (0, 5):
+            for orden in (True, False):
+                _, used_sys, used_ext = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden)
+                for max_filas in (2, 3, 4):
+                    grupos, gsys, gext, completo = matching.match_groups_by_amount_sum(
+                        df_sys, df_ext, used_sys, used_ext, ventana, orden, max_filas, presupuesto_seg=60,
+                    )
+                    obtenido = [(s, [int(x) for x in ids_s], [int(x) for x in ids_e], int(d)) for s, ids_s, ids_e, d in grupos]
+                    assert completo
+                    assert obtenido == _grupos_exhaustivos(df_sys, df_ext, used_sys, used_ext, ventana, orden, max_filas)
+                    assert gsys == {i for g in obtenido for i in g[1]} and gext == {j for g in obtenido for j in g[2]}
+
+
+def test_groups_need_two_rows():
+    df_sys, df_ext = next(_casos(0, 1))
+    with pytest.raises(ValueError):
+        matching.match_groups_by_amount_sum(df_sys, df_ext, set(), set(), 0, True, max_filas=1)
+
+
+def test_groups_only_search_nearest_candidates():
+    # 30 filas cercanas que no suman y 2 lejanas que sí: quedan fuera del tope de candidatos
+    n = 32
+    df_sys = pd.DataFrame({
+        "_EMISION_": pd.Series([pd.Timestamp("2024-01-01")] * 30 + [pd.Timestamp("2024-03-01")] * 2).astype("datetime64[s]"),
+        "_VENC_": pd.Series([pd.NaT] * n).astype("datetime64[s]"),
+        "_AMT_KEY_DEBE_POS": pd.array([None] * n, dtype="Int64"),
+        "_AMT_KEY_HABER_NEG": pd.array([None] * n, dtype="Int64"),
+        "_AMT_KEY_PRIMARY_": pd.array([150] * 30 + [100] * 2, dtype="Int64"),
+    })
+    df_ext = pd.DataFrame({"_FECHA_": pd.Series([pd.Timestamp("2024-01-01")]).astype("datetime64[s]"), "_AMT_KEY_": pd.array([200], dtype="Int64")})
+    grupos, _, _, _ = matching.match_groups_by_amount_sum(df_sys, df_ext, set(), set(), 0, True, 3)
+    assert grupos == []
+    grupos, _, _, _ = matching.match_groups_by_amount_sum(df_sys.iloc[28:], df_ext, set(), set(), 0, True, 3)
+    assert [(s, list(ids_s), list(ids_e), d) for s, ids_s, ids_e, d in grupos] == [("varios_sistema", [30, 31], [0], 60)]
+
+
+def test_groups_break_ties_by_total_delta():
+    # {100, 400, 500} y {200, 300, 500} suman 1000 con el mismo delta máximo (20): gana la de menor delta total
+    deltas = [0, 1, 1, 5, 20, 20]
+    n = len(deltas)
+    df_sys = pd.DataFrame({
+        "_EMISION_": (pd.Timestamp("2024-01-01") + pd.to_timedelta(deltas, "D")).astype("datetime64[s]"),
+        "_VENC_": pd.Series([pd.NaT] * n).astype("datetime64[s]"),
+        "_AMT_KEY_DEBE_POS": pd.array([None] * n, dtype="Int64"),
+        "_AMT_KEY_HABER_NEG": pd.array([None] * n, dtype="Int64"),
+        "_AMT_KEY_PRIMARY_": pd.array([100, 200, 300, 7, 400, 500], dtype="Int64"),
+    })
+    df_ext = pd.DataFrame({"_FECHA_": pd.Series([pd.Timestamp("2024-01-01")]).astype("datetime64[s]"), "_AMT_KEY_": pd.array([1000], dtype="Int64")})
+    grupos, _, _, _ = matching.match_groups_by_amount_sum(df_sys, df_ext, set(), set(), 0, True, 3)
+    assert [(s, list(ids_s), list(ids_e), d) for s, ids_s, ids_e, d in grupos] == [("varios_sistema", [1, 2, 5], [0], 20)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_group_candidates_bisect_same_as_full_scan(seed):
+    rng = np.random.default_rng(seed)
+    claves = rng.integers(-50, 50, 400)
+    libre = rng.random(400) < 0.7
+    delta = rng.integers(0, 40, 400)
+    orden = np.argsort(claves, kind="stable")
+    for objetivo in (-60, -50, -7, -1, 1, 2, 13, 49, 50, 80):
+        for ventana in (0, 10):
+            pos, d = matching._candidatos_grupo(libre, orden, claves[orden], objetivo, lambda p: delta[p], ventana)
+            ok = libre & (np.sign(claves) == np.sign(objetivo)) & (np.abs(claves) < abs(objetivo))
+            if ventana:
+                ok &= delta <= ventana
+            esperado = sorted(np.flatnonzero(ok).tolist(), key=lambda x: (delta[x], x))[:30]
+            assert pos.tolist() == esperado and d.tolist() == delta[esperado].tolist()
+
+
+def test_group_search_checks_budget_inside_one_target():
+    # 30 candidatos que nunca suman el objetivo: con 6 filas son decenas de miles de combinaciones
+    claves = [2 * k for k in range(1, 31)]
+    with pytest.raises(matching._SinPresupuesto):
+        matching._subconjunto_que_suma(claves, [0] * 30, 1_000_001, 6, limite=time.perf_counter())
+    assert matching._subconjunto_que_suma(claves[:8], [0] * 8, 1_000_001, 6) is None
+
+
+def test_groups_stop_when_budget_runs_out(monkeypatch):
+    # un solo objetivo sin solución y 6 filas: el corte tiene que llegar dentro
+    # de su búsqueda (la etapa 2 lee el reloj 31 veces, no llega a 40).
+    # Reloj falso: 1 ms por lectura, y lo miro en cada combinación.
+    n = 30
+    df_sys = pd.DataFrame({
+        "_EMISION_": pd.Series([pd.Timestamp("2024-01-01")] * n).astype("datetime64[s]"),
+        "_VENC_": pd.Series([pd.NaT] * n).astype("datetime64[s]"),
+        "_AMT_KEY_DEBE_POS": pd.array([None] * n, dtype="Int64"),
+        "_AMT_KEY_HABER_NEG": pd.array([None] * n, dtype="Int64"),
+        "_AMT_KEY_PRIMARY_": pd.array([2 * k for k in range(1, n + 1)], dtype="Int64"),
+    })
+    df_ext = pd.DataFrame({"_FECHA_": pd.Series([pd.Timestamp("2024-01-01")]).astype("datetime64[s]"), "_AMT_KEY_": pd.array([1_001], dtype="Int64")})
+    reloj = itertools.count()
+    monkeypatch.setattr(matching.time, "perf_counter", lambda: next(reloj) / 1000)
+    monkeypatch.setattr(matching, "_PASOS_ENTRE_RELOJ", 1)
+    _, _, _, completo = matching.match_groups_by_amount_sum(df_sys, df_ext, set(), set(), 0, True, 6, presupuesto_seg=100)
+    assert completo
+    grupos, _, _, completo = matching.match_groups_by_amount_sum(df_sys, df_ext, set(), set(), 0, True, 6, presupuesto_seg=0.04)
+    assert grupos == [] and not completo
+
+
+# -----------------------------
+# Modo paralelo
+# -----------------------------
+@pytest.mark.parametrize("seed", range(3))
+def test_shards_keep_competing_rows_together(seed):
+    # cada extracto cae en el shard de toda fila del sistema que tenga su clave
+    for df_sys, df_ext in _casos(500 + seed, 20, max_filas=200, max_claves=30):
+        sys_idx, ext_idx = matching._indexed_frames(df_sys, df_ext)
+        arr = matching._arrays(sys_idx, ext_idx)
+        sys_shard, ext_shard = matching._shards(arr, 7)
+        shard_de_clave = {}
+        for k, ok, sh in zip(arr["ext_key"].tolist(), arr["ext_ok"].tolist(), ext_shard.tolist()):
+            if ok:
+                assert shard_de_clave.setdefault(k, sh) == sh and 0 <= sh < 7
+        for i in range(len(sys_shard)):
+            for k, ok in ((arr["k1"][i], arr["k1_ok"][i]), (arr["k2"][i], arr["k2_ok"][i])):
+                if ok and int(k) in shard_de_clave:
+                    assert shard_de_clave[int(k)] == sys_shard[i]
+
+
+@pytest.mark.parametrize("asignacion", ["secuencial", "global"])
+def test_parallel_matches_serial(asignacion):
+    # pocos casos: cada llamada levanta un pool
+    for df_sys, df_ext in _casos(600, 6, max_filas=300, max_claves=40):
+        for ventana, orden, tolerancia in ((0, True, 0), (5, False, 3)):
+            kw = dict(asignacion=asignacion, tolerancia_importe=tolerancia)
+            serial = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden, **kw)
+            paralelo = match_one_to_one_by_amount_and_date(df_sys, df_ext, ventana, orden, procesos=2, **kw)
+            assert _pares(paralelo) == _pares(serial)
+            assert paralelo[1] == serial[1] and paralelo[2] == serial[2]
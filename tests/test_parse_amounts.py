@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Paridad de los parsers por columna contra el escalar parse_number_locale:
+    - parse_number_locale_series: mismo float, celda a celda
+    - parse_amount_cents_series: misma clave entera, salvo el redondeo de
+      los .5 escritos (comercial, se alejan del cero; el escalar sigue al
+      binario: '2,675' -> 2.67 pero 268 centavos)
+"""
+
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conciliacion.utils import parse_amount_cents_series, parse_number_locale, parse_number_locale_series
+
+DECIMALES = range(5)
+
+EDGE = [
+    "$ -1200000", "ARS −1.200.000,00", "(1,200,000.00)", "1.200,00-", "+ 3.456,78", "", "  ", None, np.nan, pd.NA,
+    "1e-05", "1_000", "abc", "-", "(", "()", "( 12 )", "12-34", "1.2.3", "1,2,3", "1.234,5", "1,234.5", "€ 12,3",
+    "\xa0 45 ", "\t12\n", "--5", "+-5", "-+5", "0", "-0", "(0)", "0,005", "2,675", "1.005", "١٢", "1" * 400,
+    "12 345,67", "US$ 1.000", "1 000.00 CR", 3, 2.675, 1e-5, 1e20, True, pd.Timestamp("2024-01-01"), "12.", ".5",
+    "-.5", "5-", "(5-)", "(-5)", "1,2e3", "∞", "ＡＢ12", "1.000.000", "9999999999999999.995", "0.125", "0.375",
+]
+
+
+def _formatear(valor: Decimal, decimales: int, rng: random.Random, inequivoco: bool) -> str:
+    """
+    Un importe escrito como llega de los bancos: miles, decimal local, signo
+    y moneda variados. inequivoco: sin decimales no pongo separador de miles
+    ('1.234' se lee como decimal: el último separador decide).
+    """
+    texto = f"{abs(valor):,.{decimales}f}"
+    estilo = 2 if inequivoco and decimales == 0 else rng.randint(0, 2)
+    if estilo == 1:
+        texto = texto.replace(",", "X").replace(".", ",").replace("X", ".")
+    elif estilo == 2:
+        texto = texto.replace(",", "")
+    if valor < 0:
+        return rng.choice(["-" + texto, "(" + texto + ")", texto + "-", "−" + texto, "$ -" + texto, "ARS " + texto + "-"])
+    if rng.random() < 0.3:
+        return rng.choice(["+ " + texto, "$" + texto, texto + " ", "\xa0" + texto])
+    return texto
+
+
+def _corpus_aleatorio(n: int, seed: int = 0, inequivoco: bool = False):
+    """(textos, valores Decimal) con 0 a 4 decimales escritos; con inequivoco, el texto vale exactamente el Decimal."""
+    rng = random.Random(seed)
+    textos, valores = [], []
+    for _ in range(n):
+        decimales = rng.randint(0, 4)
+        entero = rng.choice([rng.randint(-10**12, 10**12), rng.randint(-10**6, 10**6), rng.randint(-999, 999)])
+        valor = Decimal(entero).scaleb(-decimales)
+        textos.append(_formatear(valor, decimales, rng, inequivoco))
+        valores.append(valor)
+    return textos, valores
+
+
+def _escalar(valores, decimales: int) -> np.ndarray:
+    return np.array([parse_number_locale(v, decimales) for v in valores], dtype="float64")
+
+
+def _assert_paridad(col: pd.Series, decimales: int):
+    esperado = _escalar(list(col), decimales)
+    obtenido = parse_number_locale_series(col, decimales).to_numpy()
+    distintos = [
+        (v, e, o) for v, e, o in zip(col, esperado, obtenido)
+        if not (e == o or (np.isnan(e) and np.isnan(o)))
+    ]
+    assert not distintos, distintos[:10]
+
+
+# -----------------------------
+# parse_number_locale_series
+# -----------------------------
+@pytest.mark.parametrize("decimales", DECIMALES)
+def test_series_matches_scalar_on_edge_cases(decimales):
+    _assert_paridad(pd.Series(EDGE, dtype=object), decimales)
+
+
+@pytest.mark.parametrize("decimales", DECIMALES)
+def test_series_matches_scalar_on_random_amounts(decimales):
+    textos, _ = _corpus_aleatorio(20_000, seed=decimales)
+    _assert_paridad(pd.Series(textos, dtype=object), decimales)
+
+
+@pytest.mark.parametrize("decimales", DECIMALES)
+def test_series_matches_scalar_on_float_columns(decimales):
+    rng = np.random.default_rng(decimales)
+    vals = np.concatenate([
+        rng.uniform(-1e6, 1e6, 20_000),
+        [0.125, 2.675, 1e-5, 1e17, np.nan, -0.0, 1.005, 0.285, 1e16 - 1],
+    ])
+    _assert_paridad(pd.Series(vals), decimales)
+
+
+@pytest.mark.parametrize("col", [
+    pd.Series([1, 2, 3, 10**17, -5]),
+    pd.Series([1, None, 3], dtype="Int64"),
+    pd.Series([1.1, None], dtype="float32"),
+    pd.Series(["1.234,56", None, "(7,5)"], dtype="str"),
+], ids=["int64", "Int64", "float32", "str"])
+def test_series_matches_scalar_on_other_dtypes(col):
+    _assert_paridad(col, 2)
+
+
+def test_series_keeps_index():
+    col = pd.Series(["1,5", "2,5"], index=[10, 20])
+    assert list(parse_number_locale_series(col).index) == [10, 20]
+
+
+# -----------------------------
+# parse_amount_cents_series
+# -----------------------------
+def _centavos_exactos(valor: Decimal, decimales: int) -> int:
+    return int(valor.scaleb(decimales).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+@pytest.mark.parametrize("decimales", DECIMALES)
+def test_cents_round_half_up_on_written_number(decimales):
+    textos, valores = _corpus_aleatorio(20_000, seed=10 + decimales, inequivoco=True)
+    obtenido = parse_amount_cents_series(pd.Series(textos, dtype=object), decimales)
+    assert str(obtenido.dtype) == "Int64"
+    esperado = [_centavos_exactos(v, decimales) for v in valores]
+    distintos = [(t, e, o) for t, e, o in zip(textos, esperado, obtenido) if e != o]
+    assert not distintos, distintos[:10]
+
+
+@pytest.mark.parametrize("decimales", DECIMALES)
+def test_cents_match_scalar_away_from_halves(decimales):
+    # con los mismos o menos decimales que 'decimales' no hay nada que
+    # redondear: la clave es el escalar escalado
+    textos, valores = _corpus_aleatorio(20_000, seed=20 + decimales, inequivoco=True)
+    sin_redondeo = [t for t, v in zip(textos, valores) if -v.as_tuple().exponent <= decimales]
+    obtenido = parse_amount_cents_series(pd.Series(sin_redondeo, dtype=object), decimales)
+    esperado = [int(round(parse_number_locale(t, decimales) * 10**decimales)) for t in sin_redondeo]
+    assert list(obtenido) == esperado
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("2,675", 268),
+    ("-2,675", -268),
+    ("1.005", 101),
+    ("(0,005)", -1),
+    ("0,015-", -2),
+    ("1.234,565", 123457),
+    ("$ 12", 1200),
+    ("abc", None),
+    ("", None),
+    (None, None),
+    ("99999999999999999999,99", None),   # fuera de _MAX_CENTS
+])
+def test_cents_pinned_values(texto, esperado):
+    obtenido = parse_amount_cents_series(pd.Series([texto], dtype=object), 2)[0]
+    if esperado is None:
+        assert pd.isna(obtenido)
+    else:
+        assert obtenido == esperado
+
+
+def test_cents_half_up_differs_from_scalar():
+    # diferencia documentada: el escalar redondea el binario (2.67499...)
+    assert parse_number_locale("2,675", 2) == 2.67
+    assert parse_amount_cents_series(pd.Series(["2,675"]), 2)[0] == 268
+
+
+@pytest.mark.parametrize("col, esperado", [
+    (pd.Series([2.675, 1.005, 1234.56, -0.015, np.nan, 1e20, 1e-5]), [268, 101, 123456, -2, None, None, 0]),
+    (pd.Series([1, -5, None], dtype="Int64"), [100, -500, None]),
+], ids=["float64", "Int64"])
+def test_cents_numeric_columns(col, esperado):
+    obtenido = parse_amount_cents_series(col, 2)
+    assert [None if pd.isna(v) else int(v) for v in obtenido] == esperado
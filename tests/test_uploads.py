@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Libros abiertos y copias en disco compartidos entre sesiones: se liberan
+recién cuando los suelta la última sesión que los tiene subidos.
+"""
+
+import io
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from conciliacion import utils
+
+
+class _Subido(io.BytesIO):
+    """Como el UploadedFile de Streamlit: bytes con nombre."""
+
+    def __init__(self, data: bytes, name: str = "libro.xlsx"):
+        super().__init__(data)
+        self.name = name
+
+
+def _xlsx(valor) -> _Subido:
+    bio = io.BytesIO()
+    pd.DataFrame({"a": [valor]}).to_excel(bio, index=False)
+    return _Subido(bio.getvalue())
+
+
+@pytest.fixture(autouse=True)
+def _limpio():
+    yield
+    utils._UPLOAD_REFS.clear()
+    utils.clear_ingest_cache()
+
+
+def test_upload_released_only_by_last_session():
+    f = _xlsx(1)
+    h = utils.content_hash(f)
+    utils.retain_upload(h)
+    utils.retain_upload(h)
+    utils.open_workbook(f)
+    path = utils.spool_upload(f)
+
+    utils.drop_upload(h)
+    assert h in utils._WORKBOOKS and os.path.exists(path)
+    utils.clear_ingest_cache()
+    assert h in utils._WORKBOOKS and os.path.exists(path)
+
+    utils.drop_upload(h)
+    assert h not in utils._WORKBOOKS and not os.path.exists(path)
+    assert h not in utils._UPLOAD_REFS
+
+
+def test_workbook_lru_evicts_unused_first(monkeypatch):
+    monkeypatch.setattr(utils, "WORKBOOKS_MAX", 2)
+    en_uso, libre, nuevo = _xlsx(1), _xlsx(2), _xlsx(3)
+    utils.retain_upload(utils.content_hash(en_uso))
+    for f in (en_uso, libre, nuevo):
+        utils.open_workbook(f)
+    assert set(utils._WORKBOOKS) == {utils.content_hash(en_uso), utils.content_hash(nuevo)}
+    assert os.path.exists(utils._SPOOL[utils.content_hash(en_uso)])
+
+
+def test_workbooks_in_use_are_never_closed(monkeypatch):
+    monkeypatch.setattr(utils, "WORKBOOKS_MAX", 1)
+    archivos = [_xlsx(v) for v in range(3)]
+    handles = []
+    for f in archivos:
+        utils.retain_upload(utils.content_hash(f))
+        handles.append(utils.open_workbook(f))
+    # todos en uso: la caché pasa el tope y ningún handle se cierra
+    assert len(utils._WORKBOOKS) == 3
+    assert [xf.parse(0)["a"].tolist() for xf in handles] == [[0], [1], [2]]
+    # al soltar uno baja al tope, y solo se cierran los que nadie usa
+    utils.drop_upload(utils.content_hash(archivos[0]))
+    assert set(utils._WORKBOOKS) == {utils.content_hash(f) for f in archivos[1:]}
+    utils.drop_upload(utils.content_hash(archivos[1]))
+    assert set(utils._WORKBOOKS) == {utils.content_hash(archivos[2])}
+    assert handles[2].parse(0)["a"].tolist() == [2]
+
+
+def test_concurrent_sessions_share_handles(monkeypatch):
+    monkeypatch.setattr(utils, "WORKBOOKS_MAX", 2)
+    datos = [_xlsx(v).getvalue() for v in range(4)]
+    errores = []
+
+    def _sesion(i):
+        try:
+            for r in range(5):
+                f = _Subido(datos[(i + r) % len(datos)])
+                h = utils.content_hash(f)
+                utils.retain_upload(h)
+                assert utils.open_workbook(f).parse(0)["a"].tolist() == [(i + r) % len(datos)]
+                utils.drop_upload(h)
+        except Exception as e:  # lo reporto desde el hilo principal
+            errores.append(e)
+
+    hilos = [threading.Thread(target=_sesion, args=(i,)) for i in range(8)]
+    for t in hilos:
+        t.start()
+    for t in hilos:
+        t.join()
+    assert errores == []
+    assert not utils._UPLOAD_REFS
+
+
+def test_ingest_cache_is_thread_safe(monkeypatch):
+    monkeypatch.setattr(utils, "INGEST_CACHE_MAX", 3)
+    utils.clear_ingest_cache()
+    errores = []
+
+    def _sesion(i):
+        try:
+            for r in range(2_000):
+                k = (i + r) % 7
+                assert utils._cached(("prueba", k), lambda: k) == k
+        except Exception as e:  # lo reporto desde el hilo principal
+            errores.append(e)
+
+    hilos = [threading.Thread(target=_sesion, args=(i,)) for i in range(8)]
+    for t in hilos:
+        t.start()
+    for t in hilos:
+        t.join()
+    assert errores == []
+    stats = utils.ingest_cache_stats()
+    assert stats["hits"] + stats["misses"] == 8 * 2_000
+    assert stats["entradas"] <= 3